@@ -0,0 +1,75 @@
+import wire
+
+ACK_PER_FRAME = "frame"
+ACK_CUMULATIVE = "cumulative"
+ACK_NONE = "none"
+ACK_MODES = (ACK_PER_FRAME, ACK_CUMULATIVE, ACK_NONE)
+
+DEFAULT_ACK_EVERY = 10
+DEFAULT_ACK_INTERVAL_MS = 100
+
+BITMAP_BITS = 64
+# Highest seq itself plus the frames the bitmap reports on
+WINDOW_MASK = (1 << (BITMAP_BITS + 1)) - 1
+
+
+def parse_ack_request(request):
+    # Hello "ack" field -> (mode, every, interval_ms). Clients that do not
+    # ask keep the old one-ack-per-frame behaviour.
+    if not isinstance(request, dict):
+        return ACK_PER_FRAME, DEFAULT_ACK_EVERY, DEFAULT_ACK_INTERVAL_MS
+    mode = request.get("mode")
+    if mode not in ACK_MODES:
+        mode = ACK_PER_FRAME
+    try:
+        every = max(1, int(request.get("every", DEFAULT_ACK_EVERY)))
+        interval_ms = max(1, int(request.get("interval_ms", DEFAULT_ACK_INTERVAL_MS)))
+    except (TypeError, ValueError, OverflowError):
+        every, interval_ms = DEFAULT_ACK_EVERY, DEFAULT_ACK_INTERVAL_MS
+    return mode, every, interval_ms
+
+
+class CumulativeAck:
+    # Receive window for one session. received has bit i set when frame
+    # (highest - i) arrived; the ack reports the 64 frames below highest.
+    def __init__(self, every=DEFAULT_ACK_EVERY):
+        self.every = every
+        self.highest = None
+        self.received = 0
+        self.span = 0
+        self.pending = 0
+
+    def record(self, seq):
+        # True once enough frames are pending to send an ack right away
+        if self.highest is None:
+            self.highest = seq
+            self.received = 1
+        elif wire.seq_newer(seq, self.highest):
+            shift = (seq - self.highest) & wire.SEQ_MASK
+            self.received = ((self.received << shift) | 1) & WINDOW_MASK if shift <= BITMAP_BITS else 1
+            self.highest = seq
+            self.span = min(self.span + shift, BITMAP_BITS)
+        else:
+            distance = (self.highest - seq) & wire.SEQ_MASK
+            if distance <= BITMAP_BITS:
+                self.received |= 1 << distance
+        self.pending += 1
+        return self.pending >= self.every
+
+    def take(self):
+        # (highest seq, frames since the last ack, dropped bitmap); bit i of
+        # the bitmap means frame highest - 1 - i never arrived
+        dropped = ~(self.received >> 1) & ((1 << self.span) - 1)
+        count = self.pending
+        self.pending = 0
+        return self.highest, count, dropped
+
+
+def count_drops(previous_seq, seq, dropped):
+    # Drops reported for the frames between two consecutive cumulative acks
+    if previous_seq is None:
+        new_frames = BITMAP_BITS
+    else:
+        new_frames = ((seq - previous_seq) & wire.SEQ_MASK) - 1
+    new_frames = max(0, min(new_frames, BITMAP_BITS))
+    return bin(dropped & ((1 << new_frames) - 1)).count("1")
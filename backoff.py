@@ -0,0 +1,32 @@
+import random
+
+DEFAULT_INITIAL_DELAY = 0.05
+DEFAULT_MAX_DELAY = 5.0
+DEFAULT_FACTOR = 2.0
+
+
+class Backoff:
+    # Exponential reconnect delays with "equal jitter": half of each step is
+    # fixed, half random, so a Wi-Fi blip costs tens of milliseconds while a
+    # room full of gloves losing the same access point does not reconnect in
+    # lockstep. max_attempts None retries forever.
+    def __init__(self, initial=DEFAULT_INITIAL_DELAY, maximum=DEFAULT_MAX_DELAY, factor=DEFAULT_FACTOR,
+                 max_attempts=None, rng=None):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.max_attempts = max_attempts
+        self.attempts = 0
+        self._random = rng.random if rng else random.random
+
+    @property
+    def exhausted(self):
+        return self.max_attempts is not None and self.attempts >= self.max_attempts
+
+    def next_delay(self):
+        step = min(self.maximum, self.initial * self.factor ** min(self.attempts, 64))
+        self.attempts += 1
+        return step / 2 + self._random() * step / 2
+
+    def reset(self):
+        self.attempts = 0
@@ -0,0 +1,132 @@
+import logging
+import struct
+import sys
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Linux ioctl: bytes in a TCP socket's send queue not sent yet. SIOCOUTQ
+# (TIOCOUTQ) also counts bytes sent and waiting for their ack, which on a
+# healthy link with some RTT is already more than the watermarks.
+SIOCOUTQNSD = 0x894B
+
+# Bytes waiting to leave for the server (asyncio buffer + kernel send
+# queue). Above the high watermark the sender holds frames back until the
+# queue has drained below the low one; ~17 binary or ~5 JSON frames
+DEFAULT_HIGH_WATERMARK = 512
+DEFAULT_LOW_WATERMARK = 128
+# Backpressure that lasts this long halves the send rate, once per period,
+# down to DEFAULT_MIN_RATE; each quiet period after it gives back a tenth
+# of the full rate
+DEFAULT_SUSTAINED = 0.5
+DEFAULT_RECOVER_INTERVAL = 1.0
+DEFAULT_MIN_RATE = 10.0
+RECOVER_STEP = 0.1
+
+log = logging.getLogger(__name__)
+
+
+def queued_bytes(transport):
+    # Unsent bytes in the transport plus, on Linux, the unsent part of the
+    # socket's send queue. Without the latter a congested link only shows
+    # once the kernel buffer, often megabytes of stale frames, is full.
+    size = transport.get_write_buffer_size()
+    sock = transport.get_extra_info("socket")
+    if fcntl is not None and sock is not None and sys.platform.startswith("linux"):
+        try:
+            size += struct.unpack("i", fcntl.ioctl(sock.fileno(), SIOCOUTQNSD, b"\0\0\0\0"))[0]
+        except OSError:
+            pass
+    return size
+
+
+class SendGate:
+    # Flow control for frames on one WebSocket. Frames it holds back are not
+    # queued: the sender simply sends the newest glove state once the queue
+    # has drained, so a congested link carries fresh state instead of a
+    # backlog. Backpressure that persists also cuts the frame rate
+    # (multiplicative decrease, additive increase once it clears).
+    def __init__(self, max_rate, high=DEFAULT_HIGH_WATERMARK, low=DEFAULT_LOW_WATERMARK,
+                 sustained=DEFAULT_SUSTAINED, recover_interval=DEFAULT_RECOVER_INTERVAL, min_rate=DEFAULT_MIN_RATE):
+        self.max_rate = max_rate
+        self.high = high
+        self.low = low
+        self.sustained = sustained
+        self.recover_interval = recover_interval
+        self.min_rate = min(min_rate, max_rate)
+        self.rate = max_rate
+        self.paused = False
+        self.held_count = 0
+        self.pause_count = 0
+        self.rate_cut_count = 0
+        self._episode_start = None
+        self._last_pressure = None
+        self._last_change = None
+        self._last_sent = None
+
+    @property
+    def interval(self):
+        return 1.0 / self.rate
+
+    def delay(self, queued, now):
+        # Seconds to wait before the next frame may go out; 0 = send now.
+        # A frame held back counts as skipped: whatever the glove reports by
+        # the next try replaces it.
+        if self.paused and queued <= self.low:
+            self.paused = False
+        elif not self.paused and queued > self.high:
+            self.paused = True
+            self.pause_count += 1
+        if self.paused:
+            self._pressure(now)
+            self.held_count += 1
+            return self.interval
+        self._recover(now)
+        if self.rate < self.max_rate and self._last_sent is not None:
+            wait = self._last_sent + self.interval - now
+            if wait > 0:
+                self.held_count += 1
+                return wait
+        return 0.0
+
+    def sent(self, now):
+        self._last_sent = now
+
+    def reset(self):
+        # New connection: nothing queued on it yet; the rate stays, the
+        # link is likely the same one
+        self.paused = False
+        self._episode_start = None
+        self._last_sent = None
+
+    def status(self):
+        state = "paused" if self.paused else "flowing"
+        return f"send {state} at {self.rate:.0f}/s | {self.held_count} held back"
+
+    def _pressure(self, now):
+        if self._last_pressure is None or now - self._last_pressure > self.sustained:
+            self._episode_start = now
+        self._last_pressure = now
+        if now - self._episode_start < self.sustained:
+            return
+        if self._last_change is not None and now - self._last_change < self.sustained:
+            return
+        rate = max(self.min_rate, self.rate / 2)
+        if rate < self.rate:
+            self.rate = rate
+            self.rate_cut_count += 1
+            self._last_change = now
+            log.info("Sustained backpressure: sending at %.0f frames/s", rate)
+
+    def _recover(self, now):
+        if self.rate >= self.max_rate:
+            return
+        last = max(self._last_pressure or now, self._last_change or now)
+        if now - last < self.recover_interval:
+            return
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVER_STEP)
+        self._last_change = now
+        if self.rate >= self.max_rate:
+            log.info("Backpressure cleared: back to %.0f frames/s", self.rate)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import time
+import timeit
+import tracemalloc
+
+import server
+import wire
+from server import HandController
+from robot_feedback import RobotFeedback
+from servo_protocol import (PROTOCOL_ASCII, PROTOCOL_BINARY, AsciiServoProtocol, BinaryServoProtocol,
+                            encode_ascii_command)
+
+FRAME_INTERVAL_US = 20_000
+PROTOCOLS = {PROTOCOL_ASCII: AsciiServoProtocol, PROTOCOL_BINARY: BinaryServoProtocol}
+STAGE_ITERATIONS = 100000
+VALUES = (1500, 1800, 1200, 2000, 900)
+
+
+def _stages():
+    # (stage, allocating version the hot path used before, current version)
+    message = wire.encode_frame(12345, wire.now_us(), VALUES)
+    frame = wire.Frame()
+    ack = bytearray(wire.ACK.size)
+    frame_buffer = bytearray(wire.FRAME.size)
+    return (
+        ("decode frame", lambda: wire.decode_frame(message),
+         lambda: wire.decode_frame_into(message, frame)),
+        ("ascii command", lambda: (",".join(map(str, VALUES)) + "\n").encode("ascii"),
+         lambda: encode_ascii_command(VALUES)),
+        ("binary ack", lambda: wire.encode_ack(12345, 1_000_000),
+         lambda: wire.encode_ack(12345, 1_000_000, ack)),
+        ("json ack", lambda: json.dumps({"ok": True, "seq": 12345, "ts_ms": int(time.time() * 1000)}),
+         lambda: wire.encode_json_ack(12345, time.time() * 1000)),
+        ("client bin1 frame", lambda: wire.encode_frame(12345, 1_000_000, VALUES),
+         lambda: wire.encode_frame(12345, 1_000_000, VALUES, frame_buffer)),
+        ("client json frame", lambda: json.dumps({"finger_values": list(VALUES), "timestamp_ms": 1000,
+                                                  "ts_us": 1_000_000}),
+         lambda: wire.encode_json_frame(VALUES, 1000, 1_000_000)),
+    )
+
+
+def _stage_cost(func, iterations):
+    # -> (ns per call, transient peak bytes per call)
+    ns = timeit.timeit(func, number=iterations) / iterations * 1e9
+    tracemalloc.start()
+    func()
+    current = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return ns, peak
+
+
+class EncodeOutput:
+    # Stands in for a SerialOutput: encodes each command the way its writer
+    # thread would, and drops it. Carries a RobotFeedback like every routed
+    # port does in full mode, so acks take the production path.
+    def __init__(self, protocol):
+        self.protocol = protocol
+        self.feedback = RobotFeedback()
+
+    def submit(self, servo_values):
+        self.protocol.encode(servo_values)
+
+
+class _Socket:
+    async def send(self, message):
+        pass
+
+
+def _messages(wire_format, frames):
+    # A slow open/close sweep with sensor noise, like a glove at rest
+    # between grasps; most frames map to the level already sent
+    out = []
+    for i in range(frames):
+        t = i * FRAME_INTERVAL_US
+        values = [int(1500 + 900 * math.sin(t / 2e6 + f) + (i * 7919 + f * 31) % 9 - 4) for f in range(5)]
+        if wire_format == wire.FORMAT_BINARY:
+            out.append(wire.encode_frame(i, t, values))
+        else:
+            out.append(json.dumps({"finger_values": values, "timestamp_ms": t // 1000, "ts_us": t}))
+    return out
+
+
+def _session(wire_format, protocol, feedback_acks=False):
+    ctrl = HandController(routes={"default": []})
+    session = ctrl.open_session(hand_id="default")
+    session.authenticated = True
+    session.wire_format = wire_format
+    session.websocket = _Socket()
+    session.outputs = [EncodeOutput(PROTOCOLS[protocol]())]
+    # Set by the hello of a client that asked for robot feedback
+    session.feedback_acks = feedback_acks
+    return ctrl, session
+
+
+async def _time_per_frame(wire_format, protocol, messages, feedback_acks):
+    ctrl, session = _session(wire_format, protocol, feedback_acks)
+    websocket = session.websocket
+    handle = ctrl._handle_message
+    start = time.perf_counter_ns()
+    for message in messages:
+        await handle(session, websocket, message)
+    elapsed = time.perf_counter_ns() - start
+    return elapsed / len(messages) / 1000
+
+
+async def _gc_per_frame(wire_format, protocol, messages, feedback_acks):
+    # Collections the collector ran and the time they took
+    ctrl, session = _session(wire_format, protocol, feedback_acks)
+    websocket = session.websocket
+    handle = ctrl._handle_message
+    started = []
+    pauses = []
+
+    def on_gc(phase, info):
+        if phase == "start":
+            started.append(time.perf_counter_ns())
+        else:
+            pauses.append(time.perf_counter_ns() - started.pop())
+
+    gc.collect()
+    gc.callbacks.append(on_gc)
+    try:
+        for message in messages:
+            await handle(session, websocket, message)
+    finally:
+        gc.callbacks.remove(on_gc)
+    return len(pauses), sum(pauses) / 1e6
+
+
+async def _memory_per_frame(wire_format, protocol, messages, feedback_acks):
+    # Transient peak above the steady state while one frame is handled, and
+    # what stays allocated after all of them
+    ctrl, session = _session(wire_format, protocol, feedback_acks)
+    websocket = session.websocket
+    handle = ctrl._handle_message
+    # Warm up lazily created state (histograms, counters) first
+    for message in messages[:100]:
+        await handle(session, websocket, message)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    peaks = 0
+    for message in messages:
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await handle(session, websocket, message)
+        peaks += tracemalloc.get_traced_memory()[1] - current
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return peaks / len(messages), retained / len(messages)
+
+
+async def run(wire_format, protocol, frames, repeat, feedback_acks):
+    messages = _messages(wire_format, frames)
+    us = min([await _time_per_frame(wire_format, protocol, messages, feedback_acks) for _ in range(repeat)])
+    collections, gc_ms = await _gc_per_frame(wire_format, protocol, messages, feedback_acks)
+    peak, retained = await _memory_per_frame(wire_format, protocol, messages, feedback_acks)
+    return us, peak, retained, collections, gc_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time and allocations per frame on the server hot path "
+                                                 "(decode, map, ack, serial encode)")
+    parser.add_argument("--frames", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per row, the best one counts")
+    parser.add_argument("--feedback-acks", action="store_true", help="clients that asked for robot feedback "
+                                                                      "in their acks")
+    parser.add_argument("--levels", action="store_true", help="keep the default 3 servo levels "
+                                                              "(most frames dedup)")
+    args = parser.parse_args()
+    print(f"Per stage, before -> now ({STAGE_ITERATIONS} calls)")
+    print(f"{'stage':<19}{'ns before':>10}{'ns now':>8}{'B before':>10}{'B now':>7}")
+    for name, before, now in _stages():
+        ns_before, bytes_before = _stage_cost(before, STAGE_ITERATIONS)
+        ns_now, bytes_now = _stage_cost(now, STAGE_ITERATIONS)
+        print(f"{name:<19}{ns_before:>10.0f}{ns_now:>8.0f}{bytes_before:>10}{bytes_now:>7}")
+    print()
+    if not args.levels:
+        server.SERVO_LEVELS = None
+    print(f"{args.frames} frames per row, servo levels {'on' if args.levels else 'off'}, "
+          f"{'feedback' if args.feedback_acks else 'plain'} acks")
+    print(f"{'wire':<6}{'serial':<8}{'us/frame':>9}{'peak B/frame':>13}{'kept B/frame':>13}{'gc runs':>8}"
+          f"{'gc ms':>7}")
+    for wire_format in (wire.FORMAT_BINARY, wire.FORMAT_JSON):
+        for protocol in PROTOCOLS:
+            us, peak, retained, collections, gc_ms = asyncio.run(
+                run(wire_format, protocol, args.frames, args.repeat, args.feedback_acks))
+            print(f"{wire_format:<6}{protocol:<8}{us:>9.1f}{peak:>13.0f}{retained:>13.2f}{collections:>8}"
+                  f"{gc_ms:>7.1f}")
+    print("peak = transient bytes above the steady state while handling one frame, "
+          "including the ack and serial command")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import logging
+import math
+import socket
+import time
+
+import websockets
+
+import client
+import wire
+from server import HandController
+
+GLOVE_INTERVAL = 0.01
+# Smallest receive buffer Linux allows, and a small read buffer in the proxy,
+# so the backlog builds up on the glove side as it would behind a slow link
+PROXY_RCVBUF = 1024
+PROXY_CHUNK = 256
+
+
+class ThrottledProxy:
+    # TCP proxy in front of the server whose glove -> server direction can be
+    # choked to `rate` bytes/s, like a Wi-Fi link in a bad spot. Nothing is
+    # dropped: TCP queues it all in the glove's socket and asyncio buffers.
+    def __init__(self, upstream_port):
+        self.upstream_port = upstream_port
+        self.rate = None
+        self.port = None
+        self._server = None
+
+    async def up(self):
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, PROXY_RCVBUF)
+        sock.bind(("127.0.0.1", 0))
+        self._server = await asyncio.start_server(self._handle, sock=sock, limit=PROXY_CHUNK)
+        self.port = sock.getsockname()[1]
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, client_reader, client_writer):
+        up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        await asyncio.gather(self._pump(client_reader, up_writer, throttled=True),
+                             self._pump(up_reader, client_writer), return_exceptions=True)
+
+    async def _pump(self, reader, writer, throttled=False):
+        try:
+            while data := await reader.read(PROXY_CHUNK if throttled else 65536):
+                writer.write(data)
+                await writer.drain()
+                if throttled and self.rate:
+                    await asyncio.sleep(len(data) / self.rate)
+        finally:
+            writer.close()
+
+
+class AgeController(HandController):
+    # Server that notes how old each frame is when it arrives (glove and
+    # server share the host clock here)
+    def __init__(self):
+        super().__init__(routes={"default": []})
+        self.arrivals = []
+
+    def _accept_frame(self, session, finger_values, timestamp_us, received_us):
+        self.arrivals.append((time.monotonic(), (received_us - timestamp_us) / 1000))
+        return super()._accept_frame(session, finger_values, timestamp_us, received_us)
+
+
+async def _glove(glove_client):
+    # Continuous finger sweep at 100 Hz; every sample is a change worth sending
+    n = 0
+    while glove_client.is_running:
+        value = int(1500 + 900 * math.sin(n * GLOVE_INTERVAL * math.pi))
+        glove_client.finger_values[:] = [value] * 5
+        glove_client.new_frame.set()
+        n += 1
+        await asyncio.sleep(GLOVE_INTERVAL)
+
+
+def _percentile(values, fraction):
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else None
+
+
+async def run_case(gate, wire_format, rate, congestion, recovery):
+    ctrl = AgeController()
+    ws_server = await websockets.serve(ctrl.handle_client, "127.0.0.1", 0)
+    proxy = ThrottledProxy(next(iter(ws_server.sockets)).getsockname()[1])
+    await proxy.up()
+
+    client.SERVER_ADDRESS = "127.0.0.1"
+    client.SERVER_PORT = proxy.port
+    client.ROBOT_FEEDBACK = False
+    client.WIRE_FORMATS = (wire_format,)
+    client.BACKPRESSURE = gate
+    glove_client = client.SerialHandClient()
+    glove_client.is_running = True
+    tasks = [asyncio.create_task(glove_client.data_sender_task()), asyncio.create_task(_glove(glove_client))]
+
+    await asyncio.sleep(1.0)
+    choked = time.monotonic()
+    proxy.rate = rate
+    await asyncio.sleep(congestion)
+    freed = time.monotonic()
+    proxy.rate = None
+    await asyncio.sleep(recovery)
+    glove_client.is_running = False
+    glove_client.new_frame.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await proxy.close()
+    ws_server.close()
+
+    # Everything that arrives from the moment the link chokes, including the
+    # backlog it flushes once it is free again
+    ages = [age for t, age in ctrl.arrivals if t >= choked]
+    # Time until frames arrive fresh again once the link is back
+    stale = [t for t, age in ctrl.arrivals if t >= freed and age > 50]
+    send_gate = glove_client.send_gate
+    return {
+        "arrived": len(ages),
+        "p50": _percentile(ages, 0.5),
+        "p99": _percentile(ages, 0.99),
+        "max": max(ages) if ages else None,
+        "stale": sum(1 for age in ages if age > 500),
+        "drain_ms": (stale[-1] - freed) * 1000 if stale else 0.0,
+        "held": send_gate.held_count if send_gate else 0,
+        "cuts": send_gate.rate_cut_count if send_gate else 0,
+        "sent": glove_client.message_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Frame age at the server while the glove's uplink is congested, "
+                                                 "with and without send backpressure")
+    parser.add_argument("--rate", type=int, default=1000, help="uplink bytes/s while congested")
+    parser.add_argument("--congestion", type=float, default=8.0, help="seconds the uplink stays congested")
+    parser.add_argument("--recovery", type=float, default=3.0, help="seconds measured after it clears")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"Glove at {1 / GLOVE_INTERVAL:.0f} Hz, uplink {args.rate} B/s for {args.congestion:.0f} s")
+    print(f"{'wire':<6}{'backpressure':<13}{'sent':>6}{'held':>6}{'cuts':>5}{'arrived':>8}{'age p50':>8}"
+          f"{'p99':>7}{'max':>7}{'> 500 ms':>9}{'drain ms':>9}")
+    for wire_format in (wire.FORMAT_BINARY, wire.FORMAT_JSON):
+        for gate in (False, True):
+            r = asyncio.run(run_case(gate, wire_format, args.rate, args.congestion, args.recovery))
+            fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+            print(f"{wire_format:<6}{'on' if gate else 'off':<13}{r['sent']:>6}{r['held']:>6}{r['cuts']:>5}"
+                  f"{r['arrived']:>8}{fmt(r['p50']):>8}{fmt(r['p99']):>7}{fmt(r['max']):>7}{r['stale']:>9}"
+                  f"{r['drain_ms']:>9.0f}")
+    print("age = ms from glove send to server arrival for frames arriving from the start of the congestion; "
+          "drain = time after the link recovers until frames arrive < 50 ms old")
+    print("the proxy's own socket buffer (~1 KB, invisible to the glove on loopback) sets a floor under both")
+
+
+if __name__ == "__main__":
+    main()
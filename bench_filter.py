@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import argparse
+import math
+import random
+import time
+
+from calibration import ServoMapper
+from motion_filter import FILTER_EMA, FILTER_ONE_EURO, MotionFilter
+
+FRAME_INTERVAL_US = 20000
+
+
+def synthetic_glove(frames, noise, seed=1):
+    # Slow open/close of every finger at 0.5 Hz plus sensor noise, 50 Hz
+    rng = random.Random(seed)
+    samples = []
+    for n in range(frames):
+        t = n * FRAME_INTERVAL_US / 1e6
+        clean = 1500 + 900 * math.sin(2 * math.pi * 0.5 * t)
+        samples.append([int(clean + rng.gauss(0, noise)) for _ in range(5)])
+    return samples
+
+
+def configurations(prediction_ms):
+    return (
+        ("table only", lambda: ServoMapper()),
+        ("hysteresis 20", lambda: ServoMapper(hysteresis=20)),
+        ("ema 0.3", lambda: ServoMapper(motion_filter=MotionFilter(FILTER_EMA, alpha=0.3))),
+        ("one euro", lambda: ServoMapper(motion_filter=MotionFilter(FILTER_ONE_EURO))),
+        ("one euro + hyst", lambda: ServoMapper(motion_filter=MotionFilter(FILTER_ONE_EURO), hysteresis=20)),
+        (f"one euro + {prediction_ms} ms pred", lambda: ServoMapper(
+            motion_filter=MotionFilter(FILTER_ONE_EURO, prediction_ms=prediction_ms), hysteresis=20)),
+    )
+
+
+def run(samples, prediction_ms, repeat):
+    rows = []
+    for name, make in configurations(prediction_ms):
+        mapper = make()
+        writes = 0
+        changes = 0
+        last = None
+        for n, values in enumerate(samples):
+            out = tuple(mapper.map(values, n * FRAME_INTERVAL_US))
+            if out != last:
+                writes += 1
+                if last:
+                    changes += sum(a != b for a, b in zip(out, last))
+                last = out
+        best = None
+        for _ in range(repeat):
+            mapper.reset()
+            start = time.perf_counter_ns()
+            for n, values in enumerate(samples):
+                mapper.map(values, n * FRAME_INTERVAL_US)
+            elapsed = (time.perf_counter_ns() - start) / len(samples)
+            best = elapsed if best is None else min(best, elapsed)
+        rows.append((name, best, changes, writes))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame cost and serial writes of the motion filter stage")
+    parser.add_argument("--frames", type=int, default=20000)
+    parser.add_argument("--noise", type=float, default=30.0, help="sensor noise (std dev, glove units)")
+    parser.add_argument("--prediction-ms", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = synthetic_glove(args.frames, args.noise)
+    # Level changes of the noiseless signal are the floor; everything above
+    # is jitter chattering across a quantization boundary
+    ideal = run(synthetic_glove(args.frames, 0.0), args.prediction_ms, 1)[0][2]
+    print(f"{args.frames} frames @ 50 Hz, noise {args.noise:g}, noiseless signal: {ideal} level changes")
+    print(f"{'stage':<28}{'ns/frame':>10}{'changes':>9}{'writes':>8}")
+    for name, ns, changes, writes in run(samples, args.prediction_ms, args.repeat):
+        print(f"{name:<28}{ns:>10.0f}{changes:>9}{writes:>8}")
+
+
+if __name__ == "__main__":
+    main()
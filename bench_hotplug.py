@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import server
+from fake_robot import FakeRobotHand
+from server import HandController
+
+FRAME_CYCLE = ([500] * 5, [1000] * 5, [1500] * 5)
+FRAME_INTERVAL = 0.02
+
+
+class Socket:
+    # A stable path for a robot that comes and goes, the way udev keeps
+    # /dev/serial/by-id/... pointing at whichever tty the board got
+    def __init__(self, path):
+        self.path = path
+        self.robot = None
+
+    def plug(self):
+        self.robot = FakeRobotHand().start()
+        os.symlink(self.robot.port, self.path)
+        return time.monotonic()
+
+    def unplug(self):
+        os.unlink(self.path)
+        self.robot.stop()
+
+
+async def _stream(ctrl, sessions, stop):
+    n = 0
+    while not stop.is_set():
+        values = FRAME_CYCLE[n % len(FRAME_CYCLE)]
+        for session in sessions:
+            ctrl.process_frame(session, values)
+        n += 1
+        await asyncio.sleep(FRAME_INTERVAL)
+
+
+async def _until_applied(socket, since, timeout=10.0):
+    # Seconds from plug-in until the robot applied its first command
+    while socket.robot.applied_count == 0:
+        if time.monotonic() - since > timeout:
+            return None
+        await asyncio.sleep(0.005)
+    return time.monotonic() - since
+
+
+async def run(robots, replugs, outage, poll_interval, protocol):
+    server.SERIAL_POLL_INTERVAL = poll_interval
+    # Binary negotiation waits for the boot banner (up to 2.5 s), which a
+    # pty robot already sent before the port was opened
+    server.ROBOT_PROTOCOL = protocol
+    workdir = tempfile.mkdtemp(prefix="robohand-hotplug-")
+    sockets = [Socket(os.path.join(workdir, f"robot{i}")) for i in range(robots)]
+    ctrl = HandController(routes={f"hand{i}": [s.path] for i, s in enumerate(sockets)})
+    sessions = [ctrl.open_session(hand_id=f"hand{i}") for i in range(robots)]
+    stop = asyncio.Event()
+
+    # First robot is missing at startup and plugged in later
+    for s in sockets[1:]:
+        s.plug()
+    ctrl.start()
+    streamer = asyncio.create_task(_stream(ctrl, sessions, stop))
+    await asyncio.sleep(outage)
+    first = await _until_applied(sockets[0], sockets[0].plug())
+    print(f"robot0 missing at start, plugged in: first command applied after {first * 1000:.0f} ms")
+
+    for n in range(replugs):
+        await asyncio.sleep(1.0)
+        others = [s.robot.applied_count for s in sockets[1:]]
+        sockets[0].unplug()
+        await asyncio.sleep(outage)
+        others = [s.robot.applied_count - before for s, before in zip(sockets[1:], others)]
+        recovered = await _until_applied(sockets[0], sockets[0].plug())
+        shown = f"{recovered * 1000:.0f} ms" if recovered is not None else "never"
+        print(f"replug {n + 1}: robot0 back after {shown}"
+              + (f" | other robots applied {others} commands meanwhile" if others else ""))
+
+    await asyncio.sleep(0.5)
+    stop.set()
+    await streamer
+    for port, stats in ctrl.serial_manager.stats().items():
+        out = ctrl.serial_outputs[port]
+        print(f"{os.path.basename(port)}: opens {stats['opens']} | lost {stats['lost']} | "
+              f"{stats['writes']} writes, {stats['bytes_written']} B, {stats['write_bytes_per_s']:.0f} B/s | "
+              f"{stats['errors']} errors | scheduler {out.written_count} written, {out.coalesced_count} coalesced")
+    ctrl.stop()
+    for s in sockets:
+        s.unplug()
+    os.rmdir(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Robot ports that disappear and come back, on pty pairs")
+    parser.add_argument("--robots", type=int, default=2)
+    parser.add_argument("--replugs", type=int, default=3)
+    parser.add_argument("--outage", type=float, default=1.0, help="seconds a robot stays unplugged")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--protocol", choices=("binary", "ascii"), default="binary")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(name)s: %(message)s")
+    asyncio.run(run(args.robots, args.replugs, args.outage, args.poll_interval, args.protocol))
+
+
+if __name__ == "__main__":
+    main()
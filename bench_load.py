@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from collections import deque
+
+import websockets
+
+import acks
+import wire
+from metrics import LatencyHistogram, PERCENTILES, percentile_name
+
+DEFAULT_PORT = 50151
+# Values that land on different quantization levels, so no frame is
+# deduplicated and every frame is acked
+FRAME_CYCLE = ([500] * 5, [1000] * 5, [1500] * 5)
+
+
+def _run_server(kind, port, baud_rate, workers=1, robots=1, use_uvloop=False):
+    # Server process: the robot serial ports are drained ptys
+    from pty_serial import PtyLoopback
+
+    ports = [PtyLoopback(baud_rate).start().port for _ in range(robots)]
+    sys.stdout = open(os.devnull, "w")
+    if kind == "server2":
+        import server2 as target
+        target.ROBOT_SERIAL_PORT = ports[0]
+        target.WEBSOCKET_PORT = port
+        asyncio.run(target.main())
+        return
+    import server as target
+    # Every glove drives all robots; sharded, most frames cross to the
+    # worker owning the port
+    target.HAND_ROUTES = {"default": ports}
+    # The drained pty does not answer the binary protocol handshake
+    target.ROBOT_PROTOCOL = "ascii"
+    if baud_rate:
+        # The pty pushes nothing back, so the writer's own pacing at the
+        # port's baud rate is the only thing that limits it
+        target.ROBOT_BAUD_RATE = baud_rate
+    target.METRICS_PORT = None
+    target.WEBSOCKET_PORT = port
+    target.SERVER_MODE = "sharded" if kind == "sharded" else "full"
+    target.SERVER_WORKERS = workers
+    target.USE_UVLOOP = use_uvloop
+    target.run()
+
+
+def start_server(kind, port, baud_rate=None, workers=1, robots=1, use_uvloop=False, timeout=10.0):
+    # The sharded supervisor forks workers, which a daemon process may not
+    proc = multiprocessing.Process(target=_run_server, args=(kind, port, baud_rate, workers, robots, use_uvloop),
+                                   daemon=kind != "sharded")
+    proc.start()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and proc.is_alive():
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    # Sharded: the first worker up accepts; give the rest a moment too
+    time.sleep(0.5 if kind != "sharded" else 0.5 + 0.1 * workers)
+    return proc
+
+
+def _children(pid):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def _proc_usage(pid):
+    # (cpu seconds, rss bytes) from /proc, summed over the process and its
+    # children (sharded workers); None where unavailable
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+    except (OSError, IndexError, StopIteration, ValueError):
+        return None, None
+    for child in _children(pid):
+        child_cpu, child_rss = _proc_usage(child)
+        if child_cpu is not None:
+            cpu += child_cpu
+            rss += child_rss
+    return cpu, rss
+
+
+def _ack_count(message):
+    # Frames covered by one ack message (cumulative acks cover several)
+    if isinstance(message, bytes):
+        if wire.message_type(message) == wire.MSG_CUMULATIVE_ACK:
+            return wire.decode_cumulative_ack(message)[2]
+        return 1
+    data = json.loads(message)
+    return data["ack"]["count"] if "ack" in data else 1
+
+
+async def _glove(uri, wire_format, ack_mode, rate, duration, hist, stats):
+    sent_at = deque()
+    try:
+        async with websockets.connect(uri, ping_interval=None) as websocket:
+            await websocket.send(wire.encode_hello((wire_format,), ack={"mode": ack_mode}))
+            # Servers without negotiation (server2) just ack the hello; they
+            # only understand JSON frames
+            try:
+                hello = json.loads(await websocket.recv()).get("hello")
+            except (ValueError, AttributeError):
+                hello = None
+            negotiated = hello.get("format") if isinstance(hello, dict) else None
+            if negotiated != wire_format:
+                stats["format_fallbacks"] += 1
+                wire_format = wire.FORMAT_JSON
+
+            async def read_acks():
+                async for message in websocket:
+                    stats["ack_messages"] += 1
+                    # TCP keeps order: an ack covering n frames covers the
+                    # n oldest unacked ones; the newest of them gives the RTT
+                    sent_ns = None
+                    for _ in range(_ack_count(message)):
+                        if sent_at:
+                            sent_ns = sent_at.popleft()
+                            stats["acked"] += 1
+                    if sent_ns is not None:
+                        hist.record((time.perf_counter_ns() - sent_ns) // 1000)
+
+            reader = asyncio.create_task(read_acks())
+            interval = 1.0 / rate
+            next_send = time.perf_counter()
+            end = next_send + duration
+            seq = 0
+            while next_send < end:
+                values = FRAME_CYCLE[seq % len(FRAME_CYCLE)]
+                if wire_format == wire.FORMAT_BINARY:
+                    message = wire.encode_frame(seq, wire.now_us(), values)
+                else:
+                    message = json.dumps({"finger_values": values, "timestamp_ms": int(time.time() * 1000)})
+                sent_at.append(time.perf_counter_ns())
+                await websocket.send(message)
+                seq += 1
+                stats["sent"] += 1
+                next_send += interval
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats["late"] += 1
+            # Give in-flight acks a moment before closing
+            await asyncio.sleep(min(0.5, 20 * interval))
+            reader.cancel()
+    except (OSError, websockets.exceptions.WebSocketException) as e:
+        stats["errors"] += 1
+        stats["last_error"] = str(e)
+
+
+def _load_worker(uri, clients, wire_format, ack_mode, rate, duration):
+    hist = LatencyHistogram()
+    stats = {"sent": 0, "acked": 0, "ack_messages": 0, "late": 0, "errors": 0, "format_fallbacks": 0}
+
+    async def run():
+        await asyncio.gather(*(_glove(uri, wire_format, ack_mode, rate, duration, hist, stats)
+                               for _ in range(clients)))
+
+    asyncio.run(run())
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    stats["client_cpu_s"] = usage.ru_utime + usage.ru_stime
+    stats["hist_counts"] = hist.counts
+    stats["hist_total"] = hist.total
+    stats["hist_max"] = hist.max
+    return stats
+
+
+def _merge(results):
+    hist = LatencyHistogram()
+    merged = {"sent": 0, "acked": 0, "ack_messages": 0, "late": 0, "errors": 0, "format_fallbacks": 0,
+              "client_cpu_s": 0.0}
+    for stats in results:
+        for key in merged:
+            merged[key] += stats[key]
+        for index, count in enumerate(stats["hist_counts"]):
+            hist.counts[index] += count
+        hist.count += sum(stats["hist_counts"])
+        hist.total += stats["hist_total"]
+        hist.max = max(hist.max, stats["hist_max"])
+    return merged, hist
+
+
+def run_step(uri, clients, processes, wire_format, ack_mode, rate, duration, server_pid, idle_rss=None):
+    processes = max(1, min(processes, clients))
+    shares = [clients // processes + (1 if i < clients % processes else 0) for i in range(processes)]
+    cpu_before, _ = _proc_usage(server_pid) if server_pid else (None, None)
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.starmap(_load_worker, [(uri, n, wire_format, ack_mode, rate, duration) for n in shares])
+    elapsed = time.perf_counter() - start
+    cpu_after, rss = _proc_usage(server_pid) if server_pid else (None, None)
+    merged, hist = _merge(results)
+    # Without acks the client cannot tell what arrived; count what was sent
+    delivered = merged["sent"] if ack_mode == acks.ACK_NONE else merged["acked"]
+
+    step = {
+        "clients": clients,
+        "offered_fps": clients * rate,
+        "sent": merged["sent"],
+        "acked": merged["acked"],
+        "ack_messages": merged["ack_messages"],
+        "throughput_fps": round(delivered / duration, 1),
+        "late_sends": merged["late"],
+        "errors": merged["errors"],
+        # Gloves sending JSON because the server did not take --format
+        "format_fallbacks": merged["format_fallbacks"],
+        "rtt_us": {percentile_name(q): hist.percentile(q) for q in PERCENTILES},
+        "rtt_mean_us": round(hist.total / hist.count, 1) if hist.count else 0.0,
+        "rtt_max_us": hist.max,
+        "client_cpu_s_per_conn": round(merged["client_cpu_s"] / clients, 4),
+        "wall_s": round(elapsed, 2),
+    }
+    if cpu_before is not None and cpu_after is not None:
+        step["server_cpu_pct"] = round(100 * (cpu_after - cpu_before) / elapsed, 1)
+        step["server_cpu_ms_per_conn_s"] = round(1000 * (cpu_after - cpu_before) / clients / duration, 3)
+    if rss is not None:
+        step["server_rss_bytes"] = rss
+        if idle_rss is not None:
+            # Growth over the server with no gloves connected
+            step["server_rss_per_conn_bytes"] = (rss - idle_rss) // clients
+    return step
+
+
+def find_knee(steps, factor):
+    # First step where p99 RTT blows past `factor` x the lightest load's p99,
+    # or the server stops keeping up with the offered rate
+    if not steps:
+        return None
+    base = max(steps[0]["rtt_us"]["p99"], 1)
+    for step in steps:
+        if step["rtt_us"]["p99"] > factor * base or step["throughput_fps"] < 0.9 * step["offered_fps"]:
+            return step["clients"]
+    return None
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless load test for the WebSocket control path")
+    parser.add_argument("--target", choices=("server", "server2", "sharded"), default="server",
+                        help="server to start with pty robot stand-ins")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (sharded)")
+    parser.add_argument("--robots", type=int, default=1, help="pty robots every glove drives (server, sharded)")
+    parser.add_argument("--uvloop", action="store_true", help="run the server on uvloop if installed")
+    parser.add_argument("--uri", help="benchmark an already running server instead")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", default="1,2,4,8,16,32", help="comma-separated glove counts, one step each")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="load generator processes")
+    parser.add_argument("--rate", type=float, default=50.0, help="frames per second per glove")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per step")
+    parser.add_argument("--format", choices=wire.SUPPORTED_FORMATS, default=wire.FORMAT_BINARY)
+    parser.add_argument("--ack-mode", choices=acks.ACK_MODES, default=acks.ACK_PER_FRAME)
+    parser.add_argument("--baud", type=int, default=None, help="robot link baud rate: the server's writer "
+                                                                  "and the pty drain are paced at it")
+    parser.add_argument("--knee-factor", type=float, default=3.0)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    server_proc = None
+    uri = args.uri
+    if not uri:
+        server_proc = start_server(args.target, args.port, args.baud, args.workers, args.robots, args.uvloop)
+        uri = f"ws://127.0.0.1:{args.port}"
+    idle_rss = _proc_usage(server_proc.pid)[1] if server_proc else None
+
+    steps = []
+    try:
+        for clients in (int(c) for c in args.clients.split(",")):
+            step = run_step(uri, clients, args.processes, args.format, args.ack_mode, args.rate, args.duration,
+                            server_proc.pid if server_proc else None, idle_rss)
+            steps.append(step)
+            rtt = step["rtt_us"]
+            print(f"{clients:>4} gloves | {step['throughput_fps']:>8.1f} fps of {step['offered_fps']:.0f} | "
+                  f"rtt p50 {rtt['p50'] / 1000:.2f} ms p99 {rtt['p99'] / 1000:.2f} ms "
+                  f"p999 {rtt['p999'] / 1000:.2f} ms | {step['ack_messages']} acks | server cpu {step.get('server_cpu_pct', '-')}% | "
+                  f"errors {step['errors']}")
+            if step["format_fallbacks"]:
+                print(f"       {step['format_fallbacks']} gloves fell back to JSON frames")
+    finally:
+        if server_proc:
+            server_proc.terminate()
+            server_proc.join(2)
+
+    knee = find_knee(steps, args.knee_factor)
+    report = {
+        "benchmark": "websocket_control_path",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "target": args.uri or args.target,
+        "workers": args.workers if args.target == "sharded" else 1,
+        "robots": args.robots,
+        "format": args.format,
+        "ack_mode": args.ack_mode,
+        "rate_hz": args.rate,
+        "duration_s": args.duration,
+        "server_idle_rss_bytes": idle_rss,
+        "steps": steps,
+        "knee_clients": knee,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Latency knee: {knee if knee else 'not reached'} | results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import argparse
+import math
+import random
+
+from metrics import LatencyHistogram
+from playout import PlayoutBuffer
+
+FRAME_INTERVAL_US = 20_000
+BASE_TRANSIT_US = 3_000
+
+
+def _arrivals(profile, frames, rng):
+    # (arrival us, sender us, values) for a 50 Hz finger sweep over a
+    # simulated link, in arrival order
+    out = []
+    for i in range(frames):
+        sent = 1_000_000 + i * FRAME_INTERVAL_US
+        transit = BASE_TRANSIT_US + rng.expovariate(1 / 2_000)
+        if profile == "bursty":
+            # Power save: every 2 s the AP holds frames for 100 ms and
+            # releases them in one burst
+            phase = sent % 2_000_000
+            if phase < 100_000:
+                transit += 100_000 - phase
+        elif profile == "reorder":
+            # A few frames take a slower path and land behind newer ones
+            if rng.random() < 0.03:
+                transit += 30_000
+        value = int(1500 + 900 * math.sin(i * FRAME_INTERVAL_US / 1e6 * math.pi))
+        out.append((sent + int(transit), sent, [value] * 5))
+    out.sort(key=lambda a: a[0])
+    return out
+
+
+def _jerk(samples):
+    # RMS second difference of what the mapper is fed, sampled every tick;
+    # 0 for a constant-speed sweep, large for hold-then-jump motion
+    diffs = [samples[i + 1] - 2 * samples[i] + samples[i - 1] for i in range(1, len(samples) - 1)]
+    return math.sqrt(sum(d * d for d in diffs) / len(diffs)) if diffs else 0.0
+
+
+def _gaps(times):
+    gaps = LatencyHistogram()
+    for a, b in zip(times, times[1:]):
+        gaps.record(b - a)
+    return gaps
+
+
+def run_direct(arrivals, end_us):
+    # Today's behaviour: each frame is applied the moment it arrives
+    applied = []
+    out_of_order = 0
+    newest = 0
+    for received, sent, values in arrivals:
+        applied.append((received, values[0]))
+        if sent < newest:
+            out_of_order += 1
+        newest = max(newest, sent)
+    ticks = []
+    index = 0
+    current = applied[0][1]
+    for tick in range(arrivals[0][0], end_us, FRAME_INTERVAL_US):
+        while index < len(applied) and applied[index][0] <= tick:
+            current = applied[index][1]
+            index += 1
+        ticks.append(current)
+    return {
+        "gaps": _gaps([t for t, _ in applied]),
+        "jerk": _jerk(ticks),
+        "out_of_order": out_of_order,
+        "latency": None,
+        "stats": None,
+    }
+
+
+def run_playout(arrivals, end_us, min_delay_ms, max_delay_ms):
+    latency = LatencyHistogram()
+    buffer = PlayoutBuffer(min_delay_ms, max_delay_ms, latency_histogram=latency)
+    applied = []
+    ticks = []
+    index = 0
+    current = None
+    for tick in range(arrivals[0][0], end_us, FRAME_INTERVAL_US):
+        while index < len(arrivals) and arrivals[index][0] <= tick:
+            received, sent, values = arrivals[index]
+            buffer.push(sent, values, received)
+            index += 1
+        frame = buffer.pop(tick, FRAME_INTERVAL_US)
+        if frame is not None:
+            current = frame[1][0]
+            applied.append(tick)
+        if current is not None:
+            ticks.append(current)
+    return {
+        "gaps": _gaps(applied),
+        "jerk": _jerk(ticks),
+        "out_of_order": 0,
+        "latency": latency,
+        "stats": buffer.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servo cadence with and without the playout buffer on a "
+                                                 "simulated jittery link")
+    parser.add_argument("--frames", type=int, default=3000, help="50 Hz glove frames per profile")
+    parser.add_argument("--min-delay-ms", type=float, default=5)
+    parser.add_argument("--max-delay-ms", type=float, default=150)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'profile':<9}{'mode':<9}{'gap p50':>8}{'gap p99':>8}{'gap max':>8}{'jerk':>7}{'reorder':>8}"
+          f"{'added p50':>10}{'added p99':>10}  buffer")
+    for profile in ("wifi", "bursty", "reorder"):
+        arrivals = _arrivals(profile, args.frames, random.Random(args.seed))
+        end_us = arrivals[-1][0] + 200_000
+        for mode, result in (("direct", run_direct(arrivals, end_us)),
+                             ("playout", run_playout(arrivals, end_us, args.min_delay_ms, args.max_delay_ms))):
+            gaps = result["gaps"]
+            latency = result["latency"]
+            added = (f"{latency.percentile(0.5) / 1000:>10.1f}{latency.percentile(0.99) / 1000:>10.1f}"
+                     if latency else f"{'-':>10}{'-':>10}")
+            stats = result["stats"]
+            shown = (f"delay {stats['delay_ms']} ms | {stats['underruns']} underruns | {stats['late']} late | "
+                     f"{stats['skipped']} skipped" if stats else "")
+            print(f"{profile:<9}{mode:<9}{gaps.percentile(0.5) / 1000:>8.1f}{gaps.percentile(0.99) / 1000:>8.1f}"
+                  f"{gaps.max / 1000:>8.1f}{result['jerk']:>7.1f}{result['out_of_order']:>8}{added}  {shown}")
+    print("gaps and added latency in ms; jerk = RMS second difference of the mapper input per 20 ms tick")
+
+
+if __name__ == "__main__":
+    main()
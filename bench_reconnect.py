@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import logging
+import math
+import statistics
+import time
+
+import websockets
+
+import client
+from backoff import Backoff
+from server import HandController
+
+GLOVE_INTERVAL = 0.02
+
+
+class FlappingProxy:
+    # TCP proxy in front of the server that can be taken down: every open
+    # connection is reset and new ones are refused until it comes back up,
+    # like a glove dropping off the Wi-Fi.
+    def __init__(self, upstream_port):
+        self.upstream_port = upstream_port
+        self.port = None
+        self._server = None
+        self._writers = set()
+
+    async def up(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port or 0, reuse_address=True)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def down(self):
+        self._server.close()
+        for writer in list(self._writers):
+            writer.transport.abort()
+        self._writers.clear()
+        await self._server.wait_closed()
+
+    async def _handle(self, client_reader, client_writer):
+        try:
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        except OSError:
+            client_writer.close()
+            return
+        self._writers.update((client_writer, up_writer))
+        await asyncio.gather(self._pump(client_reader, up_writer), self._pump(up_reader, client_writer),
+                             return_exceptions=True)
+
+    @staticmethod
+    async def _pump(reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class ArrivalController(HandController):
+    # Server that notes when each frame arrives
+    def __init__(self):
+        super().__init__(routes={"default": []})
+        self.arrivals = []
+
+    def _accept_frame(self, session, finger_values, timestamp_us, received_us):
+        self.arrivals.append(time.monotonic())
+        return super()._accept_frame(session, finger_values, timestamp_us, received_us)
+
+
+class _NoJitter:
+    @staticmethod
+    def random():
+        return 1.0
+
+
+async def _glove(glove_client):
+    # Finger sweep at 50 Hz; keeps going while the link is down
+    n = 0
+    while glove_client.is_running:
+        value = int(1500 + 900 * math.sin(n * GLOVE_INTERVAL * math.pi))
+        glove_client.finger_values[:] = [value] * 5
+        glove_client.new_frame.set()
+        n += 1
+        await asyncio.sleep(GLOVE_INTERVAL)
+
+
+async def run_case(policy, outages, outage, uptime):
+    ctrl = ArrivalController()
+    ws_server = await websockets.serve(ctrl.handle_client, "127.0.0.1", 0)
+    proxy = FlappingProxy(next(iter(ws_server.sockets)).getsockname()[1])
+    await proxy.up()
+
+    client.SERVER_ADDRESS = "127.0.0.1"
+    client.SERVER_PORT = proxy.port
+    client.ROBOT_FEEDBACK = False
+    glove_client = client.SerialHandClient()
+    if policy == "fixed 3 s":
+        # What the client did before: a flat 3 s between attempts
+        glove_client.backoff = Backoff(3.0, 3.0, factor=1.0, rng=_NoJitter)
+    glove_client.is_running = True
+    tasks = [asyncio.create_task(glove_client.data_sender_task()), asyncio.create_task(_glove(glove_client))]
+
+    windows = []
+    await asyncio.sleep(uptime)
+    for _ in range(outages):
+        went_down = time.monotonic()
+        await proxy.down()
+        await asyncio.sleep(outage)
+        await proxy.up()
+        windows.append((went_down, time.monotonic()))
+        await asyncio.sleep(uptime)
+    # Allow the slowest policy to come back before counting
+    await asyncio.sleep(3.5)
+    glove_client.is_running = False
+    glove_client.new_frame.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    recovery = []
+    dead = []
+    arrivals = ctrl.arrivals
+    for went_down, came_up in windows:
+        before = [t for t in arrivals if t < went_down]
+        after = [t for t in arrivals if t >= came_up]
+        if after:
+            recovery.append(after[0] - came_up)
+            if before:
+                dead.append(after[0] - before[-1])
+    sessions = list(ctrl.sessions.values()) + [s for s, _ in ctrl.retired_sessions.values()]
+    session = max(sessions, key=lambda s: s.message_count) if sessions else None
+    result = {
+        "policy": policy,
+        "outage_s": outage,
+        "recovered": len(recovery),
+        "outages": outages,
+        "recovery_ms_p50": statistics.median(recovery) * 1000 if recovery else None,
+        "recovery_ms_max": max(recovery) * 1000 if recovery else None,
+        "dead_hand_ms_mean": statistics.mean(dead) * 1000 if dead else None,
+        "reconnects": glove_client.reconnect_count,
+        "resumed": ctrl.metrics.counters.get("sessions_resumed", 0),
+        # Resumed counters mean the server's session saw every frame
+        "session_frames": session.message_count if session else 0,
+        "frames": len(arrivals),
+    }
+    await proxy.down()
+    ws_server.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recovery time of the glove client behind a flapping link")
+    parser.add_argument("--outages", type=int, default=5)
+    parser.add_argument("--outage", type=float, action="append", help="seconds the link stays down (repeatable)")
+    parser.add_argument("--uptime", type=float, default=1.0, help="seconds the link stays up between outages")
+    args = parser.parse_args()
+    # Every outage logs connection errors; only the table matters here
+    logging.disable(logging.WARNING)
+
+    print(f"{'policy':<12}{'outage s':>9}{'recovered':>10}{'p50 ms':>9}{'max ms':>9}{'dead ms':>9}"
+          f"{'resumed':>8}{'session/frames':>16}")
+    for outage in args.outage or (0.2, 1.0):
+        for policy in ("fixed 3 s", "backoff"):
+            r = asyncio.run(run_case(policy, args.outages, outage, args.uptime))
+            fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+            print(f"{policy:<12}{outage:>9.1f}{r['recovered']:>6}/{r['outages']:<3}"
+                  f"{fmt(r['recovery_ms_p50']):>9}{fmt(r['recovery_ms_max']):>9}{fmt(r['dead_hand_ms_mean']):>9}"
+                  f"{r['resumed']:>8}{r['session_frames']:>9}/{r['frames']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+import time
+
+import acks
+import wire
+from bench_load import DEFAULT_PORT, _git_revision, run_step, start_server
+
+
+def _default_workers():
+    # 1, 2, 4, ... up to the core count, and the core count itself
+    cores = os.cpu_count() or 1
+    counts = []
+    n = 1
+    while n < cores:
+        counts.append(n)
+        n *= 2
+    counts.append(max(cores, 2))
+    return ",".join(str(n) for n in counts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded server throughput from 1 to N worker processes")
+    parser.add_argument("--workers", default=_default_workers(), help="comma-separated worker counts")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clients", type=int, default=64, help="gloves per step")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="load generator processes")
+    parser.add_argument("--rate", type=float, default=100.0, help="frames per second per glove")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per step")
+    parser.add_argument("--robots", type=int, default=2, help="pty robots every glove drives")
+    parser.add_argument("--format", choices=wire.SUPPORTED_FORMATS, default=wire.FORMAT_BINARY)
+    parser.add_argument("--ack-mode", choices=acks.ACK_MODES, default=acks.ACK_PER_FRAME)
+    parser.add_argument("--uvloop", action="store_true", help="run the workers on uvloop if installed")
+    parser.add_argument("--output", default="bench_scaling.json")
+    args = parser.parse_args()
+
+    uri = f"ws://127.0.0.1:{args.port}"
+    steps = []
+    print(f"{args.clients} gloves x {args.rate:.0f} fps, {args.robots} robots, {os.cpu_count()} cores"
+          f"{', uvloop' if args.uvloop else ''}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        server_proc = start_server("sharded", args.port, workers=workers, robots=args.robots,
+                                   use_uvloop=args.uvloop)
+        try:
+            step = run_step(uri, args.clients, args.processes, args.format, args.ack_mode, args.rate,
+                            args.duration, server_proc.pid)
+        finally:
+            server_proc.terminate()
+            server_proc.join(5)
+        step["workers"] = workers
+        step["speedup"] = round(step["throughput_fps"] / max(steps[0]["throughput_fps"], 1), 2) if steps else 1.0
+        steps.append(step)
+        rtt = step["rtt_us"]
+        print(f"{workers:>3} workers | {step['throughput_fps']:>8.1f} fps of {step['offered_fps']:.0f} "
+              f"(x{step['speedup']:.2f}) | rtt p50 {rtt['p50'] / 1000:.2f} ms p99 {rtt['p99'] / 1000:.2f} ms | "
+              f"server cpu {step.get('server_cpu_pct', '-')}% | errors {step['errors']}")
+
+    report = {
+        "benchmark": "sharded_scaling",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "uvloop": args.uvloop,
+        "clients": args.clients,
+        "robots": args.robots,
+        "format": args.format,
+        "ack_mode": args.ack_mode,
+        "rate_hz": args.rate,
+        "duration_s": args.duration,
+        "steps": steps,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import time
+
+import serial
+
+import servo_protocol
+from fake_robot import BOOT_BAUD_RATE, FakeRobotHand
+from serial_output import SerialOutputScheduler
+
+CASES = (
+    (servo_protocol.PROTOCOL_ASCII, 9600),
+    (servo_protocol.PROTOCOL_BINARY, 9600),
+    (servo_protocol.PROTOCOL_ASCII, 115200),
+    (servo_protocol.PROTOCOL_BINARY, 115200),
+    (servo_protocol.PROTOCOL_BINARY, 250000),
+)
+
+
+def run_case(protocol_name, baud_rate, rate, duration, echo_ms):
+    # Commands per second only: the pty gives the writer no back-pressure
+    # (see pty_serial.py), so submit-to-servo latency would not be the
+    # hardware's
+    robot = FakeRobotHand(BOOT_BAUD_RATE).start()
+    ser = serial.Serial(robot.port, BOOT_BAUD_RATE, timeout=0)
+    if protocol_name == servo_protocol.PROTOCOL_BINARY:
+        if servo_protocol.negotiate(ser, baud_rate, echo_ms, boot_timeout=0.5) != protocol_name:
+            raise RuntimeError("fake robot did not accept the binary protocol")
+        protocol = servo_protocol.BinaryServoProtocol()
+    else:
+        ser.baudrate = baud_rate
+        robot.baud_rate = baud_rate
+        protocol = servo_protocol.AsciiServoProtocol()
+
+    output = SerialOutputScheduler(ser, protocol=protocol)
+    output.start()
+    interval = 1.0 / rate
+    next_send = time.perf_counter()
+    end = next_send + duration
+    tag = 0
+    while next_send < end:
+        # Every command differs, so none is deduplicated away
+        values = [500 + tag % 2000, 1000, 1500, 2000, 2500]
+        output.submit(values)
+        tag += 1
+        next_send += interval
+        time.sleep(max(0.0, next_send - time.perf_counter()))
+    applied_in_window = robot.applied_count
+    time.sleep(0.5)
+    output.stop()
+
+    result = {
+        "protocol": protocol_name,
+        "baud": baud_rate,
+        "offered_hz": rate,
+        "submitted": output.submitted_count,
+        "written": output.written_count,
+        "coalesced": output.coalesced_count,
+        "applied_hz": round(applied_in_window / duration, 1),
+        "bytes_per_command": len(protocol.encode(values)),
+        "echoes": robot.echo_count,
+    }
+    ser.close()
+    robot.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servo commands per second over a paced pty robot")
+    parser.add_argument("--rate", type=float, default=200.0, help="offered commands per second")
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--echo-ms", type=int, default=100, help="echo interval requested in binary mode")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'protocol':<9}{'baud':>8}{'bytes':>7}{'applied/s':>11}{'coalesced':>11}")
+    for protocol_name, baud_rate in CASES:
+        result = run_case(protocol_name, baud_rate, args.rate, args.duration, args.echo_ms)
+        results.append(result)
+        print(f"{protocol_name:<9}{baud_rate:>8}{result['bytes_per_command']:>7}{result['applied_hz']:>11.1f}"
+              f"{result['coalesced']:>11}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import server
+import wire
+from server import HandController
+from trajectory import EASINGS, SPACE_FINGER, Trajectory
+
+SNAPSHOT_INTERVAL = 0.02
+# testcli.py keys: a (open), c (close), 1-5 (one finger)
+MOVES = ([2500] * 5, [500] * 5, [1500, 500, 500, 500, 500], [1500, 2500, 500, 500, 500],
+         [2500] * 5, [1500] * 5, [500, 500, 2500, 2500, 500], [500] * 5)
+# Link model: one-way delay plus jitter, and a Wi-Fi stall per move that
+# holds everything sent during it (TCP keeps order and delivers in a burst)
+BASE_DELAY = 0.003
+JITTER = 0.002
+STALL = 0.15
+
+
+class CaptureOutput:
+    # Stands in for a robot link: 15-byte binary frames at 115200 baud
+    def __init__(self):
+        self.commands = []
+
+    def frame_interval(self):
+        return 15 * 10 / 115200
+
+    def submit(self, servo_values):
+        self.commands.append((time.monotonic(), servo_values))
+
+
+class _Socket:
+    async def send(self, message):
+        pass
+
+
+class Link:
+    def __init__(self, loop, stalls, rng):
+        self.loop = loop
+        self.stalls = stalls
+        self.rng = rng
+        self.bytes_sent = 0
+        self.messages = 0
+        self._last_delivery = 0.0
+
+    def send(self, message, deliver):
+        self.bytes_sent += len(message)
+        self.messages += 1
+        now = self.loop.time()
+        at = now + BASE_DELAY + self.rng.expovariate(1 / JITTER)
+        for start, end in self.stalls:
+            if start <= now < end:
+                at = max(at, end + BASE_DELAY)
+        at = self._last_delivery = max(at, self._last_delivery)
+        self.loop.call_at(at, deliver)
+
+
+async def run_mode(mode, move_time, seed):
+    ctrl = HandController(routes={"default": []})
+    session = ctrl.open_session(hand_id="default")
+    output = CaptureOutput()
+    session.outputs = [output]
+    loop = asyncio.get_running_loop()
+    begin = loop.time() + 0.1
+    commands = [begin + i * move_time for i in range(len(MOVES))]
+    # Even moves stall mid-motion, odd ones right when the key is pressed
+    stalls = [(t + 0.1, t + 0.1 + STALL) if i % 2 == 0 else (t - 0.02, t - 0.02 + STALL)
+              for i, t in enumerate(commands)]
+    link = Link(loop, stalls, random.Random(seed))
+    socket = _Socket()
+
+    def deliver_frame(values, sent_us):
+        ctrl._accept_frame(session, values, sent_us, wire.now_us())
+
+    if mode == "goal":
+        for i, values in enumerate([[1500] * 5] + list(MOVES)):
+            at = begin - 0.05 if i == 0 else commands[i - 1]
+            await asyncio.sleep(max(0.0, at - loop.time()))
+            goal = {"finger_values": values, "duration_ms": 0 if i == 0 else 400}
+            message = json.dumps({"goal": goal})
+            link.send(message, lambda goal=goal: ctrl._spawn(ctrl._handle_goal(session, socket, goal)))
+    else:
+        # testcli fixed mode: a snapshot every 20 ms; "eased" computes the
+        # same min-jerk move on the client and streams it
+        end = commands[-1] + move_time
+        current = [1500] * 5
+        trajectory = None
+        index = 0
+        while loop.time() < end:
+            now = loop.time()
+            while index < len(commands) and commands[index] <= now:
+                if mode == "eased":
+                    trajectory = Trajectory(SPACE_FINGER, current, MOVES[index], int(now * 1e6), 400)
+                else:
+                    current = list(MOVES[index])
+                index += 1
+            if trajectory is not None:
+                current = list(trajectory.sample(int(now * 1e6))[0])
+            sent_us = wire.now_us()
+            message = json.dumps({"finger_values": current, "timestamp_ms": int(time.time() * 1000)})
+            link.send(message, lambda values=list(current), sent_us=sent_us: deliver_frame(values, sent_us))
+            await asyncio.sleep(SNAPSHOT_INTERVAL)
+    await asyncio.sleep(move_time)
+    ctrl.stop()
+
+    commanded = output.commands
+    steps = [max(abs(a - b) for a, b in zip(v0, v1)) for (_, v0), (_, v1) in zip(commanded, commanded[1:])]
+    # Longest time the servos stood still in the middle of a move
+    holds = []
+    reaction = []
+    for t in commands:
+        window = [c for c in commanded if t <= c[0] < t + 0.4]
+        # Servo pose when the key was pressed
+        before = [c[1] for c in commanded if c[0] < t][-1:]
+        moving = [c for c in window if [c[1]] != before]
+        if moving:
+            reaction.append(moving[0][0] - t)
+        times = [c[0] for c in window]
+        if len(times) >= 2:
+            holds.append(max(b - a for a, b in zip(times, times[1:])))
+    return {
+        "mode": mode,
+        "messages": link.messages,
+        "bytes": link.bytes_sent,
+        "commands": len(commanded),
+        "max_step": max(steps) if steps else 0,
+        # None when each move was a single command (nothing in between)
+        "hold_ms": max(holds) * 1000 if holds else None,
+        "reaction_ms": sorted(reaction)[len(reaction) // 2] * 1000 if reaction else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Goal poses vs streamed snapshots over a link that stalls")
+    parser.add_argument("--move-time", type=float, default=0.8, help="seconds between key presses")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    print(f"{len(MOVES)} moves, {STALL * 1000:.0f} ms stall per move, easings: {', '.join(EASINGS)}, "
+          f"servo levels {server.SERVO_LEVELS or 'off'}")
+    print(f"{'mode':<10}{'msgs':>6}{'bytes':>8}{'servo cmds':>11}{'max step':>9}{'max hold ms':>12}"
+          f"{'reaction ms':>12}")
+    for mode in ("jump", "eased", "goal"):
+        r = asyncio.run(run_mode(mode, args.move_time, args.seed))
+        hold = f"{r['hold_ms']:.0f}" if r["hold_ms"] is not None else "-"
+        print(f"{r['mode']:<10}{r['messages']:>6}{r['bytes']:>8}{r['commands']:>11}{r['max_step']:>9}"
+              f"{hold:>12}{r['reaction_ms']:>12.0f}")
+    print("jump: testcli snapshots today; eased: client-side easing streamed at 50 Hz; goal: one goal per key")
+
+
+if __name__ == "__main__":
+    main()
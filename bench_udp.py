@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import websockets
+
+import wire
+from metrics import PERCENTILES, percentile_name
+from server import HandController
+from udp_transport import TRANSPORT_UDP, UdpFrameSender
+
+FRAME_CYCLE = ([500] * 5, [1000] * 5, [1500] * 5)
+
+
+class LossyTcpProxy:
+    # Emulates TCP loss without netem: a "lost" segment is delivered one
+    # retransmission timeout late and everything behind it waits, which is
+    # the head-of-line blocking a real retransmit causes.
+    def __init__(self, upstream_port, loss, rto):
+        self.upstream_port = upstream_port
+        self.loss = loss
+        self.rto = rto
+        self.port = None
+        self.lost_count = 0
+
+    async def start(self):
+        server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    async def _handle(self, client_reader, client_writer):
+        up_reader, up_writer = await asyncio.open_connection("127.0.0.1", self.upstream_port)
+        await asyncio.gather(self._pump(client_reader, up_writer, lossy=True),
+                             self._pump(up_reader, client_writer, lossy=False),
+                             return_exceptions=True)
+
+    async def _pump(self, reader, writer, lossy):
+        try:
+            while data := await reader.read(65536):
+                if lossy and random.random() < self.loss:
+                    self.lost_count += 1
+                    await asyncio.sleep(self.rto)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class LossyUdpProxy(asyncio.DatagramProtocol):
+    def __init__(self, upstream_port, loss):
+        self.upstream = ("127.0.0.1", upstream_port)
+        self.loss = loss
+        self.lost_count = 0
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if random.random() < self.loss:
+            self.lost_count += 1
+            return
+        self.transport.sendto(data, self.upstream)
+
+
+async def run_case(transport, loss, rto, frames, rate):
+    ctrl = HandController(routes={"default": []})
+    udp_server = await ctrl.start_udp("127.0.0.1", 0)
+    ws_server = await websockets.serve(ctrl.handle_client, "127.0.0.1", 0)
+    ws_port = next(iter(ws_server.sockets)).getsockname()[1]
+    loop = asyncio.get_running_loop()
+
+    if transport == TRANSPORT_UDP:
+        # Control channel direct, frames through the lossy path
+        ws_uri = f"ws://127.0.0.1:{ws_port}"
+        proxy_transport, proxy = await loop.create_datagram_endpoint(
+            lambda: LossyUdpProxy(ctrl.udp_port, loss), local_addr=("127.0.0.1", 0))
+        proxy_port = proxy_transport.get_extra_info("sockname")[1]
+        proxy_server = None
+    else:
+        proxy = LossyTcpProxy(ws_port, loss, rto)
+        proxy_server = await proxy.start()
+        ws_uri = f"ws://127.0.0.1:{proxy.port}"
+        proxy_transport = None
+
+    async with websockets.connect(ws_uri, ping_interval=None) as websocket:
+        transports = (TRANSPORT_UDP,) if transport == TRANSPORT_UDP else None
+        await websocket.send(wire.encode_hello((wire.FORMAT_BINARY,), transports=transports))
+        hello = json.loads(await websocket.recv())["hello"]
+        # Same host, same monotonic clock: offset is exactly zero
+        await websocket.send(wire.encode_clock_report(0, 0))
+        reader = asyncio.create_task(_discard(websocket))
+        udp = None
+        if transport == TRANSPORT_UDP:
+            udp = await UdpFrameSender.connect("127.0.0.1", proxy_port, hello["udp"]["key"])
+
+        interval = 1.0 / rate
+        next_send = time.perf_counter()
+        for seq in range(frames):
+            values = FRAME_CYCLE[seq % len(FRAME_CYCLE)]
+            if udp:
+                udp.send(seq, wire.now_us(), values)
+            else:
+                await websocket.send(wire.encode_frame(seq, wire.now_us(), values))
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        await asyncio.sleep(max(0.5, 2 * rto))
+        reader.cancel()
+        if udp:
+            udp.close()
+
+    network = ctrl.metrics.histogram("network")
+    result = {
+        "transport": transport,
+        "loss": loss,
+        "sent": frames,
+        "delivered": network.count,
+        "lost_or_delayed_segments": proxy.lost_count,
+        "stale_dropped": ctrl.metrics.counters.get("frames_stale", 0),
+        "latency_us": {percentile_name(q): network.percentile(q) for q in PERCENTILES},
+        "max_us": network.max,
+    }
+    ws_server.close()
+    udp_server.close()
+    if proxy_server:
+        proxy_server.close()
+    if proxy_transport:
+        proxy_transport.close()
+    return result
+
+
+async def _discard(websocket):
+    try:
+        async for _ in websocket:
+            pass
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail latency of WebSocket vs UDP frames under packet loss")
+    parser.add_argument("--loss", default="0,0.01,0.05", help="comma-separated loss probabilities")
+    parser.add_argument("--rto", type=float, default=0.2, help="emulated TCP retransmission timeout (s)")
+    parser.add_argument("--frames", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'transport':<10}{'loss':>6}{'delivered':>11}{'p50 ms':>9}{'p99 ms':>9}{'p999 ms':>9}{'max ms':>9}")
+    for loss in (float(v) for v in args.loss.split(",")):
+        for transport in ("websocket", TRANSPORT_UDP):
+            result = asyncio.run(run_case(transport, loss, args.rto, args.frames, args.rate))
+            results.append(result)
+            lat = result["latency_us"]
+            print(f"{transport:<10}{loss:>6.2f}{result['delivered']:>11}{lat['p50'] / 1000:>9.2f}"
+                  f"{lat['p99'] / 1000:>9.2f}{lat['p999'] / 1000:>9.2f}{result['max_us'] / 1000:>9.2f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
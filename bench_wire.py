@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import json
+import sys
+import time
+import timeit
+
+import wire
+
+ITERATIONS = 200000
+FINGER_VALUES = [1500, 1800, 1200, 2000, 900]
+
+
+def json_frame():
+    return json.dumps({"finger_values": FINGER_VALUES, "timestamp_ms": int(time.time() * 1000)})
+
+
+def json_ack():
+    return json.dumps({"ok": True, "seq": 12345, "ts_ms": int(time.time() * 1000)})
+
+
+def binary_frame():
+    return wire.encode_frame(12345, wire.now_us(), FINGER_VALUES)
+
+
+def binary_ack():
+    return wire.encode_ack(12345, wire.now_us())
+
+
+def measure(func, iterations):
+    return timeit.timeit(func, number=iterations) / iterations * 1e9
+
+
+def run(iterations):
+    rows = []
+    for name, make_frame, make_ack, decode_frame, decode_ack in (
+        ("json", json_frame, json_ack, json.loads, json.loads),
+        ("bin1", binary_frame, binary_ack, wire.decode_frame, wire.decode_ack),
+    ):
+        frame = make_frame()
+        ack = make_ack()
+        encode_ns = measure(make_frame, iterations) + measure(make_ack, iterations)
+        decode_ns = measure(lambda: decode_frame(frame), iterations) + \
+            measure(lambda: decode_ack(ack), iterations)
+        frame_bytes = len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+        ack_bytes = len(ack.encode("utf-8")) if isinstance(ack, str) else len(ack)
+        rows.append((name, encode_ns, decode_ns, frame_bytes, ack_bytes))
+    return rows
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS
+    print(f"Frame + ack round trip cost ({iterations} iterations)")
+    print(f"{'format':<8}{'encode ns':>12}{'decode ns':>12}{'frame B':>10}{'ack B':>8}")
+    for name, encode_ns, decode_ns, frame_bytes, ack_bytes in run(iterations):
+        print(f"{name:<8}{encode_ns:>12.0f}{decode_ns:>12.0f}{frame_bytes:>10}{ack_bytes:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import re
+import time
+from array import array
+
+from motion_filter import FILTER_EMA, MotionFilter
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for batch mapping of recordings
+    np = None
+
+FINGER_COUNT = 5
+INPUT_MIN = 500
+INPUT_MAX = 2500
+SERVO_MIN = 500
+SERVO_MAX = 2500
+
+_INT_RE = re.compile(r"-?\d+")
+
+
+def parse_metadata_line(line):
+    # "max_list: 2400 2380 ..." -> ("max", [2400, 2380, ...]); None otherwise
+    for kind in ("max", "min"):
+        prefix = f"{kind}_list:"
+        if line.startswith(prefix):
+            values = [int(v) for v in _INT_RE.findall(line[len(prefix):])]
+            if len(values) == FINGER_COUNT:
+                return kind, values
+            return None
+    return None
+
+
+class Calibration:
+    def __init__(self, mins=None, maxs=None):
+        self.mins = list(mins) if mins else [INPUT_MIN] * FINGER_COUNT
+        self.maxs = list(maxs) if maxs else [INPUT_MAX] * FINGER_COUNT
+
+    def update(self, kind, values):
+        if kind == "min":
+            self.mins = list(values)
+        elif kind == "max":
+            self.maxs = list(values)
+
+    def to_dict(self):
+        return {"min": self.mins, "max": self.maxs}
+
+    @classmethod
+    def from_dict(cls, data):
+        mins = [int(v) for v in data["min"]]
+        maxs = [int(v) for v in data["max"]]
+        if len(mins) != FINGER_COUNT or len(maxs) != FINGER_COUNT:
+            raise ValueError("Calibration needs 5 min and 5 max values")
+        return cls(mins, maxs)
+
+
+class ServoMapper:
+    # Glove value -> servo command through one precomputed table per finger,
+    # so mapping a frame is five clamps and five table lookups.
+    #   levels:        allowed servo positions (nearest wins), None = continuous
+    #   smoothing:     EMA weight of the newest sample in (0, 1), None = off;
+    #                  shorthand for an EMA motion_filter
+    #   motion_filter: MotionFilter run on the glove values before the lookup
+    #   hysteresis:    glove units a value must move past a level boundary
+    #                  before the output switches level, 0 = off
+    def __init__(self, calibration=None, levels=(500, 1000, 1500), servo_range=(SERVO_MIN, SERVO_MAX),
+                 smoothing=None, motion_filter=None, hysteresis=0):
+        self.calibration = calibration or Calibration()
+        self.levels = tuple(levels) if levels else None
+        self.servo_range = servo_range
+        self.smoothing = smoothing if smoothing and 0 < smoothing < 1 else None
+        if motion_filter is None and self.smoothing:
+            motion_filter = MotionFilter(FILTER_EMA, alpha=self.smoothing)
+        self.motion_filter = motion_filter
+        self.hysteresis = hysteresis
+        self.tables = [self._build_table(i) for i in range(FINGER_COUNT)]
+        # The same tables as tuples of shared int objects, indexed by the raw
+        # glove value: indexing an array boxes a new int every time and
+        # `value - INPUT_MIN` is one more, these hand out existing ones
+        ints = {}
+        self._lookup = [(None,) * INPUT_MIN + tuple(ints.setdefault(v, v) for v in table) for table in self.tables]
+        self._held = [None] * FINGER_COUNT
+        self._out = [0] * FINGER_COUNT
+        self._result = None
+        self._batch_table = None
+
+    def _build_table(self, finger):
+        lo = self.calibration.mins[finger]
+        hi = self.calibration.maxs[finger]
+        span = hi - lo
+        servo_lo, servo_hi = self.servo_range
+        levels = self.levels
+        table = array("H", bytes(2 * (INPUT_MAX - INPUT_MIN + 1)))
+        for raw in range(INPUT_MIN, INPUT_MAX + 1):
+            # span < 0 (min above max) means an inverted sensor; still works
+            pos = (raw - lo) / span if span else 0.5
+            pos = 0.0 if pos < 0.0 else 1.0 if pos > 1.0 else pos
+            servo = servo_lo + pos * (servo_hi - servo_lo)
+            if levels:
+                best = levels[0]
+                for level in levels:
+                    if abs(servo - level) < abs(servo - best):
+                        best = level
+                servo = best
+            table[raw - INPUT_MIN] = int(round(servo))
+        return table
+
+    @property
+    def stateless(self):
+        # True when every frame maps on its own, so map_batch gives the same result
+        return self.motion_filter is None and not self.hysteresis
+
+    def map(self, values, timestamp_us=None):
+        # -> tuple of servo values; the previous tuple itself when nothing
+        # changed, so a repeated pose costs no allocation
+        out = self._out
+        tables = self._lookup
+        if self.motion_filter:
+            if timestamp_us is None:
+                timestamp_us = time.monotonic_ns() // 1000
+            values = self.motion_filter.apply(values, timestamp_us)
+        hysteresis = self.hysteresis
+        held = self._held
+        changed = self._result is None
+        for i in range(FINGER_COUNT):
+            # Nearest input value, for filtered and raw (JSON float) values alike
+            value = int(values[i] + 0.5)
+            if value < INPUT_MIN:
+                value = INPUT_MIN
+            elif value > INPUT_MAX:
+                value = INPUT_MAX
+            table = tables[i]
+            servo = table[value]
+            if hysteresis:
+                last = held[i]
+                if last is not None and servo != last:
+                    # Only switch once the value is `hysteresis` deep into the new level
+                    lo = value - hysteresis
+                    hi = value + hysteresis
+                    if (table[lo if lo > INPUT_MIN else INPUT_MIN] == last or
+                            table[hi if hi < INPUT_MAX else INPUT_MAX] == last):
+                        servo = last
+                held[i] = servo
+            if servo != out[i]:
+                out[i] = servo
+                changed = True
+        if changed:
+            self._result = tuple(out)
+        return self._result
+
+    def lookup(self, values):
+        # One pose through the tables alone, without the filter or hysteresis
+        # state of the frame stream, e.g. the target of a goal
+        return tuple(self._lookup[i][INPUT_MIN if v < INPUT_MIN else INPUT_MAX if v > INPUT_MAX else int(v + 0.5)]
+                     for i, v in enumerate(values))
+
+    def reset(self):
+        self._held = [None] * FINGER_COUNT
+        if self.motion_filter:
+            self.motion_filter.reset()
+
+    def clone(self):
+        # Shares the (read-only) tables, gets its own filter and hysteresis state
+        mapper = ServoMapper.__new__(ServoMapper)
+        mapper.__dict__.update(self.__dict__)
+        if self.motion_filter:
+            mapper.motion_filter = self.motion_filter.clone()
+        mapper._held = [None] * FINGER_COUNT
+        mapper._out = [0] * FINGER_COUNT
+        mapper._result = None
+        return mapper
+
+    def map_batch(self, frames):
+        # frames: (N, 5) array-like of glove values -> (N, 5) uint16 servo values.
+        # Filtering and hysteresis are not applied; see `stateless`.
+        if np is None:
+            raise RuntimeError("NumPy is required for map_batch")
+        if self._batch_table is None:
+            self._batch_table = np.array([np.frombuffer(t, dtype=np.uint16) for t in self.tables])
+        frames = np.asarray(frames)
+        if frames.dtype.kind == "f":
+            # Same rounding as map()
+            frames = np.floor(frames + 0.5)
+        index = np.clip(frames.astype(np.int64), INPUT_MIN, INPUT_MAX) - INPUT_MIN
+        return self._batch_table[np.arange(FINGER_COUNT), index]
@@ -2,187 +2,520 @@
 
 import asyncio
 import json
+import logging
 import time
 import websockets
 import sys
-import serial
+
+import acks
+import backoff
+import backpressure
+import send_policy
+import wire
+from backoff import Backoff
+from backpressure import SendGate, queued_bytes
+from calibration import Calibration, parse_metadata_line
+from clock_sync import ClockSync
+from diagnostics import LoopWatchdog, SamplingProfiler
+from logs import debug_sink, frame_logger, setup_logging, shutdown_logging
+from recording import FrameRecorder
+from send_policy import SendPolicy
+from serial_manager import SerialManager
+from serial_reader import SerialLineReader
+from udp_transport import TRANSPORT_UDP, TRANSPORT_WEBSOCKET, UdpFrameSender
 
 # Configuration
 SERVER_ADDRESS = '192.168.20.101'
 SERVER_PORT = 50051
+# Glove port: a device path or a USB selector like 'usb:10c4:ea60' (see serial_manager.py)
 SIMULATOR_PORT = '/dev/ttyUSB0'
 BAUD_RATE = 9600
+SERIAL_POLL_INTERVAL = 1.0
+# Robot hand this glove drives on the server, and its token if the server requires one
+HAND_ID = 'default'
+AUTH_TOKEN = None
+# Wire formats offered to the server, most preferred first
+WIRE_FORMATS = (wire.FORMAT_BINARY, wire.FORMAT_JSON)
+HANDSHAKE_TIMEOUT = 2.0
+# Reconnect delays double from RECONNECT_INITIAL_DELAY up to RECONNECT_MAX_DELAY
+# seconds (jittered); None keeps retrying for as long as the client runs
+RECONNECT_INITIAL_DELAY = backoff.DEFAULT_INITIAL_DELAY
+RECONNECT_MAX_DELAY = backoff.DEFAULT_MAX_DELAY
+RECONNECT_MAX_ATTEMPTS = None
+PING_INTERVAL = 20
+# Outgoing bytes buffered before send() waits (websockets' write_limit)
+WEBSOCKET_WRITE_LIMIT = 32768
+# Ask for acks carrying the positions the robot confirmed
+ROBOT_FEEDBACK = True
+# 'cumulative' asks for one ack per ACK_EVERY frames or ACK_INTERVAL_MS,
+# 'frame' for one per frame, 'none' for no acks at all. Robot feedback only
+# rides on per-frame acks; it is not requested in the other modes
+ACK_MODE = acks.ACK_PER_FRAME
+ACK_EVERY = acks.DEFAULT_ACK_EVERY
+ACK_INTERVAL_MS = acks.DEFAULT_ACK_INTERVAL_MS
+# 'udp' sends frames as datagrams (binary format only) and keeps the
+# WebSocket for control and acks; falls back to 'websocket' if the server declines
+TRANSPORT = TRANSPORT_WEBSOCKET
+# Seconds between clock-offset pings to the server
+CLOCK_SYNC_INTERVAL = 1.0
+# Append every glove frame to this binary log (see recording.py); None disables
+RECORD_PATH = None
+# 'fixed' resends every SEND_INTERVAL seconds, 'adaptive' sends on change with idle keepalives
+SEND_MODE = send_policy.MODE_ADAPTIVE
+SEND_INTERVAL = 0.02
+SEND_DEADBAND = send_policy.DEFAULT_DEADBAND
+KEEPALIVE_INTERVAL = send_policy.DEFAULT_KEEPALIVE_INTERVAL
+MAX_SEND_RATE = send_policy.DEFAULT_MAX_RATE
+# WebSocket frames wait while more than SEND_HIGH_WATERMARK bytes are still
+# queued for the server (until it drains to SEND_LOW_WATERMARK) and only the
+# newest glove state goes out then; backpressure that persists lowers the
+# rate towards BACKPRESSURE_MIN_RATE (see backpressure.py)
+BACKPRESSURE = True
+SEND_HIGH_WATERMARK = backpressure.DEFAULT_HIGH_WATERMARK
+SEND_LOW_WATERMARK = backpressure.DEFAULT_LOW_WATERMARK
+BACKPRESSURE_MIN_RATE = backpressure.DEFAULT_MIN_RATE
+# DEBUG on the frame level shows every glove line and frame (rate limited)
+LOG_LEVEL = 'INFO'
+LOG_FRAME_LEVEL = 'INFO'
+# JSON-lines trace of sent frames, toggled at runtime with `kill -USR1 <pid>`
+DEBUG_SINK_PATH = 'glove-debug.jsonl'
+# Opt-in loop diagnostics (diagnostics.py): lag and the stacks of callbacks
+# blocking the loop longer than LOOP_STALL_MS; `kill -USR2 <pid>` starts and
+# stops a sampling profiler writing collapsed stacks next to PROFILE_PATH
+DIAGNOSTICS = False
+LOOP_STALL_MS = 50
+PROFILE_PATH = 'glove-profile.folded'
+PROFILE_INTERVAL_MS = 10
+
+log = logging.getLogger(__name__)
+frame_log = frame_logger(__name__)
 
 
 class SerialHandClient:
     def __init__(self):
         self.is_running = False
         self.finger_values = [1500, 1500, 1500, 1500, 1500]
+        # Binary frames are packed in place; see wire.encode_frame
+        self._frame_buffer = bytearray(wire.FRAME.size)
         self.message_count = 0
         self.ack_count = 0
-        self.connection_retry_count = 0
-        self.max_retries = 5
-        self.retry_delay = 3
+        self.drop_count = 0
+        self.last_ack_seq = None
+        self.backoff = Backoff(RECONNECT_INITIAL_DELAY, RECONNECT_MAX_DELAY, max_attempts=RECONNECT_MAX_ATTEMPTS)
+        self.reconnect_count = 0
+        self.resync_pending = False
+        # Handed out by the server in its hello; presented on reconnect so
+        # the server picks the old session (counters, calibration) back up
+        self.resume_token = None
+        self.serial_manager = None
         self.serial_port = None
-
-    async def initialize_serial(self):
-        try:
-            self.serial_port = serial.Serial(SIMULATOR_PORT, BAUD_RATE, timeout=1)
-            print(f"Connected to simulator at {SIMULATOR_PORT}")
-            return True
-        except Exception as e:
-            print(f"Serial error: {e}")
-            return False
+        self.wire_format = wire.FORMAT_JSON
+        self.server_hello = {}
+        self.udp = None
+        self.new_frame = asyncio.Event()
+        self.clock_sync = ClockSync()
+        # From feedback acks: what the robot reported back and how long it took
+        self.robot_confirmed = None
+        self.robot_actuation_us = None
+        # Per-finger range from the glove's max_list:/min_list: lines, forwarded to the server
+        self.calibration = None
+        self.calibration_pending = False
+        self.recorder = FrameRecorder(RECORD_PATH) if RECORD_PATH else None
+        self.send_policy = None
+        if SEND_MODE == send_policy.MODE_ADAPTIVE:
+            self.send_policy = SendPolicy(SEND_DEADBAND, KEEPALIVE_INTERVAL, MAX_SEND_RATE)
+        self.send_gate = None
+        if BACKPRESSURE:
+            max_rate = MAX_SEND_RATE if self.send_policy else 1 / SEND_INTERVAL
+            self.send_gate = SendGate(max_rate, SEND_HIGH_WATERMARK, SEND_LOW_WATERMARK,
+                                      min_rate=BACKPRESSURE_MIN_RATE)
+
+    def open_serial(self):
+        # The glove port is opened now if present and reopened by the serial
+        # manager's thread whenever it comes back (USB replug); frames keep
+        # going out with the last values while it is away
+        loop = asyncio.get_running_loop()
+        self._glove_opened = asyncio.Queue()
+        self.serial_manager = SerialManager(
+            BAUD_RATE, timeout=1, poll_interval=SERIAL_POLL_INTERVAL,
+            on_open=lambda port: loop.call_soon_threadsafe(self._glove_opened.put_nowait, port))
+        self.serial_port = self.serial_manager.add(SIMULATOR_PORT, name="glove")
+        self.serial_manager.start()
 
     async def serial_reader_task(self):
-        if not self.serial_port:
-            print("Serial port not initialized")
+        while self.is_running:
+            port = await self._glove_opened.get()
+            # Lines are read and framed in a background thread and delivered
+            # to handle_serial_line on the loop as soon as they complete
+            reader = SerialLineReader(port.serial, self.handle_serial_line)
+            reader.start()
+            try:
+                error = await reader.wait_closed()
+                if error:
+                    log.error("Serial read error: %s", error)
+            finally:
+                reader.stop()
+            port.report_lost(error or "closed")
+
+    def handle_serial_line(self, line):
+        frame_log.debug("Received raw data: %s", line)
+
+        # Calibration metadata lines
+        if line.startswith("max_list:") or line.startswith("min_list:"):
+            metadata = parse_metadata_line(line)
+            if not metadata:
+                log.warning("Invalid metadata: %s", line)
+                return
+            if self.calibration is None:
+                self.calibration = Calibration()
+            self.calibration.update(*metadata)
+            self.calibration_pending = True
+            self.new_frame.set()
             return
 
-        while self.is_running:
+        parts = line.split()
+        if len(parts) == 5:
             try:
-                if self.serial_port.in_waiting > 0:
-                    line = self.serial_port.readline().decode('utf-8').strip()
-                    if line:
-                        print(f"Received raw data: {line}")
-
-                        # Skip metadata lines
-                        if line.startswith("max_list:") or line.startswith("min_list:"):
-                            print("Skipping metadata line")
-                            continue
+                new_values = list(map(int, parts))
+                # Validate values
+                for i, val in enumerate(new_values):
+                    if 500 <= val <= 2500:
+                        self.finger_values[i] = val
+                    else:
+                        frame_log.warning("Value for finger %d out of range: %d", i + 1, val)
 
-                        parts = [p.strip() for p in line.split()]
-                        if len(parts) == 5:
-                            try:
-                                new_values = list(map(int, parts))
-                                # Validate values
-                                for i, val in enumerate(new_values):
-                                    if 500 <= val <= 2500:
-                                        self.finger_values[i] = val
-                                    else:
-                                        print(f"Warning: Value for finger {i + 1} out of range")
-
-                                print(f"Processed values: {self.finger_values}")
-                            except ValueError:
-                                print(f"Invalid data: {line}")
-                await asyncio.sleep(0.01)
-            except Exception as e:
-                print(f"Serial read error: {e}")
-                await asyncio.sleep(1)
+                frame_log.debug("Processed values: %s", self.finger_values)
+                if self.recorder:
+                    self.recorder.record(self.finger_values)
+                self.new_frame.set()
+            except ValueError:
+                frame_log.warning("Invalid data: %s", line)
 
     async def data_sender_task(self):
         uri = f"ws://{SERVER_ADDRESS}:{SERVER_PORT}"
         start_time = time.time()
 
-        while self.is_running and self.connection_retry_count < self.max_retries:
+        while self.is_running:
             try:
-                print(f"Connecting to server: {SERVER_ADDRESS}:{SERVER_PORT}...")
-                async with websockets.connect(uri, ping_interval=20, ping_timeout=20) as websocket:
-                    print(f"Connected to server: {SERVER_ADDRESS}:{SERVER_PORT}")
-                    self.connection_retry_count = 0  # Reset retry count
-
-                    # Start the response listener
+                log.info("Connecting to server: %s:%d...", SERVER_ADDRESS, SERVER_PORT)
+                async with websockets.connect(uri, ping_interval=PING_INTERVAL, ping_timeout=PING_INTERVAL,
+                                              write_limit=WEBSOCKET_WRITE_LIMIT) as websocket:
+                    log.info("Connected to server: %s:%d", SERVER_ADDRESS, SERVER_PORT)
+                    self.wire_format = await self.negotiate_format(websocket)
+                    if self.server_hello.get("error"):
+                        # Unknown hand or bad token; retrying will not fix it
+                        break
+                    # A server that accepts and then drops us should not get
+                    # reconnects at the shortest delay: the backoff only starts
+                    # over once the hello was answered (or, for servers without
+                    # one, with the first reply in listen_responses)
+                    if self.server_hello:
+                        self.backoff.reset()
+                    log.info("Wire format: %s", self.wire_format)
+                    await self.open_udp()
+                    if self.send_policy:
+                        self.send_policy.reset()
+                    if self.send_gate:
+                        self.send_gate.reset()
+                    self.last_ack_seq = None
+                    # The new server session starts uncalibrated unless it resumed the old one
+                    self.calibration_pending = self.calibration is not None and not self.server_hello.get("resumed")
+                    # Whatever the glove did while we were away goes out right now,
+                    # not after the send policy's next keepalive
+                    self.resync_pending = True
+
+                    # Start the response listener and clock sync
+                    self.clock_sync = ClockSync()
                     listener_task = asyncio.create_task(self.listen_responses(websocket))
+                    clock_task = asyncio.create_task(self.clock_sync_task(websocket))
 
                     while self.is_running:
                         try:
-                            payload = {
-                                "finger_values": self.finger_values,
-                                "timestamp_ms": int(time.time() * 1000),
-                            }
-                            json_data = json.dumps(payload)
-                            await websocket.send(json_data)
+                            if self.send_policy and not self.resync_pending:
+                                await self.wait_for_send()
+                                if not self.is_running:
+                                    break
+                            if listener_task.done():
+                                # Server went away; UDP sends would not notice
+                                break
+                            if self.calibration_pending:
+                                self.calibration_pending = False
+                                await websocket.send(json.dumps({"calibration": self.calibration.to_dict()}))
+                                log.info("Calibration sent: %s", self.calibration.to_dict())
+                            if self.udp:
+                                self.udp.send(self.message_count, wire.now_us(), self.finger_values)
+                            else:
+                                if self.send_gate:
+                                    # Held back while the link is backed up; the
+                                    # glove's next state replaces this frame
+                                    wait = self.send_gate.delay(queued_bytes(websocket.transport), time.monotonic())
+                                    if wait > 0:
+                                        await asyncio.sleep(wait)
+                                        continue
+                                await websocket.send(self.encode_frame())
+                                if self.send_gate:
+                                    self.send_gate.sent(time.monotonic())
+                            if self.send_policy:
+                                self.send_policy.sent(self.finger_values, time.monotonic())
+                            if debug_sink.enabled:
+                                debug_sink.record("sent", seq=self.message_count, values=list(self.finger_values),
+                                                  udp=self.udp is not None)
                             self.message_count += 1
+                            self.resync_pending = False
 
-                            # Only print status every 500 messages
+                            # Only log status every 500 messages
                             if self.message_count % 500 == 0:
                                 elapsed = time.time() - start_time
                                 rate = self.message_count / elapsed if elapsed > 0 else 0.0
-                                print(f"Status: {self.message_count} msgs | {rate:.1f} msg/s")
-
-                            await asyncio.sleep(0.02)  # 50 Hz
+                                log.info("Status: %d msgs | %.1f msg/s | %d acked | %d dropped | %s | %s | %s",
+                                         self.message_count, rate, self.ack_count, self.drop_count,
+                                         self.clock_status(), self.robot_status(), self.send_status())
+
+                            if not self.send_policy:
+                                # Send as soon as the glove delivers a frame,
+                                # otherwise repeat the last one every SEND_INTERVAL
+                                try:
+                                    await asyncio.wait_for(self.new_frame.wait(), timeout=SEND_INTERVAL)
+                                except asyncio.TimeoutError:
+                                    pass
+                                self.new_frame.clear()
 
                         except Exception as e:
-                            print(f"Error in data sender: {e}")
+                            log.warning("Error in data sender: %s", e)
                             break
 
-                    listener_task.cancel()
-                    try:
-                        await listener_task
-                    except asyncio.CancelledError:
-                        pass
+                    for task in (clock_task, listener_task):
+                        task.cancel()
+                        try:
+                            await task
+                        except asyncio.CancelledError:
+                            pass
+                    self.close_udp()
 
             except websockets.exceptions.ConnectionClosed as e:
-                print(f"Connection closed: {e}")
-                if self.is_running:
-                    self.connection_retry_count += 1
-                    if self.connection_retry_count < self.max_retries:
-                        print(
-                            f"Reconnection attempt {self.connection_retry_count}/{self.max_retries} in {self.retry_delay} seconds...")
-                        await asyncio.sleep(self.retry_delay)
-                    else:
-                        print("Max reconnection attempts reached. Exiting.")
-                        break
+                log.warning("Connection closed: %s", e)
             except Exception as e:
-                print(f"Connection error: {e}")
-                self.connection_retry_count += 1
-                if self.connection_retry_count < self.max_retries:
-                    print(
-                        f"Reconnection attempt {self.connection_retry_count}/{self.max_retries} in {self.retry_delay} seconds...")
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    print("Max reconnection attempts reached. Exiting.")
-                    break
+                log.warning("Connection error: %s", e)
+
+            if not self.is_running:
+                break
+            if self.backoff.exhausted:
+                log.error("Giving up after %d reconnection attempts", self.backoff.attempts)
+                break
+            delay = self.backoff.next_delay()
+            self.reconnect_count += 1
+            log.info("Reconnecting in %.0f ms (attempt %d)", delay * 1000, self.backoff.attempts)
+            await asyncio.sleep(delay)
 
         self.is_running = False
 
+    async def wait_for_send(self):
+        while self.is_running:
+            self.new_frame.clear()
+            delay = self.send_policy.delay(self.finger_values, time.monotonic())
+            if delay <= 0:
+                return
+            try:
+                await asyncio.wait_for(self.new_frame.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def negotiate_format(self, websocket):
+        transports = (TRANSPORT,) if TRANSPORT != TRANSPORT_WEBSOCKET else None
+        feedback = ROBOT_FEEDBACK and ACK_MODE == acks.ACK_PER_FRAME
+        if ROBOT_FEEDBACK and not feedback:
+            log.warning("Robot feedback needs ack_mode '%s'; not requested with '%s'", acks.ACK_PER_FRAME, ACK_MODE)
+        await websocket.send(wire.encode_hello(
+            WIRE_FORMATS, HAND_ID, AUTH_TOKEN, transports, feedback,
+            {"mode": ACK_MODE, "every": ACK_EVERY, "interval_ms": ACK_INTERVAL_MS}, self.resume_token))
+        self.server_hello = {}
+        try:
+            reply = await asyncio.wait_for(websocket.recv(), timeout=HANDSHAKE_TIMEOUT)
+            hello = json.loads(reply).get("hello")
+        except (asyncio.TimeoutError, ValueError, AttributeError):
+            # Older servers just ack the hello (or say nothing); stay on JSON
+            return wire.FORMAT_JSON
+        if not isinstance(hello, dict):
+            return wire.FORMAT_JSON
+        self.server_hello = hello
+        self.resume_token = hello.get("resume", self.resume_token)
+        if hello.get("resumed"):
+            log.info("Resumed server session %s", hello.get("session"))
+        if hello.get("error"):
+            log.error("Server rejected hello: %s", hello["error"])
+        if hello.get("format") in WIRE_FORMATS:
+            return hello["format"]
+        return wire.FORMAT_JSON
+
+    async def open_udp(self):
+        udp = self.server_hello.get("udp")
+        if TRANSPORT != TRANSPORT_UDP:
+            return
+        if not isinstance(udp, dict) or self.wire_format != wire.FORMAT_BINARY:
+            log.warning("Server did not offer UDP, sending frames over the WebSocket")
+            return
+        try:
+            self.udp = await UdpFrameSender.connect(SERVER_ADDRESS, udp["port"], udp["key"])
+            log.info("Sending frames over UDP to %s:%d", SERVER_ADDRESS, udp["port"])
+        except (OSError, KeyError, TypeError) as e:
+            log.warning("UDP setup failed (%s), sending frames over the WebSocket", e)
+
+    def close_udp(self):
+        if self.udp:
+            self.udp.close()
+            self.udp = None
+
+    def encode_frame(self):
+        if self.wire_format == wire.FORMAT_BINARY:
+            return wire.encode_frame(self.message_count, wire.now_us(), self.finger_values, self._frame_buffer)
+        return wire.encode_json_frame(self.finger_values, time.time() * 1000, wire.now_us())
+
+    async def clock_sync_task(self, websocket):
+        ping_id = 0
+        try:
+            while True:
+                ping_id += 1
+                await websocket.send(wire.encode_ping(ping_id, wire.now_us()))
+                # A few quick pings first so the estimate settles fast
+                await asyncio.sleep(CLOCK_SYNC_INTERVAL if ping_id > 4 else 0.1)
+                if self.clock_sync.ready:
+                    await websocket.send(wire.encode_clock_report(self.clock_sync.offset_us,
+                                                                  self.clock_sync.rtt_us))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def handle_pong(self, pong):
+        t3 = wire.now_us()
+        try:
+            self.clock_sync.add_sample(pong["t0"], pong["t1"], pong["t2"], t3)
+        except (KeyError, TypeError):
+            log.warning("Bad pong: %s", pong)
+
+    def clock_status(self):
+        if not self.clock_sync.ready:
+            return "clock: not synced"
+        return (f"offset {self.clock_sync.offset_us / 1000:+.1f} ms | "
+                f"rtt {self.clock_sync.rtt_us / 1000:.1f} ms")
+
+    def send_status(self):
+        if not self.send_gate:
+            return "backpressure off"
+        return self.send_gate.status()
+
+    def robot_status(self):
+        if self.robot_confirmed is None:
+            return "robot: no echo"
+        actuation = f"{self.robot_actuation_us / 1000:.1f} ms" if self.robot_actuation_us else "-"
+        return f"robot {self.robot_confirmed} | actuation {actuation}"
+
+    def handle_feedback(self, confirmed, actuation_us):
+        if any(confirmed):
+            self.robot_confirmed = confirmed
+        if actuation_us:
+            self.robot_actuation_us = actuation_us
+
+    def handle_cumulative_ack(self, seq, count, dropped):
+        self.ack_count += count
+        self.drop_count += acks.count_drops(self.last_ack_seq, seq, dropped)
+        self.last_ack_seq = seq
+
     async def listen_responses(self, websocket):
         try:
             async for msg in websocket:
+                if self.backoff.attempts:
+                    self.backoff.reset()
+                if isinstance(msg, bytes):
+                    try:
+                        msg_type = wire.message_type(msg)
+                        if msg_type == wire.MSG_CUMULATIVE_ACK:
+                            seq, _, count, dropped = wire.decode_cumulative_ack(msg)
+                            self.handle_cumulative_ack(seq, count, dropped)
+                            continue
+                        if msg_type == wire.MSG_FEEDBACK_ACK:
+                            _, _, _, confirmed, actuation_us = wire.decode_feedback_ack(msg)
+                            self.handle_feedback(confirmed, actuation_us)
+                        else:
+                            wire.decode_ack(msg)
+                        self.ack_count += 1
+                    except ValueError as e:
+                        frame_log.warning("Bad binary reply: %s", e)
+                    continue
                 try:
                     data = json.loads(msg)
-                    self.ack_count += 1
                 except json.JSONDecodeError:
-                    print("\nServer replied (non-JSON):", msg)
+                    frame_log.warning("Server replied (non-JSON): %s", msg)
+                    continue
+                if isinstance(data, dict) and "pong" in data:
+                    self.handle_pong(data["pong"])
+                    continue
+                if isinstance(data, dict) and isinstance(data.get("ack"), dict):
+                    ack = data["ack"]
+                    self.handle_cumulative_ack(ack.get("seq", 0), ack.get("count", 0), ack.get("dropped", 0))
+                    continue
+                if isinstance(data, dict) and data.get("confirmed"):
+                    self.handle_feedback(data["confirmed"], data.get("actuation_us"))
+                self.ack_count += 1
         except websockets.exceptions.ConnectionClosed:
-            print("Server connection closed")
+            log.info("Server connection closed")
 
     async def run(self):
-        print(f"Serial Hand Client starting...")
+        log.info("Serial Hand Client starting...")
         self.is_running = True
 
-        # Initialize serial port
-        if not await self.initialize_serial():
-            print("Failed to initialize serial port. Exiting.")
-            return
+        self.open_serial()
 
         # Start tasks
         serial_task = asyncio.create_task(self.serial_reader_task())
         sender_task = asyncio.create_task(self.data_sender_task())
 
         try:
-            # Wait for tasks to complete
-            await asyncio.gather(serial_task, sender_task)
+            # The sender decides when we are done
+            await sender_task
         except asyncio.CancelledError:
             pass
         finally:
+            serial_task.cancel()
+            try:
+                await serial_task
+            except asyncio.CancelledError:
+                pass
             # Clean up
-            if self.serial_port and self.serial_port.is_open:
-                self.serial_port.close()
-                print("Serial port closed")
+            self.serial_manager.stop()
+            log.info("Serial port closed")
+            if self.recorder:
+                self.recorder.close()
+                log.info("Recorded %d frames to %s", self.recorder.record_count, self.recorder.path)
 
-        print("Application closed")
+        log.info("Application closed")
 
 
 async def main():
+    setup_logging(LOG_LEVEL, LOG_FRAME_LEVEL)
+    debug_sink.path = DEBUG_SINK_PATH
+    # SIGUSR1 only exists on POSIX; elsewhere the sink stays off
+    debug_sink.install_signal(asyncio.get_running_loop())
+    watchdog = profiler = None
+    if DIAGNOSTICS:
+        watchdog = LoopWatchdog(LOOP_STALL_MS)
+        watchdog.start()
+        profiler = SamplingProfiler(PROFILE_PATH, PROFILE_INTERVAL_MS)
+        profiler.install_signal(asyncio.get_running_loop())
     client = SerialHandClient()
 
     # Windows-compatible approach - no signal handlers
-    await client.run()
+    try:
+        await client.run()
+    finally:
+        if watchdog:
+            watchdog.stop()
+            profiler.stop(wait=True)
+            log.info("Event loop: %s", " | ".join(f"{k} {v}" for k, v in watchdog.stats().items()))
+        debug_sink.disable()
+        shutdown_logging()
 
 
 async def shutdown(client):
-    print("\nShutting down...")
+    log.info("Shutting down...")
     client.is_running = False
 
 
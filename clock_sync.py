@@ -0,0 +1,47 @@
+import math
+from collections import deque
+
+DEFAULT_WINDOW = 8
+
+
+class ClockSync:
+    # NTP-style estimator. Each ping/pong gives four timestamps:
+    #   t0 client send, t1 server receive, t2 server send, t3 client receive
+    # offset = server clock - client clock. The sample with the lowest RTT in
+    # the recent window is trusted most, since queueing delay skews the others.
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.sample_count = 0
+        self.offset_us = 0
+        self.rtt_us = 0
+
+    @property
+    def ready(self):
+        return self.sample_count > 0
+
+    def add_sample(self, t0, t1, t2, t3):
+        rtt = (t3 - t0) - (t2 - t1)
+        if rtt < 0:
+            return False
+        offset = ((t1 - t0) + (t2 - t3)) // 2
+        self.samples.append((rtt, offset))
+        self.sample_count += 1
+        self.rtt_us, self.offset_us = min(self.samples)
+        return True
+
+    def set_estimate(self, offset_us, rtt_us):
+        # Used by the side that does not ping and is told the estimate;
+        # ValueError (or OverflowError) unless both are finite numbers
+        offset_us = float(offset_us)
+        rtt_us = float(rtt_us)
+        if not (math.isfinite(offset_us) and math.isfinite(rtt_us)):
+            raise ValueError("clock estimate must be finite")
+        self.offset_us = int(offset_us)
+        self.rtt_us = int(rtt_us)
+        self.sample_count += 1
+
+    def to_server_time(self, client_time_us):
+        return client_time_us + self.offset_us
+
+    def one_way_latency_us(self, client_time_us, server_time_us):
+        return server_time_us - self.to_server_time(client_time_us)
@@ -0,0 +1,133 @@
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11 reads JSON config files only
+    tomllib = None
+
+# One section per program family; keys are the lower-case names of the
+# module constants they override (server.WEBSOCKET_PORT -> [server] websocket_port)
+SECTIONS = ("server", "client", "sim")
+ENV_PREFIX = "ROBOHAND_"
+CONFIG_ENV = "ROBOHAND_CONFIG"
+# Picked up from the working directory when neither --config nor ROBOHAND_CONFIG is given
+DEFAULT_CONFIG_FILES = ("robohand.toml", "robohand.json")
+
+_TRUE = ("1", "true", "yes", "on")
+_FALSE = ("0", "false", "no", "off")
+
+
+def find_file(path=None, environ=None):
+    environ = os.environ if environ is None else environ
+    path = path or environ.get(CONFIG_ENV)
+    if path:
+        return path
+    for name in DEFAULT_CONFIG_FILES:
+        if os.path.exists(name):
+            return name
+    return None
+
+
+def load_file(path):
+    # -> {section: {key: value}}, values already typed by TOML/JSON
+    with open(path, "rb") as f:
+        data = f.read()
+    if path.endswith(".toml"):
+        if tomllib is None:
+            raise RuntimeError(f"{path}: TOML needs Python 3.11+, use a .json config")
+        config = tomllib.loads(data.decode("utf-8"))
+    else:
+        config = json.loads(data)
+    if not isinstance(config, dict) or not all(isinstance(v, dict) for v in config.values()):
+        raise ValueError(f"{path}: expected [section] tables of key = value settings")
+    return config
+
+
+def from_environ(environ=None):
+    # ROBOHAND_SERVER_WEBSOCKET_PORT=50052 -> {"server": {"websocket_port": "50052"}}
+    environ = os.environ if environ is None else environ
+    config = {}
+    for name, value in environ.items():
+        if not name.startswith(ENV_PREFIX) or name == CONFIG_ENV:
+            continue
+        rest = name[len(ENV_PREFIX):].lower()
+        for section in SECTIONS:
+            if rest.startswith(section + "_"):
+                config.setdefault(section, {})[rest[len(section) + 1:]] = value
+                break
+    return config
+
+
+def parse_assignment(text):
+    # "server.websocket_port=50052" -> ("server", "websocket_port", "50052")
+    name, sep, value = text.partition("=")
+    section, dot, key = name.strip().partition(".")
+    if not sep or not dot or not key:
+        raise ValueError(f"Expected section.key=value, got {text!r}")
+    return section.lower(), key.lower().replace("-", "_"), value
+
+
+def load(path=None, overrides=(), environ=None):
+    # Defaults (the module constants) < config file < environment < flags.
+    # Returns the merged settings and the file they were read from, if any.
+    path = find_file(path, environ)
+    layers = [load_file(path)] if path else []
+    layers.append(from_environ(environ))
+    flags = {}
+    for text in overrides:
+        section, key, value = parse_assignment(text)
+        flags.setdefault(section, {})[key] = value
+    layers.append(flags)
+
+    config = {}
+    for layer in layers:
+        for section, settings in layer.items():
+            if section not in SECTIONS:
+                raise ValueError(f"Unknown config section: {section}")
+            merged = config.setdefault(section, {})
+            for key, value in settings.items():
+                merged[key.lower()] = value
+    return config, path
+
+
+def coerce(value, default):
+    # Env vars and flags are strings; they take the type of the default
+    # they replace. Anything that is not a plain scalar is read as JSON.
+    if isinstance(value, str) and not isinstance(default, str):
+        text = value.strip()
+        if isinstance(default, bool):
+            if text.lower() in _TRUE:
+                return True
+            if text.lower() in _FALSE:
+                return False
+            raise ValueError(f"Expected a boolean, got {value!r}")
+        if text.lower() in ("", "none", "null"):
+            return None
+        if isinstance(default, int):
+            return int(text)
+        if isinstance(default, float):
+            return float(text)
+        try:
+            value = json.loads(text)
+        except ValueError:
+            return value  # plain string for a setting that defaults to None
+    if isinstance(default, tuple) and isinstance(value, list):
+        return tuple(value)
+    if isinstance(default, float) and isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+def apply(config, targets):
+    # targets: {section: [modules]}. Each key sets the constant of the same
+    # name in every listed module that defines it; a key none of them
+    # defines is an error, so typos do not pass silently.
+    for section, modules in targets.items():
+        for key, value in config.get(section, {}).items():
+            name = key.upper()
+            owners = [m for m in modules if hasattr(m, name)]
+            if not owners:
+                raise ValueError(f"Unknown setting: {section}.{key}")
+            for module in owners:
+                setattr(module, name, coerce(value, getattr(module, name)))
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+
+# The loop counts as blocked once a callback holds it this long
+DEFAULT_STALL_MS = 50
+# How often the loop checks in with the watchdog; lag is measured per check-in
+DEFAULT_TICK_INTERVAL = 0.02
+# Time between the profiler's stack samples, and how long a run lasts
+# unless stopped earlier
+DEFAULT_PROFILE_INTERVAL_MS = 10
+DEFAULT_PROFILE_SECONDS = 30
+MAX_PROFILE_SECONDS = 600
+
+log = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    # Continuous event loop lag: a callback rescheduled every tick records
+    # how late it ran. A thread watches the same heartbeat; when the loop has
+    # not checked in for stall_ms it logs the loop thread's stack right then,
+    # i.e. the code that is blocking, not the one that runs after it.
+    def __init__(self, stall_ms=DEFAULT_STALL_MS, interval=DEFAULT_TICK_INTERVAL, lag_histogram=None):
+        self.stall_ms = stall_ms
+        self.interval = interval
+        # Lag in us per tick (metrics.LatencyHistogram)
+        self.lag_histogram = lag_histogram
+        self.tick_count = 0
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+        self.last_stall_stack = None
+        self._loop = None
+        self._loop_thread = None
+        self._handle = None
+        self._expected = 0.0
+        self._beat = 0.0
+        self._stop = None
+        self._thread = None
+
+    def start(self, loop=None):
+        if self._thread is not None:
+            return
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._expected = self._loop.time() + self.interval
+        self._handle = self._loop.call_at(self._expected, self._tick)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        log.info("Loop watchdog on: stacks of callbacks blocking > %d ms", self.stall_ms)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._handle.cancel()
+        self._stop.set()
+        self._thread.join(1.0)
+        self._thread = None
+
+    def stats(self):
+        return {
+            "ticks": self.tick_count,
+            "stalls": self.stall_count,
+            "max_lag_ms": round(self.max_lag_ms, 1),
+        }
+
+    def _tick(self):
+        now = self._loop.time()
+        self._beat = time.monotonic()
+        lag_ms = (now - self._expected) * 1000
+        self.tick_count += 1
+        if self.lag_histogram is not None:
+            self.lag_histogram.record(lag_ms * 1000)
+        if lag_ms > self.max_lag_ms:
+            self.max_lag_ms = lag_ms
+        if lag_ms >= self.stall_ms:
+            self.stall_count += 1
+            log.warning("Event loop was blocked for %.0f ms", lag_ms)
+        self._expected = now + self.interval
+        self._handle = self._loop.call_at(self._expected, self._tick)
+
+    def _watch(self):
+        stall = self.stall_ms / 1000
+        reported = None
+        while not self._stop.wait(stall / 2):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < stall or beat == reported:
+                continue
+            # One stack per stall; the tick logs its full length once it ends
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self.last_stall_stack = "".join(traceback.format_stack(frame))
+            log.warning("Event loop blocked for %.0f ms so far, in:\n%s", blocked * 1000,
+                        self.last_stall_stack.rstrip())
+
+
+def collapse_stack(frame, thread_name):
+    # "thread;outer (file.py:12);...;leaf (file.py:34)", the collapsed stack
+    # format of flamegraph.pl, speedscope and inferno
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class SamplingProfiler:
+    # Samples every thread's stack interval_ms apart from a background
+    # thread; nothing runs in the profiled code itself. stop() (or the end
+    # of the run) writes one "stack count" line per distinct stack to a new
+    # file next to `path`, named after the start time.
+    def __init__(self, path, interval_ms=DEFAULT_PROFILE_INTERVAL_MS):
+        self.path = path
+        self.interval_ms = interval_ms
+        self.sample_count = 0
+        self.last_path = None
+        self._stop = None
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds=DEFAULT_PROFILE_SECONDS):
+        # -> output path, or None when a run is already going
+        if self.running:
+            return None
+        seconds = min(float(seconds or DEFAULT_PROFILE_SECONDS), MAX_PROFILE_SECONDS)
+        base, ext = os.path.splitext(self.path)
+        path = f"{base}-{time.strftime('%Y%m%d-%H%M%S')}{ext or '.folded'}"
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(path, seconds, self._stop),
+                                        name="sampling-profiler", daemon=True)
+        self._thread.start()
+        log.info("Profiling for up to %.0f s every %d ms -> %s", seconds, self.interval_ms, path)
+        return path
+
+    def stop(self, wait=False):
+        # wait: block until the file is written (at shutdown, not on the loop)
+        if not self.running:
+            return
+        self._stop.set()
+        if wait:
+            self._thread.join(5.0)
+
+    def toggle(self):
+        if self.running:
+            self.stop()
+        else:
+            self.start()
+
+    def install_signal(self, loop=None, signum=getattr(signal, "SIGUSR2", None)):
+        # `kill -USR2 <pid>` starts a run, a second one ends it early
+        if signum is None:
+            return False
+        if loop:
+            loop.add_signal_handler(signum, self.toggle)
+        else:
+            signal.signal(signum, lambda *_: self.toggle())
+        return True
+
+    def _run(self, path, seconds, stop):
+        stacks = Counter()
+        own = threading.get_ident()
+        interval = self.interval_ms / 1000
+        deadline = time.monotonic() + seconds
+        samples = 0
+        while not stop.wait(interval) and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident != own:
+                    stacks[collapse_stack(frame, names.get(ident, str(ident)))] += 1
+            samples += 1
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        self.sample_count += samples
+        self.last_path = path
+        log.info("Profile written: %s (%d samples, %d stacks)", path, samples, len(stacks))
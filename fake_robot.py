@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import threading
+import time
+
+import servo_protocol
+from pty_serial import PtyLoopback
+
+BOOT_BAUD_RATE = 9600
+SERVO_COUNT = 5
+
+
+class FakeRobotHand(PtyLoopback):
+    # Firmware stand-in that speaks the same serial protocol as lehand.ino:
+    # ASCII lines, binary frames, the PROTO BIN handshake and the rate-limited
+    # echo. Drain pacing follows the negotiated baud like the real UART.
+    def __init__(self, baud_rate=BOOT_BAUD_RATE, paced=True):
+        super().__init__(baud_rate if paced else None)
+        self.paced = paced
+        self.parser = servo_protocol.ServoStreamParser()
+        self.positions = [1500] * SERVO_COUNT
+        self.binary_mode = False
+        self.echo_interval = 0.0
+        self.last_seq = 0
+        self.applied_count = 0
+        self.frame_count = 0
+        self.line_count = 0
+        self.echo_count = 0
+        self.last_applied = None
+        self._last_echo = 0.0
+        self._echo_timer = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        super().start()
+        self._send(b"Robot hand ready - waiting for servo commands\r\n")
+        return self
+
+    def stop(self):
+        with self._lock:
+            if self._echo_timer:
+                self._echo_timer.cancel()
+        super().stop()
+
+    def handle_data(self, data):
+        super().handle_data(data)
+        for event in self.parser.feed(data):
+            if event[0] == "frame":
+                _, frame_type, seq, values = event
+                if frame_type == servo_protocol.FRAME_COMMAND:
+                    self.frame_count += 1
+                    self._apply(values, seq)
+            else:
+                self._handle_line(event[1])
+
+    def _handle_line(self, line):
+        if line.startswith("PROTO BIN "):
+            parts = line.split()
+            try:
+                baud = int(parts[2])
+                echo_ms = int(parts[3]) if len(parts) > 3 else 0
+            except (IndexError, ValueError):
+                return
+            self._send((servo_protocol.handshake_reply(baud) + "\r\n").encode("ascii"))
+            self.binary_mode = True
+            self.echo_interval = echo_ms / 1000
+            if self.paced:
+                self.baud_rate = baud
+            return
+        try:
+            values = [int(v) for v in line.split(",")]
+        except ValueError:
+            return
+        if len(values) == SERVO_COUNT:
+            self.line_count += 1
+            self._apply(values, (self.last_seq + 1) & 0xFF)
+
+    def _apply(self, values, seq):
+        self.positions = [min(max(v, 500), 2500) for v in values]
+        self.last_seq = seq
+        self.applied_count += 1
+        self.last_applied = time.perf_counter()
+        with self._lock:
+            if self._echo_timer:
+                self._echo_timer.cancel()
+                self._echo_timer = None
+            if time.monotonic() - self._last_echo >= self.echo_interval:
+                self._echo(servo_protocol.FRAME_STATUS)
+            else:
+                # Like lehand.ino: held-back echo once the commands stop
+                self._echo_timer = threading.Timer(self.echo_interval, self._echo_later)
+                self._echo_timer.daemon = True
+                self._echo_timer.start()
+
+    def _echo_later(self):
+        with self._lock:
+            self._echo_timer = None
+            self._echo(servo_protocol.FRAME_STATUS_DEFERRED)
+
+    def _echo(self, status_type):
+        self._last_echo = time.monotonic()
+        self.echo_count += 1
+        if self.binary_mode:
+            self._send(bytes(servo_protocol.encode_servo_frame(
+                status_type, self.last_seq, self.positions)))
+        else:
+            line = servo_protocol.ECHO_PREFIX + " " + ",".join(map(str, self.positions))
+            self._send((line + "\r\n").encode("ascii"))
+
+    def _send(self, data):
+        try:
+            os.write(self.master, data)
+        except OSError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pty stand-in for the lehand.ino firmware")
+    parser.add_argument("--baud", type=int, default=BOOT_BAUD_RATE, help="boot baud rate")
+    parser.add_argument("--no-pacing", action="store_true", help="do not emulate UART speed")
+    args = parser.parse_args()
+
+    robot = FakeRobotHand(args.baud, paced=not args.no_pacing).start()
+    print(f"Fake robot hand on {robot.port}")
+    try:
+        while True:
+            time.sleep(1.0)
+            print(f"applied {robot.applied_count} (frames {robot.frame_count}, lines {robot.line_count}) | "
+                  f"{'binary' if robot.binary_mode else 'ascii'} @ {robot.baud_rate} | "
+                  f"positions {robot.positions}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        robot.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,3 @@
-
-
 #include <Servo.h>
 
 // Servo control
@@ -9,83 +7,206 @@ Servo servos[SERVO_COUNT];
 
 // Servo positions (PWM values 500-2500)
 int servoPositions[SERVO_COUNT] = {1500, 1500, 1500, 1500, 1500};
-String inputString = "";
-boolean stringComplete = false;
 
+// Text commands ("1500,1500,1500,1500,1500\n" and "PROTO BIN <baud> <echo_ms>\n")
+#define LINE_MAX 64
+char lineBuffer[LINE_MAX];
+int lineLength = 0;
+
+// Binary command frame, see servo_protocol.py:
+// A5 5A | type | seq | 5 x uint16 little endian | crc8 over type..values
+#define SYNC0 0xA5
+#define SYNC1 0x5A
+#define FRAME_COMMAND 0x01
+#define FRAME_STATUS 0x81
+#define FRAME_STATUS_DEFERRED 0x82
+#define FRAME_SIZE 15
+uint8_t frameBuffer[FRAME_SIZE];
+int frameLength = 0;
+
+boolean binaryMode = false;
+// 0 = echo every command (legacy); otherwise at most one echo per interval
+unsigned long echoIntervalMs = 0;
+unsigned long lastEchoMs = 0;
+unsigned long lastApplyMs = 0;
+boolean echoPending = false;
+uint8_t lastSeq = 0;
 
 
 void setup() {
   Serial.begin(9600);
-  
+
   // Initialize servos
   for(int i = 0; i < SERVO_COUNT; i++) {
     servos[i].attach(servoPins[i]);
     servos[i].writeMicroseconds(servoPositions[i]);
   }
-  
+
   // Configure status LED
   pinMode(13, OUTPUT);
   digitalWrite(13, HIGH); // Ready indicator
-  
+
   Serial.println("Robot hand ready - waiting for servo commands");
-  inputString.reserve(200);
 }
 
 
+void loop() {
+  // Drain everything the UART has buffered instead of one byte per pass
+  while (Serial.available()) {
+    handleByte((uint8_t)Serial.read());
+  }
 
+  // Held-back echo once the commands stop, so the final pose is confirmed
+  if (echoPending && millis() - lastApplyMs >= echoIntervalMs) {
+    sendEcho(FRAME_STATUS_DEFERRED);
+  }
+}
 
-void loop() {
-  // Check for incoming serial data
-  if (Serial.available()) {
-    char inChar = (char)Serial.read();
-    if (inChar == '\n') {
-      stringComplete = true;
+void handleByte(uint8_t b) {
+  if (frameLength > 0 || b == SYNC0) {
+    frameBuffer[frameLength++] = b;
+    if (frameLength == 2 && b != SYNC1) {
+      // Not a frame after all; 0xA5 never appears in text commands
+      frameLength = 0;
+      return;
+    }
+    if (frameLength == FRAME_SIZE) {
+      frameLength = 0;
+      if (!handleFrame()) {
+        resync();
+      }
+    }
+    return;
+  }
+
+  if (b == '\n') {
+    lineBuffer[lineLength] = '\0';
+    handleLine(lineBuffer);
+    lineLength = 0;
+  } else if (b != '\r') {
+    if (lineLength < LINE_MAX - 1) {
+      lineBuffer[lineLength++] = (char)b;
     } else {
-      inputString += inChar;
+      lineLength = 0; // overlong garbage, resync on next newline
+    }
+  }
+}
+
+uint8_t crc8(const uint8_t *data, int length) {
+  // CRC-8/SMBUS, poly 0x07; matches crc8() in servo_protocol.py
+  uint8_t crc = 0;
+  for (int i = 0; i < length; i++) {
+    crc ^= data[i];
+    for (int bit = 0; bit < 8; bit++) {
+      crc = (crc & 0x80) ? (uint8_t)((crc << 1) ^ 0x07) : (uint8_t)(crc << 1);
     }
   }
-  
-  // Process complete command
-  if (stringComplete) {
-    parseServoCommand(inputString);
-    inputString = "";
-    stringComplete = false;
+  return crc;
+}
+
+void resync() {
+  // A corrupted frame may hold the start of the next one; replay what
+  // follows the first sync byte after the bad one instead of dropping it.
+  // Fewer than FRAME_SIZE bytes, so this never completes a frame itself.
+  uint8_t rest[FRAME_SIZE];
+  memcpy(rest, frameBuffer, FRAME_SIZE);
+  for (int i = 1; i < FRAME_SIZE; i++) {
+    if (rest[i] == SYNC0) {
+      for (int j = i; j < FRAME_SIZE; j++) {
+        handleByte(rest[j]);
+      }
+      return;
+    }
   }
 }
 
+boolean handleFrame() {
+  // false when the frame is corrupted
+  if (crc8(frameBuffer + 2, FRAME_SIZE - 3) != frameBuffer[FRAME_SIZE - 1]) {
+    return false;
+  }
+  if (frameBuffer[2] != FRAME_COMMAND) {
+    return true;
+  }
+  int values[SERVO_COUNT];
+  for (int i = 0; i < SERVO_COUNT; i++) {
+    values[i] = frameBuffer[4 + 2 * i] | (frameBuffer[5 + 2 * i] << 8);
+  }
+  applyServos(values, frameBuffer[3]);
+  return true;
+}
+
+void handleLine(char *line) {
+  if (strncmp(line, "PROTO BIN ", 10) == 0) {
+    long baud = 0;
+    long echoMs = 0;
+    if (sscanf(line + 10, "%ld %ld", &baud, &echoMs) >= 1 && baud > 0) {
+      Serial.print("OK PROTO BIN ");
+      Serial.println(baud);
+      Serial.flush();
+      Serial.begin(baud);
+      binaryMode = true;
+      echoIntervalMs = echoMs;
+    }
+    return;
+  }
+  parseServoCommand(line);
+}
+
 // Parse servo command from server.py (format: "1500,1800,1200,2000,900")
-void parseServoCommand(String command) {
+void parseServoCommand(char *command) {
   int values[SERVO_COUNT];
   int valueIndex = 0;
-  int lastIndex = 0;
-  
-  // Parse comma-separated values
-  for (int i = 0; i <= command.length() && valueIndex < SERVO_COUNT; i++) {
-    if (command.charAt(i) == ',' || i == command.length()) {
-      String valueStr = command.substring(lastIndex, i);
-      values[valueIndex] = valueStr.toInt();
-      
-      // Constrain servo values (500-2500)
-      values[valueIndex] = constrain(values[valueIndex], 500, 2500);
-      valueIndex++;
-      lastIndex = i + 1;
-    }
+  char *token = strtok(command, ",");
+
+  while (token != NULL && valueIndex < SERVO_COUNT) {
+    values[valueIndex++] = atoi(token);
+    token = strtok(NULL, ",");
   }
-  
+
   // Update servo positions if we got all 5 values
   if (valueIndex == SERVO_COUNT) {
+    applyServos(values, lastSeq + 1);
+  }
+}
+
+void applyServos(int *values, uint8_t seq) {
+  for (int i = 0; i < SERVO_COUNT; i++) {
+    // Constrain servo values (500-2500)
+    servoPositions[i] = constrain(values[i], 500, 2500);
+    servos[i].writeMicroseconds(servoPositions[i]);
+  }
+  lastSeq = seq;
+  lastApplyMs = millis();
+  echoPending = true;
+  if (millis() - lastEchoMs >= echoIntervalMs) {
+    sendEcho(FRAME_STATUS);
+  }
+}
+
+void sendEcho(uint8_t statusType) {
+  echoPending = false;
+  lastEchoMs = millis();
+  if (binaryMode) {
+    uint8_t frame[FRAME_SIZE];
+    frame[0] = SYNC0;
+    frame[1] = SYNC1;
+    frame[2] = statusType;
+    frame[3] = lastSeq;
     for (int i = 0; i < SERVO_COUNT; i++) {
-      servoPositions[i] = values[i];
-      servos[i].writeMicroseconds(servoPositions[i]);
-    }
-    
-    // Send confirmation
-    Serial.print("Servos updated: ");
-    for (int i = 0; i < SERVO_COUNT; i++) {
-      Serial.print(servoPositions[i]);
-      if (i < SERVO_COUNT - 1) Serial.print(",");
+      frame[4 + 2 * i] = servoPositions[i] & 0xFF;
+      frame[5 + 2 * i] = servoPositions[i] >> 8;
     }
-    Serial.println();
+    frame[FRAME_SIZE - 1] = crc8(frame + 2, FRAME_SIZE - 3);
+    Serial.write(frame, FRAME_SIZE);
+    return;
   }
-}
 
+  // Send confirmation
+  Serial.print("Servos updated: ");
+  for (int i = 0; i < SERVO_COUNT; i++) {
+    Serial.print(servoPositions[i]);
+    if (i < SERVO_COUNT - 1) Serial.print(",");
+  }
+  Serial.println();
+}
@@ -0,0 +1,166 @@
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+
+LOG_FORMAT = "%(asctime)s %(levelname).1s %(name)s: %(message)s"
+# Per-frame debug records let through per second and call site
+DEFAULT_FRAME_LOG_RATE = 5.0
+
+_listener = None
+
+
+class RateLimitFilter(logging.Filter):
+    # Token bucket per call site (logger, line). Suppressed records are
+    # counted and reported on the next one that gets through.
+    def __init__(self, rate=DEFAULT_FRAME_LOG_RATE, burst=None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self._buckets = {}
+
+    def filter(self, record):
+        key = (record.name, record.lineno)
+        now = time.monotonic()
+        tokens, last, suppressed = self._buckets.get(key, (self.burst, now, 0))
+        tokens = min(self.burst, tokens + (now - last) * self.rate)
+        if tokens < 1.0:
+            self._buckets[key] = (tokens, now, suppressed + 1)
+            return False
+        self._buckets[key] = (tokens - 1.0, now, 0)
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+
+def frame_logger(name, rate=DEFAULT_FRAME_LOG_RATE):
+    # Logger for per-frame events, rate limited. All of them sit under the
+    # "frames" logger so one level switches them on or off together.
+    logger = logging.getLogger(f"frames.{name}")
+    if not any(isinstance(f, RateLimitFilter) for f in logger.filters):
+        logger.addFilter(RateLimitFilter(rate))
+    return logger
+
+
+def setup_logging(level="INFO", frame_level="INFO"):
+    # Handlers run on a QueueListener thread, so a slow terminal (SSH on
+    # the Pi) never blocks the event loop; callers only enqueue records.
+    global _listener
+    if _listener:
+        return _listener
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, "%H:%M:%S"))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(level)
+    logging.getLogger("frames").setLevel(frame_level)
+    # One line per connection from websockets itself is just noise here
+    logging.getLogger("websockets").setLevel(max(root.level, logging.WARNING))
+    _listener = logging.handlers.QueueListener(log_queue, handler)
+    _listener.start()
+    return _listener
+
+
+def _forget_listener():
+    # A forked worker inherits the queue handler but not the listener
+    # thread; it sets up its own
+    global _listener
+    _listener = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_listener)
+
+
+def shutdown_logging():
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+class DebugSink:
+    # Compact JSON-lines trace of per-frame events. Off by default; while
+    # off, record() is a single attribute check. Lines are serialized and
+    # written on a background thread.
+    def __init__(self, path=None):
+        self.path = path
+        self.enabled = False
+        self.event_count = 0
+        self.dropped_count = 0
+        self._queue = None
+        self._thread = None
+
+    def enable(self, path=None):
+        if self.enabled:
+            return
+        self.path = path or self.path
+        if not self.path:
+            raise ValueError("Debug sink needs a path")
+        self._queue = queue.Queue(maxsize=100000)
+        self._thread = threading.Thread(target=self._writer_thread, args=(self.path, self._queue),
+                                        name="debug-sink", daemon=True)
+        self._thread.start()
+        self.enabled = True
+        logging.getLogger(__name__).info("Debug sink on: %s", self.path)
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._queue.put(None)
+        self._thread.join(2.0)
+        self._thread = None
+        self._queue = None
+        logging.getLogger(__name__).info("Debug sink off (%d events)", self.event_count)
+
+    def toggle(self, path=None):
+        if self.enabled:
+            self.disable()
+        elif path or self.path:
+            self.enable(path)
+        else:
+            logging.getLogger(__name__).warning("Debug sink has no path configured")
+
+    def record(self, event, **fields):
+        if not self.enabled:
+            return
+        events = self._queue
+        if events is None:
+            return
+        fields["t_us"] = time.monotonic_ns() // 1000
+        fields["ev"] = event
+        try:
+            events.put_nowait(fields)
+            self.event_count += 1
+        except queue.Full:
+            self.dropped_count += 1
+
+    def install_signal(self, loop=None, signum=getattr(signal, "SIGUSR1", None)):
+        # `kill -USR1 <pid>` turns the sink on or off without a restart
+        if signum is None:
+            return False
+        if loop:
+            loop.add_signal_handler(signum, self.toggle)
+        else:
+            signal.signal(signum, lambda *_: self.toggle())
+        return True
+
+    @staticmethod
+    def _writer_thread(path, events):
+        with open(path, "a", buffering=65536) as f:
+            while True:
+                item = events.get()
+                if item is None:
+                    break
+                f.write(json.dumps(item, separators=(",", ":")))
+                f.write("\n")
+
+
+debug_sink = DebugSink()
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import logging
+import time
+
+# Log-linear buckets in the spirit of HdrHistogram: every power of two is
+# split into SUB_BUCKETS linear steps, so relative error stays under ~3%
+# from 1 us up to MAX_VALUE_US with a few hundred integer counters.
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_US = 60_000_000
+
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+
+log = logging.getLogger(__name__)
+
+
+def _bucket_index(value):
+    if value < 2 * SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+
+def _bucket_value(index):
+    # Highest value that falls into the bucket
+    if index < 2 * SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    return ((index - shift * SUB_BUCKETS + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    def __init__(self, max_value=MAX_VALUE_US):
+        self.max_value = max_value
+        self.counts = [0] * (_bucket_index(max_value) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def record(self, value_us):
+        value_us = int(value_us)
+        if value_us < 0:
+            value_us = 0
+        elif value_us > self.max_value:
+            value_us = self.max_value
+        self.counts[_bucket_index(value_us)] += 1
+        self.count += 1
+        self.total += value_us
+        if self.min is None or value_us < self.min:
+            self.min = value_us
+        if value_us > self.max:
+            self.max = value_us
+
+    def percentile(self, q):
+        if not self.count:
+            return 0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return min(_bucket_value(index), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def snapshot(self):
+        snap = {
+            "count": self.count,
+            "min": self.min or 0,
+            "max": self.max,
+            "mean": round(self.mean, 1),
+        }
+        for q in PERCENTILES:
+            snap[percentile_name(q)] = self.percentile(q)
+        return snap
+
+
+def percentile_name(q):
+    return "p" + f"{q * 100:g}".replace(".", "")
+
+
+class Metrics:
+    def __init__(self, prefix="robohand"):
+        self.prefix = prefix
+        self.start_time = time.time()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def histogram(self, stage):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        return hist
+
+    def observe(self, stage, value_us):
+        self.histogram(stage).record(value_us)
+
+    def inc(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, read_value, **labels):
+        # read_value is called at export time so gauges never go stale.
+        # Labelled gauges (one per serial port, say) share a name.
+        if labels:
+            name += "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+        self.gauges[name] = read_value
+
+    def snapshot(self):
+        return {
+            "uptime_s": round(time.time() - self.start_time, 3),
+            "latency_us": {stage: hist.snapshot() for stage, hist in self.histograms.items()},
+            "counters": dict(self.counters),
+            "gauges": {name: read_value() for name, read_value in self.gauges.items()},
+        }
+
+    def render_prometheus(self):
+        p = self.prefix
+        lines = [f"# TYPE {p}_stage_latency_us summary"]
+        for stage, hist in self.histograms.items():
+            for q in PERCENTILES:
+                lines.append(f'{p}_stage_latency_us{{stage="{stage}",quantile="{q}"}} {hist.percentile(q)}')
+            lines.append(f'{p}_stage_latency_us_sum{{stage="{stage}"}} {hist.total}')
+            lines.append(f'{p}_stage_latency_us_count{{stage="{stage}"}} {hist.count}')
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        typed = set()
+        for name, read_value in self.gauges.items():
+            base = name.split("{", 1)[0]
+            if base not in typed:
+                typed.add(base)
+                lines.append(f"# TYPE {p}_{base} gauge")
+            lines.append(f"{p}_{name} {read_value()}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    # Minimal HTTP endpoint: GET /metrics (Prometheus text) or /metrics.json
+    def __init__(self, metrics, host="127.0.0.1", port=9109):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info("Metrics endpoint: http://%s:%d/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) >= 2 else ""
+            if path == "/metrics":
+                status, content_type = "200 OK", "text/plain; version=0.0.4"
+                body = self.metrics.render_prometheus()
+            elif path == "/metrics.json":
+                status, content_type = "200 OK", "application/json"
+                body = json.dumps(self.metrics.snapshot())
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", "not found\n"
+            payload = body.encode("utf-8")
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+            writer.write(payload)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
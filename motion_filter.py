@@ -0,0 +1,86 @@
+import math
+
+FILTER_EMA = "ema"
+FILTER_ONE_EURO = "one_euro"
+FILTERS = (FILTER_EMA, FILTER_ONE_EURO)
+
+FINGER_COUNT = 5
+# Assumed frame spacing when timestamps repeat or go backwards (50 Hz glove)
+DEFAULT_DT = 0.02
+
+DEFAULT_MIN_CUTOFF = 1.0
+DEFAULT_BETA = 0.005
+DEFAULT_D_CUTOFF = 1.0
+
+
+def _alpha(dt, cutoff):
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class MotionFilter:
+    # Per-finger smoothing of raw glove values ahead of the servo mapper.
+    #   ema:       fixed weight `alpha` for the newest sample
+    #   one_euro:  cutoff rises with speed (min_cutoff + beta * |dx/dt|), so
+    #              a still hand is heavily smoothed and a moving one is not
+    # prediction_ms extrapolates along the filtered velocity to hide link
+    # latency. All state is preallocated; apply() is O(1) per frame.
+    def __init__(self, kind=FILTER_ONE_EURO, alpha=0.5, min_cutoff=DEFAULT_MIN_CUTOFF, beta=DEFAULT_BETA,
+                 d_cutoff=DEFAULT_D_CUTOFF, prediction_ms=0):
+        if kind not in FILTERS:
+            raise ValueError(f"Unknown filter: {kind}")
+        self.kind = kind
+        self.alpha = alpha
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.prediction_s = prediction_ms / 1000
+        self._x = [0.0] * FINGER_COUNT
+        self._dx = [0.0] * FINGER_COUNT
+        self._out = [0.0] * FINGER_COUNT
+        self._last_t = None
+
+    def apply(self, values, timestamp_us):
+        out = self._out
+        last_t = self._last_t
+        self._last_t = timestamp_us
+        if last_t is None:
+            for i in range(FINGER_COUNT):
+                self._x[i] = out[i] = float(values[i])
+                self._dx[i] = 0.0
+            return out
+
+        dt = (timestamp_us - last_t) / 1e6
+        if dt <= 0:
+            dt = DEFAULT_DT
+        xs = self._x
+        dxs = self._dx
+        a_d = _alpha(dt, self.d_cutoff)
+        one_euro = self.kind == FILTER_ONE_EURO
+        if one_euro:
+            tau_dt = 1.0 / (2 * math.pi) / dt
+            min_cutoff = self.min_cutoff
+            beta = self.beta
+        else:
+            a = self.alpha
+        horizon = self.prediction_s
+        for i in range(FINGER_COUNT):
+            x_prev = xs[i]
+            value = values[i]
+            dx = dxs[i] + a_d * ((value - x_prev) / dt - dxs[i])
+            dxs[i] = dx
+            if one_euro:
+                cutoff = min_cutoff + beta * (dx if dx >= 0 else -dx)
+                a = 1.0 / (1.0 + tau_dt / cutoff)
+            x = x_prev + a * (value - x_prev)
+            xs[i] = x
+            out[i] = x + dx * horizon if horizon else x
+        return out
+
+    def reset(self):
+        self._last_t = None
+
+    def clone(self):
+        # Same settings, fresh state
+        return MotionFilter(self.kind, self.alpha, self.min_cutoff, self.beta, self.d_cutoff,
+                            self.prediction_s * 1000)
@@ -0,0 +1,175 @@
+import bisect
+from collections import deque
+
+# Bounds of the self-tuned delay frames are held for beyond the fastest transit
+DEFAULT_MIN_DELAY_MS = 5
+DEFAULT_MAX_DELAY_MS = 150
+# Share of recent frames the delay target lets arrive in time, and how many
+# recent frames that is measured over (2 s of a 50 Hz glove)
+DEFAULT_QUANTILE = 0.95
+DEFAULT_WINDOW = 100
+# Frames held at most; a sender running faster than the cadence has its
+# oldest frames skipped
+DEFAULT_MAX_FRAMES = 32
+# When the target shrinks, playout catches up by at most this share of a
+# tick per tick (10% faster than real time), so it never jumps
+DEFAULT_RELEASE = 0.1
+# A transit this far off the current one means the sender's clock restarted
+RESYNC_US = 2_000_000
+
+
+class PlayoutBuffer:
+    # Adaptive jitter buffer for one glove. Frames are ordered by the
+    # sender's timestamp and played out at sender time
+    #     now - offset,   offset = base transit + delay + spacing
+    # where base is the smallest arrival - sender time seen recently (clock
+    # offset included, so no clock sync is needed), delay covers the given
+    # quantile of the jitter on top of it and spacing is the sender's frame
+    # interval, so the frame after the playout point is normally there too.
+    # Each tick interpolates between the two frames around the playout
+    # point; a dry buffer holds the newest frame, an overfull one skips the
+    # oldest.
+    def __init__(self, min_delay_ms=DEFAULT_MIN_DELAY_MS, max_delay_ms=DEFAULT_MAX_DELAY_MS,
+                 quantile=DEFAULT_QUANTILE, window=DEFAULT_WINDOW, max_frames=DEFAULT_MAX_FRAMES,
+                 release=DEFAULT_RELEASE, latency_histogram=None):
+        self.min_delay_us = int(min_delay_ms * 1000)
+        self.max_delay_us = int(max_delay_ms * 1000)
+        self.quantile = quantile
+        self.max_frames = max_frames
+        self.release = release
+        # Time from a frame's arrival until it is played
+        self.latency_histogram = latency_histogram
+        # (sender time us, arrival us, values), oldest first
+        self.frames = []
+        self._transits = deque(maxlen=window)
+        self.base_us = 0
+        self.delay_us = self.min_delay_us
+        self.spacing_us = 0
+        self.offset_us = None
+        self.position_us = None
+        # Sender time of the newest frame the playout point has passed
+        self._passed_us = None
+        self._dry = False
+        self.pushed_count = 0
+        self.played_count = 0
+        self.interpolated_count = 0
+        self.late_count = 0
+        self.duplicate_count = 0
+        self.skipped_count = 0
+        self.underrun_count = 0
+        self.resync_count = 0
+
+    @property
+    def depth(self):
+        return len(self.frames)
+
+    @property
+    def delay_ms(self):
+        return self.delay_us / 1000
+
+    def push(self, sample_us, values, received_us):
+        # False when the frame is a duplicate or too late to be played
+        transit = received_us - sample_us
+        if self.offset_us is not None and abs(transit - self.offset_us) > RESYNC_US:
+            self.resync_count += 1
+            self.reset()
+        self._transits.append(transit)
+        if self.offset_us is None:
+            self.base_us = transit
+            self.offset_us = transit + self.delay_us
+        if self.position_us is not None and sample_us <= self.position_us:
+            self.late_count += 1
+            return False
+        index = bisect.bisect_left(self.frames, (sample_us,))
+        if index < len(self.frames) and self.frames[index][0] == sample_us:
+            self.duplicate_count += 1
+            return False
+        if index == len(self.frames) and index:
+            # EWMA of the sender's frame interval; pauses do not count
+            step = sample_us - self.frames[-1][0]
+            if step <= self.max_delay_us:
+                self.spacing_us += (step - self.spacing_us) // 8 if self.spacing_us else step
+        self.frames.insert(index, (sample_us, received_us, tuple(values)))
+        self.pushed_count += 1
+        if len(self.frames) > self.max_frames:
+            del self.frames[0]
+            self.skipped_count += 1
+        return True
+
+    def pop(self, now_us, interval_us):
+        # -> (sender time us, values) to apply at this tick, or None
+        if self.offset_us is None:
+            return None
+        self._retune(interval_us)
+        position = now_us - self.offset_us
+        if self.position_us is not None and position < self.position_us:
+            position = self.position_us
+        self.position_us = position
+        frames = self.frames
+        while len(frames) >= 2 and frames[1][0] <= position:
+            self._passed(frames.pop(0), now_us)
+        if frames:
+            self._passed(frames[0], now_us)
+        if not frames or frames[0][0] > position:
+            # Nothing to play yet, or the gap after a dry spell
+            return None
+        if len(frames) == 1:
+            # Played past the newest frame: hold it until more arrive
+            if self._dry:
+                return None
+            self._dry = True
+            self.underrun_count += 1
+            self.played_count += 1
+            return frames[0][0], frames[0][2]
+        self._dry = False
+        (t0, _, v0), (t1, _, v1) = frames[0], frames[1]
+        self.played_count += 1
+        if position == t0:
+            return t0, v0
+        self.interpolated_count += 1
+        fraction = (position - t0) / (t1 - t0)
+        return position, tuple(int(a + (b - a) * fraction + 0.5) for a, b in zip(v0, v1))
+
+    def reset(self):
+        self.frames.clear()
+        self._transits.clear()
+        self.delay_us = self.min_delay_us
+        self.spacing_us = 0
+        self.offset_us = None
+        self.position_us = None
+        self._passed_us = None
+        self._dry = False
+
+    def stats(self):
+        return {
+            "depth": self.depth,
+            "delay_ms": round(self.delay_ms, 1),
+            "played": self.played_count,
+            "interpolated": self.interpolated_count,
+            "late": self.late_count,
+            "duplicates": self.duplicate_count,
+            "skipped": self.skipped_count,
+            "underruns": self.underrun_count,
+        }
+
+    def _retune(self, interval_us):
+        # Delay grows at once when jitter does and shrinks slowly, so a
+        # single late frame costs one catch-up, not a stutter per frame
+        transits = sorted(self._transits)
+        self.base_us = transits[0]
+        jitter = transits[min(len(transits) - 1, int(self.quantile * len(transits)))] - self.base_us
+        self.delay_us = min(self.max_delay_us, max(self.min_delay_us, jitter))
+        target = self.base_us + self.delay_us + self.spacing_us
+        if target >= self.offset_us:
+            self.offset_us = target
+        else:
+            self.offset_us = max(target, self.offset_us - int(self.release * interval_us))
+
+    def _passed(self, frame, now_us):
+        # Added latency: arrival until the playout point reaches the frame
+        sample_us = frame[0]
+        if sample_us > self.position_us or (self._passed_us is not None and sample_us <= self._passed_us):
+            return
+        self._passed_us = sample_us
+        if self.latency_histogram is not None:
+            self.latency_histogram.record(now_us - frame[1])
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+import tty
+
+
+class PtyLoopback:
+    # Stand-in for a robot serial port on a pty pair: the code under test
+    # opens `port`, a thread drains the other end. With baud_rate set the
+    # drain is paced like a real UART (10 bits per byte), but writers get no
+    # back-pressure from it: tcdrain() on a pty returns at once and the
+    # kernel buffers a few KB, so a writer that outruns the rate queues
+    # there instead of blocking as it would on hardware.
+    def __init__(self, baud_rate=None):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self.baud_rate = baud_rate
+        self.bytes_received = 0
+        self.lines_received = 0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._drain_thread, name=f"pty {self.port}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def handle_data(self, data):
+        self.bytes_received += len(data)
+        self.lines_received += data.count(b"\n")
+
+    def _drain_thread(self):
+        line_free = time.perf_counter()
+        while self._running:
+            # Paced: about a millisecond of line time per read, and the data
+            # is handed on only once it would have finished arriving
+            size = max(1, self.baud_rate // 10000) if self.baud_rate else 4096
+            try:
+                data = os.read(self.master, size)
+            except OSError:
+                break
+            if not data:
+                break
+            if self.baud_rate:
+                # Deadline based so sleep overshoot does not add up
+                line_free = max(line_free, time.perf_counter() - 0.01) + len(data) * 10 / self.baud_rate
+                time.sleep(max(0.0, line_free - time.perf_counter()))
+            self.handle_data(data)
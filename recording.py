@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import time
+
+import wire
+from calibration import INPUT_MAX, INPUT_MIN
+
+try:
+    import numpy as np
+except ImportError:  # Only used to map whole recordings in one batch
+    np = None
+
+LOG_MAGIC = b"ROBOHAND"
+LOG_VERSION = 1
+# magic, version, record size
+LOG_HEADER = struct.Struct("<8sHH4x")
+# monotonic timestamp (us), 5 x finger value
+LOG_RECORD = struct.Struct("<Q5H")
+
+FLUSH_EVERY = 64
+
+
+class FrameRecorder:
+    # Append-only log of timestamped frames. Records are packed into one
+    # reused buffer and handed to a buffered file; nothing is encoded as text.
+    def __init__(self, path):
+        self.path = path
+        self.record_count = 0
+        self.error_count = 0
+        self._record = bytearray(LOG_RECORD.size)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, LOG_RECORD.size))
+        else:
+            _check_header(path)
+
+    def record(self, values, timestamp_us=None):
+        # Values are stored the way the mapper reads them: rounded and clamped
+        # to the glove range, so JSON floats or out-of-range values still fit
+        # the record. Anything that does not is counted and skipped.
+        if timestamp_us is None:
+            timestamp_us = wire.now_us()
+        try:
+            LOG_RECORD.pack_into(self._record, 0, timestamp_us,
+                                 *[min(INPUT_MAX, max(INPUT_MIN, int(v + 0.5))) for v in values])
+        except (TypeError, ValueError, OverflowError, struct.error):
+            self.error_count += 1
+            return
+        self._file.write(self._record)
+        self.record_count += 1
+        if self.record_count % FLUSH_EVERY == 0:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def _check_header(path):
+    with open(path, "rb") as f:
+        header = f.read(LOG_HEADER.size)
+    if len(header) < LOG_HEADER.size:
+        raise ValueError(f"{path}: truncated header")
+    magic, version, record_size = LOG_HEADER.unpack(header)
+    if magic != LOG_MAGIC or version != LOG_VERSION or record_size != LOG_RECORD.size:
+        raise ValueError(f"{path}: not a v{LOG_VERSION} frame log")
+
+
+class FrameLog:
+    # Read-only, memory-mapped view of a recording; records are decoded lazily
+    def __init__(self, path):
+        _check_header(path)
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # A torn last record (recorder killed mid-write) is ignored
+        self.count = (size - LOG_HEADER.size) // LOG_RECORD.size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        timestamp_us, *values = LOG_RECORD.unpack_from(self._mmap, LOG_HEADER.size + index * LOG_RECORD.size)
+        return timestamp_us, values
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def duration_us(self):
+        if self.count < 2:
+            return 0
+        return self[self.count - 1][0] - self[0][0]
+
+    def as_array(self):
+        # Zero-copy structured array view: fields 'timestamp_us' and 'values' (N, 5)
+        if np is None:
+            raise RuntimeError("NumPy is required for as_array")
+        dtype = np.dtype([("timestamp_us", "<u8"), ("values", "<u2", (5,))])
+        if not self.count:
+            return np.zeros(0, dtype=dtype)
+        return np.frombuffer(self._mmap, dtype=dtype, count=self.count, offset=LOG_HEADER.size)
+
+    def close(self):
+        if self._mmap:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+
+async def _pace(log, index, speed, t0, start):
+    # speed None/0 = as fast as possible, otherwise N x real time
+    if speed:
+        delay = (log[index][0] - t0) / 1e6 / speed - (time.monotonic() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+    elif index % 256 == 0:
+        await asyncio.sleep(0)
+
+
+async def replay(log, controller, speed=1.0, hand_id="default"):
+    # Feed a recording straight into a HandController, no network involved
+    session = controller.open_session("replay", hand_id)
+    mapped = None
+    if np is not None and session.mapper.stateless and len(log):
+        mapped = session.mapper.map_batch(log.as_array()["values"]).tolist()
+    t0 = log[0][0] if len(log) else 0
+    start = time.monotonic()
+    try:
+        for index in range(len(log)):
+            await _pace(log, index, speed, t0, start)
+            session.message_count += 1
+            if mapped is not None:
+                controller.submit_servo_values(session, tuple(mapped[index]))
+            else:
+                controller.process_frame(session, log[index][1], log[index][0])
+    finally:
+        controller.close_session(session)
+    return session
+
+
+async def replay_to_server(log, uri, speed=1.0, hand_id="default"):
+    # Stream a recording to a running server as if it were a glove client
+    import websockets
+
+    async def discard_replies(websocket):
+        # Acks must be read, or the server stalls once our receive buffer fills
+        async for _ in websocket:
+            pass
+
+    async with websockets.connect(uri) as websocket:
+        await websocket.send(wire.encode_hello((wire.FORMAT_BINARY,), hand_id))
+        await websocket.recv()
+        reader = asyncio.create_task(discard_replies(websocket))
+        t0 = log[0][0] if len(log) else 0
+        start = time.monotonic()
+        try:
+            for index in range(len(log)):
+                await _pace(log, index, speed, t0, start)
+                await websocket.send(wire.encode_frame(index, wire.now_us(), log[index][1]))
+            # Keep reading until the server has acked everything and closed
+            await websocket.close()
+            await reader
+        finally:
+            reader.cancel()
+    return len(log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded finger stream")
+    parser.add_argument("log", help="frame log written by client.py or server.py")
+    parser.add_argument("--speed", type=float, default=1.0, help="N x real time, 0 = as fast as possible")
+    parser.add_argument("--uri", help="replay to a running server (ws://host:port) instead of in-process")
+    parser.add_argument("--hand", default="default", help="hand id to drive")
+    args = parser.parse_args()
+
+    log = FrameLog(args.log)
+    print(f"{args.log}: {len(log)} frames, {log.duration_us() / 1e6:.2f}s")
+    start = time.monotonic()
+    if args.uri:
+        asyncio.run(replay_to_server(log, args.uri, args.speed, args.hand))
+    else:
+        from server import HandController
+
+        async def run_local():
+            ctrl = HandController()
+            ctrl.start()
+            try:
+                session = await replay(log, ctrl, args.speed, args.hand)
+            finally:
+                ctrl.stop()
+            print(session.summary())
+
+        asyncio.run(run_local())
+    elapsed = time.monotonic() - start
+    print(f"Replayed {len(log)} frames in {elapsed:.2f}s ({len(log) / elapsed if elapsed else 0:.0f} frames/s)")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
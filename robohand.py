@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import sys
+
+import config
+
+BENCHMARKS = ("load", "udp", "wire", "serial", "filter", "reconnect", "hotplug", "scaling", "playout", "trajectory",
+              "alloc", "backpressure")
+# ws: keyboard glove over WebSocket (testcli.py), serial: keyboard glove on a
+# serial port (simple_simulator.py), robot: pty stand-in for the firmware
+SIMULATORS = ("ws", "serial", "robot")
+
+
+def _configure(args, targets, shortcuts=()):
+    # Shortcut flags (--port, --serial-port, ...) are the last layer, after --set
+    overrides = list(args.set or ())
+    for dest, setting in shortcuts:
+        value = getattr(args, dest, None)
+        if value is not None:
+            overrides.append(f"{setting}={value}")
+    try:
+        settings, _ = config.load(args.config, overrides)
+        config.apply(settings, targets)
+    except (ValueError, RuntimeError, OSError) as e:
+        sys.exit(f"robohand: {e}")
+
+
+def _run_script(main, prog, argv):
+    # Scripts that parse sys.argv themselves get only their own arguments
+    saved = sys.argv
+    sys.argv = [prog, *argv]
+    try:
+        return main()
+    finally:
+        sys.argv = saved
+
+
+def cmd_serve(args):
+    import server
+    import server2
+
+    _configure(args, {"server": [server, server2]},
+               (("mode", "server.server_mode"), ("port", "server.websocket_port"),
+                ("serial_port", "server.robot_serial_port"), ("baud", "server.robot_baud_rate"),
+                ("workers", "server.server_workers"), ("uvloop", "server.use_uvloop")))
+    server.run()
+
+
+def cmd_glove_client(args):
+    import client
+
+    _configure(args, {"client": [client]},
+               (("server", "client.server_address"), ("port", "client.server_port"),
+                ("serial_port", "client.simulator_port"), ("hand", "client.hand_id"),
+                ("ack_mode", "client.ack_mode"), ("send_mode", "client.send_mode")))
+    asyncio.run(client.main())
+
+
+def cmd_sim(args):
+    import fake_robot
+    import simple_simulator
+    import testcli
+
+    _configure(args, {"sim": [testcli, simple_simulator, fake_robot]},
+               (("server", "sim.server_address"), ("port", "sim.server_port"),
+                ("serial_port", "sim.serial_port")))
+    if args.kind == "ws":
+        asyncio.run(testcli.main())
+    elif args.kind == "serial":
+        simple_simulator.SimpleHandSimulator().run()
+    else:
+        _run_script(fake_robot.main, "fake_robot.py", args.args)
+
+
+def cmd_bench(args):
+    import client
+    import server
+
+    # Benchmarks start from the configured server and client, then apply
+    # their own overrides (ports, pty robots) on top
+    _configure(args, {"server": [server], "client": [client]})
+    module = __import__(f"bench_{args.name}")
+    _run_script(module.main, f"bench_{args.name}.py", args.args)
+
+
+def cmd_replay(args):
+    import recording
+    import server
+
+    _configure(args, {"server": [server]})
+    _run_script(recording.main, "recording.py", args.args)
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--config", help=f"TOML or JSON config file (default: ${config.CONFIG_ENV} "
+                                         f"or ./{config.DEFAULT_CONFIG_FILES[0]})")
+    common.add_argument("--set", action="append", metavar="SECTION.KEY=VALUE",
+                        help="override one setting, e.g. server.servo_levels=[500,1500,2500]")
+
+    parser = argparse.ArgumentParser(prog="robohand", description="RoboHand glove-to-robot control")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", parents=[common], help="run the robot-side server")
+    serve.add_argument("--mode", choices=("full", "simple", "sharded"),
+                       help="full: sessions, routing, acks; simple: the server2.py pass-through; "
+                            "sharded: full mode in several processes on one port")
+    serve.add_argument("--workers", type=int, help="worker processes in sharded mode (0 = one per core)")
+    serve.add_argument("--uvloop", action="store_true", default=None, help="run on uvloop if installed")
+    serve.add_argument("--port", type=int, help="WebSocket port")
+    serve.add_argument("--serial-port", help="robot serial port")
+    serve.add_argument("--baud", type=int, help="robot boot baud rate")
+    serve.set_defaults(func=cmd_serve)
+
+    glove = commands.add_parser("glove-client", parents=[common], help="stream a serial glove to the server")
+    glove.add_argument("--server", help="server address")
+    glove.add_argument("--port", type=int, help="server port")
+    glove.add_argument("--serial-port", help="glove serial port")
+    glove.add_argument("--hand", help="hand id to drive")
+    glove.add_argument("--ack-mode", choices=("frame", "cumulative", "none"))
+    glove.add_argument("--send-mode", choices=("fixed", "adaptive"))
+    glove.set_defaults(func=cmd_glove_client)
+
+    sim = commands.add_parser("sim", parents=[common], help="keyboard glove or fake robot")
+    sim.add_argument("kind", choices=SIMULATORS)
+    sim.add_argument("--server", help="server address (ws)")
+    sim.add_argument("--port", type=int, help="server port (ws)")
+    sim.add_argument("--serial-port", help="serial port to write to (serial)")
+    # Anything else is for fake_robot.py (robot); see main()
+    sim.set_defaults(func=cmd_sim, args=[])
+
+    bench = commands.add_parser("bench", parents=[common], help="run one of the bench_*.py benchmarks")
+    bench.add_argument("name", choices=BENCHMARKS)
+    bench.add_argument("args", nargs=argparse.REMAINDER, help="arguments for the benchmark")
+    bench.set_defaults(func=cmd_bench)
+
+    replay = commands.add_parser("replay", parents=[common], help="replay a frame log (recording.py)")
+    replay.add_argument("args", nargs=argparse.REMAINDER, help="arguments for recording.py")
+    replay.set_defaults(func=cmd_replay)
+    return parser
+
+
+def main():
+    parser = build_parser()
+    # Options after `sim KIND` are ours wherever they appear; whatever is
+    # left over goes to the fake robot
+    args, extra = parser.parse_known_args()
+    if extra and not (args.command == "sim" and args.kind == "robot"):
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if extra:
+        args.args = extra
+    try:
+        args.func(args)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
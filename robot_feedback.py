@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+import serial.threaded
+
+import servo_protocol
+
+# Commands remembered for matching; anything older is never echoed anymore
+MAX_IN_FLIGHT = 32
+
+
+class RobotFeedback:
+    # Matches robot echoes to the commands the serial writer sent. Binary
+    # status frames carry the command seq; ASCII echoes only repeat the
+    # values, so those match the oldest in-flight command with equal values.
+    # command_sent() runs in the writer thread, feedback in the reader thread.
+    def __init__(self, actuation_histogram=None):
+        self.actuation_histogram = actuation_histogram
+        self.confirmed = None
+        self.confirmed_seq = None
+        self.confirmed_at = None
+        self.last_actuation_us = None
+        self.matched_count = 0
+        self.unmatched_count = 0
+        self.line_count = 0
+        self._in_flight = deque(maxlen=MAX_IN_FLIGHT)
+        self._lock = threading.Lock()
+
+    def command_sent(self, seq, servo_values, sent_ns):
+        # Constrain like lehand.ino so ASCII echoes compare equal
+        values = tuple(min(max(v, 500), 2500) for v in servo_values)
+        with self._lock:
+            self._in_flight.append((seq, values, sent_ns))
+
+    def handle_event(self, event):
+        if event[0] == "frame":
+            _, frame_type, seq, values = event
+            if frame_type in (servo_protocol.FRAME_STATUS, servo_protocol.FRAME_STATUS_DEFERRED):
+                self._confirm(values, lambda entry: entry[0] == seq,
+                              timed=frame_type == servo_protocol.FRAME_STATUS)
+            return
+        values = servo_protocol.parse_echo_line(event[1])
+        if values is None:
+            self.line_count += 1
+            return
+        echoed = tuple(values)
+        self._confirm(values, lambda entry: entry[1] == echoed)
+
+    def _confirm(self, values, matches, timed=True):
+        now_ns = time.perf_counter_ns()
+        with self._lock:
+            match = None
+            for index, entry in enumerate(self._in_flight):
+                if matches(entry):
+                    match = entry
+                    # Older commands were superseded (or their echo was rate limited)
+                    for _ in range(index + 1):
+                        self._in_flight.popleft()
+                    break
+        self.confirmed = list(values)
+        self.confirmed_at = now_ns
+        if match is None:
+            self.unmatched_count += 1
+            return
+        self.confirmed_seq = match[0]
+        self.matched_count += 1
+        if not timed:
+            return
+        self.last_actuation_us = (now_ns - match[2]) // 1000
+        if self.actuation_histogram:
+            self.actuation_histogram.record(self.last_actuation_us)
+
+
+class FeedbackProtocol(serial.threaded.Protocol):
+    # Reader thread side: splits the robot stream into lines and status frames
+    def __init__(self, feedback, on_lost=None):
+        self.feedback = feedback
+        self.on_lost = on_lost
+        self.parser = servo_protocol.ServoStreamParser()
+
+    def data_received(self, data):
+        for event in self.parser.feed(data):
+            self.feedback.handle_event(event)
+
+    def connection_lost(self, exc):
+        # exc is None when stop() ended the thread, set on a read error (unplug)
+        if exc is not None and self.on_lost:
+            self.on_lost(exc)
+
+
+class RobotFeedbackReader:
+    # Keeps the robot's RX direction drained for the whole session; without
+    # it the echoes pile up in the OS buffer
+    def __init__(self, serial_port, feedback, name="robot-feedback", on_lost=None):
+        self.serial_port = serial_port
+        self.feedback = feedback
+        self.name = name
+        self.on_lost = on_lost
+        self.protocol = None
+        self._crc_errors = 0
+        self._thread = None
+
+    @property
+    def crc_errors(self):
+        return self._crc_errors + (self.protocol.parser.crc_errors if self.protocol else 0)
+
+    def start(self, serial_port=None):
+        # A new serial_port (after a replug) replaces the old one
+        if serial_port is not None and serial_port is not self.serial_port:
+            self.stop()
+            self.serial_port = serial_port
+        if self._thread or self.serial_port is None:
+            return
+        # A blocking read parks the thread; timeout=0 would spin
+        self.serial_port.timeout = None
+        self._thread = serial.threaded.ReaderThread(self.serial_port, self._make_protocol)
+        self._thread.name = self.name
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.alive:
+            self._thread.stop()
+        self._thread = None
+        if self.protocol:
+            self._crc_errors += self.protocol.parser.crc_errors
+            self.protocol = None
+
+    def _make_protocol(self):
+        self.protocol = FeedbackProtocol(self.feedback, self.on_lost)
+        return self.protocol
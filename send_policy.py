@@ -0,0 +1,55 @@
+MODE_FIXED = "fixed"
+MODE_ADAPTIVE = "adaptive"
+# Only for key-driven senders (testcli.py): one eased goal pose per
+# command instead of a snapshot stream, the server fills in the motion
+MODE_GOAL = "goal"
+
+DEFAULT_DEADBAND = 10
+DEFAULT_KEEPALIVE_INTERVAL = 0.5
+DEFAULT_MAX_RATE = 100.0
+
+
+class SendPolicy:
+    # Change-driven send schedule: a frame goes out as soon as any finger
+    # moves more than `deadband`, at most `max_rate` times a second, and the
+    # full state is refreshed every `keepalive_interval` while idle.
+    def __init__(self, deadband=DEFAULT_DEADBAND, keepalive_interval=DEFAULT_KEEPALIVE_INTERVAL,
+                 max_rate=DEFAULT_MAX_RATE):
+        self.deadband = deadband
+        self.keepalive_interval = keepalive_interval
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.change_count = 0
+        self.keepalive_count = 0
+        self._last_values = None
+        self._last_send = None
+        self._keepalive_due = False
+
+    def delay(self, values, now):
+        # Seconds until the next frame should be sent; <= 0 means send now
+        if self._last_send is None:
+            return 0.0
+        since = now - self._last_send
+        self._keepalive_due = not self._changed(values)
+        if self._keepalive_due:
+            return self.keepalive_interval - since
+        return self.min_interval - since
+
+    def sent(self, values, now):
+        if self._last_send is not None:
+            if self._keepalive_due:
+                self.keepalive_count += 1
+            else:
+                self.change_count += 1
+        self._last_values = list(values)
+        self._last_send = now
+
+    def reset(self):
+        self._last_values = None
+        self._last_send = None
+
+    def _changed(self, values):
+        deadband = self.deadband
+        for old, new in zip(self._last_values, values):
+            if abs(new - old) > deadband:
+                return True
+        return False
@@ -0,0 +1,247 @@
+import logging
+import os
+import threading
+import time
+
+import serial
+from serial.tools import list_ports
+
+# Port specs: a device path ("/dev/ttyUSB0", "/dev/serial/by-id/..."), or a
+# selector matched against the USB descriptors of whatever is plugged in:
+#   usb:1a86:7523           VID:PID (hex)
+#   usb:1a86:7523:A50285BI  VID:PID and serial number
+#   serial:A50285BI         serial number only
+USB_PREFIX = "usb:"
+SERIAL_NUMBER_PREFIX = "serial:"
+# Seconds between looks for ports that are missing or were unplugged
+POLL_INTERVAL = 1.0
+
+log = logging.getLogger(__name__)
+
+
+def parse_spec(spec):
+    # -> (vid, pid, serial_number) for selectors, None for plain paths
+    if spec.startswith(SERIAL_NUMBER_PREFIX):
+        return None, None, spec[len(SERIAL_NUMBER_PREFIX):]
+    if not spec.startswith(USB_PREFIX):
+        return None
+    parts = spec[len(USB_PREFIX):].split(":", 2)
+    if len(parts) < 2:
+        raise ValueError(f"Expected usb:VID:PID[:SERIAL], got {spec!r}")
+    return int(parts[0], 16), int(parts[1], 16), parts[2] if len(parts) == 3 else None
+
+
+def resolve(spec, ports=None):
+    # Device path currently behind a spec, None while it is not plugged in
+    selector = parse_spec(spec)
+    if selector is None:
+        return spec if os.path.exists(spec) else None
+    vid, pid, serial_number = selector
+    for info in ports if ports is not None else list_ports.comports():
+        if vid is not None and (info.vid != vid or info.pid != pid):
+            continue
+        if serial_number is not None and info.serial_number != serial_number:
+            continue
+        return info.device
+    return None
+
+
+class ManagedPort:
+    # One device slot of the pool. Writers use it like a serial port;
+    # while the device is away (or after an I/O error) is_open is False
+    # and the manager reopens it once it shows up again.
+    def __init__(self, spec, name=None):
+        self.spec = spec
+        self.name = name or spec
+        self.device = None
+        self.serial = None
+        self.open_count = 0
+        self.lost_count = 0
+        self.write_count = 0
+        self.bytes_written = 0
+        self.error_count = 0
+        # Bytes per second written over the last poll interval
+        self.write_rate = 0.0
+        self.last_error = None
+        self._lost = False
+        # False while on_open is still setting the port up (negotiation)
+        self._ready = False
+        self._wake = None
+        self._rate_mark = (time.monotonic(), 0)
+
+    @property
+    def is_open(self):
+        return self.serial is not None and self._ready and not self._lost
+
+    def write(self, data):
+        ser = self.serial
+        if ser is None or self._lost:
+            raise serial.SerialException(f"{self.name} is not connected")
+        try:
+            ser.write(data)
+        except (serial.SerialException, OSError) as e:
+            self.error_count += 1
+            self.report_lost(e)
+            raise
+        self.write_count += 1
+        self.bytes_written += len(data)
+
+    def flush(self):
+        ser = self.serial
+        if ser is None or self._lost:
+            return
+        try:
+            ser.flush()
+        except (serial.SerialException, OSError) as e:
+            self.error_count += 1
+            self.report_lost(e)
+            raise
+
+    def report_lost(self, error=None):
+        # Safe from any thread; the manager closes and reopens the port
+        if self.serial is None or self._lost:
+            return
+        self.last_error = error
+        self._lost = True
+        if self._wake:
+            self._wake.set()
+
+    def stats(self):
+        return {
+            "spec": self.spec,
+            "device": self.device,
+            "open": self.is_open,
+            "opens": self.open_count,
+            "lost": self.lost_count,
+            "writes": self.write_count,
+            "bytes_written": self.bytes_written,
+            "write_bytes_per_s": round(self.write_rate, 1),
+            "errors": self.error_count,
+        }
+
+    def _update_rate(self, now):
+        last, written = self._rate_mark
+        if now - last >= 0.5:
+            self.write_rate = (self.bytes_written - written) / (now - last)
+            self._rate_mark = (now, self.bytes_written)
+
+
+class SerialManager:
+    # Pool of serial devices for multi-hand setups. Ports missing at start
+    # and ports that fail are retried every poll_interval on a watcher
+    # thread; on_open(port) runs there once a port is (re)opened, on_lost(port)
+    # before a failed one is closed.
+    def __init__(self, baud_rate=9600, on_open=None, on_lost=None, poll_interval=POLL_INTERVAL, timeout=0):
+        self.baud_rate = baud_rate
+        self.on_open = on_open
+        self.on_lost = on_lost
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.ports = {}
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+        self._missing_logged = set()
+
+    def add(self, spec, name=None):
+        port = self.ports.get(spec)
+        if port is None:
+            port = self.ports[spec] = ManagedPort(spec, name)
+            port._wake = self._wake
+        return port
+
+    def start(self):
+        # Ports present now are opened before this returns, so startup
+        # protocol negotiation happens in order; the rest are picked up later
+        if self._thread:
+            return self
+        self.poll()
+        self._running = True
+        self._thread = threading.Thread(target=self._watch_thread, name="serial-manager", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(2.0)
+            self._thread = None
+        for port in self.ports.values():
+            if port.serial is not None:
+                self._close(port, lost=False)
+
+    def poll(self):
+        now = time.monotonic()
+        for port in list(self.ports.values()):
+            if port.serial is not None and port._lost:
+                self._close(port)
+            if port.serial is None:
+                self._open(port)
+            port._update_rate(now)
+
+    def stats(self):
+        return {port.name: port.stats() for port in self.ports.values()}
+
+    def _watch_thread(self):
+        while self._running:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._running:
+                self.poll()
+
+    def _open(self, port):
+        try:
+            device = resolve(port.spec)
+        except ValueError as e:
+            self._log_missing(port, e)
+            return
+        if device is None:
+            self._log_missing(port, "not present, waiting for it")
+            return
+        try:
+            ser = serial.Serial(device, self.baud_rate, timeout=self.timeout)
+        except (serial.SerialException, OSError) as e:
+            self._log_missing(port, e)
+            return
+        self._missing_logged.discard(port.spec)
+        port.device = device
+        port.last_error = None
+        port._lost = False
+        port._ready = False
+        port.serial = ser
+        port.open_count += 1
+        shown = port.spec if device == port.spec else f"{port.spec} ({device})"
+        log.info("Serial opened: %s @ %d%s", shown, self.baud_rate, " (reopened)" if port.open_count > 1 else "")
+        if self.on_open:
+            try:
+                self.on_open(port)
+            except Exception as e:
+                log.error("Setting up %s failed: %s", port.name, e)
+                port.report_lost(e)
+                return
+        port._ready = True
+
+    def _close(self, port, lost=True):
+        ser = port.serial
+        if lost:
+            port.lost_count += 1
+            log.warning("Serial port %s lost: %s", port.name, port.last_error or "closed")
+            if self.on_lost:
+                try:
+                    self.on_lost(port)
+                except Exception as e:
+                    log.error("Tearing down %s failed: %s", port.name, e)
+        port._lost = True
+        port._ready = False
+        port.serial = None
+        try:
+            ser.close()
+        except (serial.SerialException, OSError):
+            pass
+
+    def _log_missing(self, port, reason):
+        # Once per outage, not once per poll
+        if port.spec not in self._missing_logged:
+            self._missing_logged.add(port.spec)
+            log.warning("Serial port %s: %s", port.spec, reason)
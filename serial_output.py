@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+
+from servo_protocol import AsciiServoProtocol
+
+# How often a writer holding a target checks whether its port came back
+RECONNECT_CHECK_INTERVAL = 0.05
+
+log = logging.getLogger(__name__)
+
+
+class SerialOutputScheduler:
+    # Latest-value-wins writer: only the newest servo target is kept, older
+    # targets that were not written yet are dropped instead of queued. The
+    # writer paces itself at the wire time of a frame instead of relying on
+    # flush() to block (it does not on every driver), so targets that come
+    # in faster than the link carries them are coalesced, not buffered.
+    # serial_port may be a ManagedPort (serial_manager.py); while it is not
+    # open the newest target waits and is written once the port is back.
+    def __init__(self, serial_port, name="serial-output", write_histogram=None, protocol=None, feedback=None):
+        self.serial_port = serial_port
+        self.protocol = protocol or AsciiServoProtocol()
+        self.feedback = feedback
+        self.name = name
+        self.write_histogram = write_histogram
+        self.submitted_count = 0
+        self.written_count = 0
+        self.coalesced_count = 0
+        self.error_count = 0
+        self._pending = None
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._writer_thread, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, servo_values):
+        with self._cond:
+            if self._pending is not None:
+                self.coalesced_count += 1
+            self._pending = servo_values
+            self.submitted_count += 1
+            self._cond.notify()
+
+    def reconnected(self, protocol=None):
+        # The port was (re)opened, possibly with a newly negotiated protocol
+        with self._cond:
+            if protocol is not None:
+                self.protocol = protocol
+            self._cond.notify()
+
+    def frame_interval(self):
+        # Seconds one command takes on the wire (10 bits per byte, 8N1);
+        # None while the port is not open
+        port = getattr(self.serial_port, "serial", self.serial_port)
+        baud_rate = getattr(port, "baudrate", None)
+        return self.protocol.frame_size * 10 / baud_rate if baud_rate else None
+
+    @property
+    def pending(self):
+        return 0 if self._pending is None else 1
+
+    def _connected(self):
+        return getattr(self.serial_port, "is_open", True)
+
+    def _writer_thread(self):
+        line_free = 0.0
+        while True:
+            with self._cond:
+                while self._running:
+                    if self._pending is None:
+                        self._cond.wait()
+                    elif not self._connected():
+                        self._cond.wait(RECONNECT_CHECK_INTERVAL)
+                    elif line_free > time.perf_counter():
+                        # The previous frame is still on the wire
+                        self._cond.wait(line_free - time.perf_counter())
+                    else:
+                        break
+                if self._pending is None:
+                    return
+                servo_values = self._pending
+                self._pending = None
+            start = time.perf_counter()
+            self._write(servo_values)
+            interval = self.frame_interval()
+            # Deadline based so wake-up overshoot does not add up
+            line_free = max(line_free, start - interval) + interval if interval else 0.0
+
+    def _write(self, servo_values):
+        try:
+            start = time.perf_counter_ns()
+            data = self.protocol.encode(servo_values)
+            if self.feedback:
+                # Before the write, the echo can beat write() returning
+                self.feedback.command_sent(self.protocol.seq, servo_values, start)
+            self.serial_port.write(data)
+            self.serial_port.flush()
+            self.written_count += 1
+            if self.write_histogram:
+                self.write_histogram.record((time.perf_counter_ns() - start) // 1000)
+        except Exception as e:
+            self.error_count += 1
+            log.error("Serial write error on %s: %s", self.name, e)
+            if not self._connected():
+                # Unplugged: keep the target for the replug unless a newer one came in
+                with self._cond:
+                    if self._pending is None:
+                        self._pending = servo_values
@@ -0,0 +1,70 @@
+import asyncio
+
+import serial.threaded
+
+MAX_LINE_LENGTH = 256
+
+
+class AsyncLineProtocol(serial.threaded.Protocol):
+    # Runs in the pyserial reader thread; frames lines out of a byte buffer
+    # and hands each complete line to the event loop.
+    def __init__(self, loop, on_line, on_closed=None):
+        self.loop = loop
+        self.on_line = on_line
+        self.on_closed = on_closed
+        self.buffer = bytearray()
+        self.dropped_bytes = 0
+
+    def data_received(self, data):
+        self.buffer.extend(data)
+        while True:
+            end = self.buffer.find(b"\n")
+            if end < 0:
+                break
+            line = self.buffer[:end].decode("utf-8", "replace").strip()
+            del self.buffer[:end + 1]
+            if line:
+                self.loop.call_soon_threadsafe(self.on_line, line)
+        if len(self.buffer) > MAX_LINE_LENGTH:
+            # No terminator in sight, the stream is garbage; resync
+            self.dropped_bytes += len(self.buffer)
+            del self.buffer[:]
+
+    def connection_lost(self, exc):
+        # Also runs when the reader thread is stopped at shutdown, possibly
+        # after the loop has been closed
+        if self.on_closed and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.on_closed, exc)
+            except RuntimeError:
+                pass
+
+
+class SerialLineReader:
+    def __init__(self, serial_port, on_line):
+        self.serial_port = serial_port
+        self.on_line = on_line
+        self.closed = asyncio.Event()
+        self.error = None
+        self._thread = None
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._thread = serial.threaded.ReaderThread(
+            self.serial_port,
+            lambda: AsyncLineProtocol(loop, self.on_line, self._connection_lost),
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread and self._thread.alive:
+            self._thread.stop()
+
+    async def wait_closed(self):
+        await self.closed.wait()
+        return self.error
+
+    def _connection_lost(self, exc):
+        self.error = exc
+        self.closed.set()
@@ -1,95 +1,889 @@
 import asyncio
+import gc
+import hmac
 import json
+import logging
+import os
+import secrets
+import signal
 import time
-import serial
 import websockets
 
+import wire
+from acks import ACK_CUMULATIVE, ACK_PER_FRAME, parse_ack_request
+from calibration import Calibration, ServoMapper
+from diagnostics import LoopWatchdog, SamplingProfiler
+from logs import debug_sink, frame_logger, setup_logging, shutdown_logging
+from metrics import Metrics, MetricsServer
+from motion_filter import MotionFilter
+from playout import PlayoutBuffer
+from recording import FrameRecorder
+from robot_feedback import RobotFeedback, RobotFeedbackReader
+from serial_manager import SerialManager
+from serial_output import SerialOutputScheduler
+import server2
+import shards
+from servo_protocol import PROTOCOL_BINARY, AsciiServoProtocol, BinaryServoProtocol, negotiate
+from session import DEFAULT_HAND_ID, HandSession
+from trajectory import SPACE_FINGER, SPACE_SERVO, Trajectory, parse_goal
+from udp_transport import TRANSPORT_UDP, new_session_key, start_udp_receiver
+
+# 'full' runs this server; 'simple' runs server2.py, the JSON-only pass-through
+# to one robot on ROBOT_SERIAL_PORT with no sessions, routing or metrics;
+# 'sharded' runs SERVER_WORKERS copies of 'full' on WEBSOCKET_PORT (SO_REUSEPORT),
+# each robot port driven by one of them (see shards.py). UDP is off there.
+SERVER_MODE = 'full'
+SERVER_MODES = ('full', 'simple', 'sharded')
+# Worker processes in sharded mode; 0 = one per CPU core
+SERVER_WORKERS = 0
+# Run the event loop on uvloop when it is installed
+USE_UVLOOP = False
+# Once the server is up, move everything allocated at startup out of the
+# collector's reach so full collections stop walking it (ms-long pauses on a Pi)
+GC_FREEZE = True
+
+# Device path, or a USB selector such as 'usb:1a86:7523' or 'serial:A50285BI'
+# (see serial_manager.py); missing or unplugged ports are reopened when they appear
 ROBOT_SERIAL_PORT = '/dev/ttyUSB0'
 ROBOT_BAUD_RATE = 9600
+SERIAL_POLL_INTERVAL = 1.0
+# 'binary' asks lehand.ino for framed commands at ROBOT_FAST_BAUD_RATE and
+# falls back to ASCII lines if the firmware does not answer; 'ascii' skips it
+ROBOT_PROTOCOL = 'binary'
+ROBOT_FAST_BAUD_RATE = 115200
+# Minimum ms between robot echoes; 0 echoes every command
+ROBOT_ECHO_INTERVAL_MS = 100
+WEBSOCKET_HOST = '0.0.0.0'
 WEBSOCKET_PORT = 50051
+# Incoming messages buffered per connection and outgoing bytes buffered
+# before send() waits (websockets' max_queue and write_limit)
+WEBSOCKET_MAX_QUEUE = 16
+WEBSOCKET_WRITE_LIMIT = 32768
+PING_INTERVAL = 30
+# Optional unreliable frame channel next to the WebSocket, e.g. 50051;
+# None (the default) opens no UDP socket
+UDP_PORT = None
+# Local Prometheus/JSON metrics endpoint; None disables it
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9109
+# Append every received frame to this binary log (see recording.py); None disables
+RECORD_PATH = None
+
+# Servo positions frames are snapped to; None maps continuously
+SERVO_LEVELS = (500, 1000, 1500)
+# EMA weight of the newest glove sample, None disables smoothing
+SERVO_SMOOTHING = None
+# 'one_euro' or 'ema' filter ahead of the mapper (overrides SERVO_SMOOTHING); None = off
+SERVO_FILTER = None
+SERVO_FILTER_OPTIONS = {"min_cutoff": 1.0, "beta": 0.005, "alpha": 0.5}
+# Extrapolate the filtered motion this far ahead to hide link latency; needs SERVO_FILTER
+SERVO_PREDICTION_MS = 0
+# Glove units a finger must move past a level boundary before the servo
+# switches (e.g. 20 against chatter at a boundary); 0 = off
+SERVO_HYSTERESIS = 0
+# Jitter buffer: frames are reordered by the glove's timestamps and applied
+# every PLAYOUT_INTERVAL_MS, held a self-tuned PLAYOUT_MIN/MAX_DELAY_MS
+# behind their fastest arrival (see playout.py). Off applies each frame on arrival.
+PLAYOUT_BUFFER = False
+PLAYOUT_INTERVAL_MS = 20
+PLAYOUT_MIN_DELAY_MS = 5
+PLAYOUT_MAX_DELAY_MS = 150
+# Goal poses ({"goal": {...}}, see trajectory.py) are eased towards locally,
+# one step per robot link command time but at most TRAJECTORY_MAX_RATE per second
+TRAJECTORY_MAX_RATE = 100
+TRAJECTORY_MAX_DURATION_MS = 10000
+
+# hand_id -> robot serial ports driven by that hand. List several ports to
+# fan one glove out to several robot hands. None routes the default hand
+# to ROBOT_SERIAL_PORT.
+HAND_ROUTES = None
+# Seconds a dropped session is kept for its client to reconnect and resume
+# it (counters, calibration, filter state); 0 disables
+SESSION_RESUME_WINDOW = 30.0
+# hand_id -> token the client must present in its hello; empty = no auth
+AUTH_TOKENS = {}
+
+# Log level for everything, and for per-frame records (DEBUG shows them,
+# rate limited per call site, see logs.py)
+LOG_LEVEL = 'INFO'
+LOG_FRAME_LEVEL = 'INFO'
+# JSON-lines per-frame trace, toggled at runtime with `kill -USR1 <pid>`
+DEBUG_SINK_PATH = 'robohand-debug.jsonl'
+# Opt-in loop diagnostics (diagnostics.py): event loop lag, the stack of any
+# callback that blocks the loop longer than LOOP_STALL_MS, and a sampling
+# profiler started with `kill -USR2 <pid>` or {"profile": {"seconds": n}}
+# that writes collapsed stacks (flamegraph.pl, speedscope) next to PROFILE_PATH
+DIAGNOSTICS = False
+LOOP_STALL_MS = 50
+PROFILE_PATH = 'robohand-profile.folded'
+PROFILE_INTERVAL_MS = 10
+
+log = logging.getLogger(__name__)
+frame_log = frame_logger(__name__)
+
+# Placeholder in feedback acks before anything was commanded or echoed
+NO_SERVO_VALUES = (0, 0, 0, 0, 0)
+# JSON finger values outside +-this are rejected (NaN and infinities too)
+FINGER_VALUE_LIMIT = 2 ** 31
+
+
+def valid_finger_values(values):
+    # JSON frames: five numbers in range, or the mapper and playout buffer fail
+    for value in values:
+        if type(value) is not int and type(value) is not float:
+            return False
+        if not -FINGER_VALUE_LIMIT < value < FINGER_VALUE_LIMIT:
+            return False
+    return True
+
+
+def make_mapper(calibration=None):
+    motion_filter = None
+    if SERVO_FILTER:
+        motion_filter = MotionFilter(SERVO_FILTER, prediction_ms=SERVO_PREDICTION_MS, **SERVO_FILTER_OPTIONS)
+    return ServoMapper(calibration, SERVO_LEVELS, smoothing=SERVO_SMOOTHING, motion_filter=motion_filter,
+                       hysteresis=SERVO_HYSTERESIS)
+
+
+def default_routes():
+    return HAND_ROUTES or {DEFAULT_HAND_ID: [ROBOT_SERIAL_PORT]}
+
 
 class HandController:
-    def __init__(self):
+    def __init__(self, routes=None, auth_tokens=None, shard=None):
+        if routes is None:
+            routes = default_routes()
+        self.routes = routes
+        # Sharded mode: robot ports owned by other workers get forwarded to
+        self.shard = shard
+        self.remote_outputs = {}
+        self.auth_tokens = AUTH_TOKENS if auth_tokens is None else auth_tokens
         self.message_count = 0
-        self.start_time = None
-        self.robot_serial = self._initialize_serial()
-        self._last_sent_values = None
+        self.sessions = {}
+        self.udp_port = None
+        self.udp_sessions = {}
+        self._tasks = set()
+        self._playout_task = None
+        # resume token -> (dropped session, monotonic deadline to resume it)
+        self.retired_sessions = {}
+        self.serial_outputs = {}
+        self.feedback_readers = {}
+        self.metrics = Metrics()
+        self.watchdog = None
+        self.profiler = None
+        if DIAGNOSTICS:
+            self.watchdog = LoopWatchdog(LOOP_STALL_MS, lag_histogram=self.metrics.histogram("loop_lag"))
+            self.metrics.gauge("loop_stalls", lambda: self.watchdog.stall_count)
+            self.profiler = SamplingProfiler(shard.path_for(PROFILE_PATH) if shard else PROFILE_PATH,
+                                             PROFILE_INTERVAL_MS)
+        self.mapper = make_mapper()
+        record_path = shard.path_for(RECORD_PATH) if shard and RECORD_PATH else RECORD_PATH
+        self.recorder = FrameRecorder(record_path) if record_path else None
+        # Robot ports are opened (and reopened after a replug) by the serial
+        # manager; outputs exist from the start and hold the newest target
+        # while their port is away
+        self.serial_manager = SerialManager(ROBOT_BAUD_RATE, on_open=self._robot_connected,
+                                            on_lost=self._robot_lost, poll_interval=SERIAL_POLL_INTERVAL)
+        for ports in self.routes.values():
+            for port in ports:
+                if port in self.serial_outputs or port in self.remote_outputs:
+                    continue
+                if shard and not shard.owns(port):
+                    self.remote_outputs[port] = shard.remote_output(port)
+                    continue
+                managed = self.serial_manager.add(port)
+                feedback = RobotFeedback(self.metrics.histogram("actuation"))
+                self.serial_outputs[port] = SerialOutputScheduler(
+                    managed, name=f"serial-output {port}",
+                    write_histogram=self.metrics.histogram("serial_write"), feedback=feedback)
+                self.feedback_readers[port] = RobotFeedbackReader(None, feedback, name=f"robot-feedback {port}",
+                                                                  on_lost=managed.report_lost)
+        self._register_gauges()
+
+    def _register_gauges(self):
+        outputs = self.serial_outputs.values()
+        self.metrics.gauge("sessions", lambda: len(self.sessions))
+        self.metrics.gauge("serial_queue_depth", lambda: sum(out.pending for out in outputs))
+        self.metrics.gauge("serial_written_frames", lambda: sum(out.written_count for out in outputs))
+        self.metrics.gauge("serial_coalesced_frames", lambda: sum(out.coalesced_count for out in outputs))
+        self.metrics.gauge("serial_errors", lambda: sum(out.error_count for out in outputs))
+        self.metrics.gauge("robot_echo_matched", lambda: sum(out.feedback.matched_count for out in outputs))
+        self.metrics.gauge("robot_echo_unmatched", lambda: sum(out.feedback.unmatched_count for out in outputs))
+        if self.remote_outputs:
+            remote = self.remote_outputs.values()
+            self.metrics.gauge("shard_forwarded_frames", lambda: sum(out.written_count for out in remote))
+            self.metrics.gauge("shard_forward_errors", lambda: sum(out.error_count for out in remote))
+        if PLAYOUT_BUFFER:
+            playouts = lambda: [s.playout for s in self.sessions.values() if s.playout is not None]
+            self.metrics.gauge("playout_depth", lambda: sum(p.depth for p in playouts()))
+            self.metrics.gauge("playout_delay_ms", lambda: max((p.delay_ms for p in playouts()), default=0))
+            self.metrics.gauge("playout_underruns", lambda: sum(p.underrun_count for p in playouts()))
+            self.metrics.gauge("playout_skipped", lambda: sum(p.skipped_count for p in playouts()))
+        readers = self.feedback_readers.values()
+        self.metrics.gauge("robot_crc_errors", lambda: sum(reader.crc_errors for reader in readers))
+        for spec, managed in self.serial_manager.ports.items():
+            self.metrics.gauge("serial_port_open", lambda p=managed: int(p.is_open), port=spec)
+            self.metrics.gauge("serial_port_reopens", lambda p=managed: max(0, p.open_count - 1), port=spec)
+            self.metrics.gauge("serial_port_write_bytes", lambda p=managed: p.bytes_written, port=spec)
+            self.metrics.gauge("serial_port_write_bytes_per_s", lambda p=managed: round(p.write_rate, 1), port=spec)
+            self.metrics.gauge("serial_port_write_errors", lambda p=managed: p.error_count, port=spec)
 
-    def _initialize_serial(self):
+    def _robot_connected(self, managed):
+        # Serial manager thread: negotiate on the fresh port, then let the
+        # writer send the newest target and the reader drain the echoes
+        protocol = self._select_protocol(managed.serial, managed.spec)
+        self.serial_outputs[managed.spec].reconnected(protocol)
+        self.feedback_readers[managed.spec].start(managed.serial)
+
+    def _robot_lost(self, managed):
+        self.feedback_readers[managed.spec].stop()
+
+    def _select_protocol(self, ser, port):
+        if ROBOT_PROTOCOL != PROTOCOL_BINARY:
+            return AsciiServoProtocol()
         try:
-            ser = serial.Serial(ROBOT_SERIAL_PORT, ROBOT_BAUD_RATE, timeout=0)
-            print(f"Serial opened: {ROBOT_SERIAL_PORT} @ {ROBOT_BAUD_RATE}")
-            return ser
+            protocol = negotiate(ser, ROBOT_FAST_BAUD_RATE, ROBOT_ECHO_INTERVAL_MS)
         except Exception as e:
-            print(f"Serial error: {e}")
+            log.warning("Serial protocol negotiation failed on %s: %s", port, e)
+            protocol = None
+        if protocol == PROTOCOL_BINARY:
+            log.info("Serial protocol: binary frames @ %d on %s", ser.baudrate, port)
+            return BinaryServoProtocol()
+        log.info("Serial protocol: ASCII lines @ %d on %s", ser.baudrate, port)
+        return AsciiServoProtocol()
+
+    def _outputs_for(self, hand_id):
+        outputs = []
+        for port in self.routes.get(hand_id, ()):
+            out = self.serial_outputs.get(port) or self.remote_outputs.get(port)
+            if out is not None:
+                outputs.append(out)
+        return outputs
+
+    def open_session(self, remote=None, hand_id=None):
+        session = HandSession(remote, self.mapper.clone())
+        if PLAYOUT_BUFFER:
+            session.playout = PlayoutBuffer(PLAYOUT_MIN_DELAY_MS, PLAYOUT_MAX_DELAY_MS,
+                                            latency_histogram=self.metrics.histogram("playout"))
+        if hand_id is not None:
+            session.bind(hand_id, self._outputs_for(hand_id))
+        self.sessions[session.session_id] = session
+        return session
+
+    def close_session(self, session):
+        # A resumed session took over the id; only drop it if it is still ours
+        if self.sessions.get(session.session_id) is session:
+            del self.sessions[session.session_id]
+        if session.ack_timer is not None:
+            session.ack_timer.cancel()
+            session.ack_timer = None
+        self._stop_trajectory(session)
+        if session.udp_key is not None:
+            self.udp_sessions.pop(session.udp_key, None)
+        now = time.monotonic()
+        for key, (_, deadline) in list(self.retired_sessions.items()):
+            if deadline < now:
+                del self.retired_sessions[key]
+        if session.resume_token and SESSION_RESUME_WINDOW:
+            self.retired_sessions[session.resume_token] = (session, now + SESSION_RESUME_WINDOW)
+
+    def _take_resumable(self, token, hand_id):
+        # The dropped session a reconnecting client asks for: one that is
+        # waiting in its resume window, or one whose old connection the
+        # server has not noticed is dead yet (a Wi-Fi blip sends no FIN)
+        if not isinstance(token, str) or not token:
+            return None
+        entry = self.retired_sessions.get(token)
+        previous = entry[0] if entry else next(
+            (s for s in self.sessions.values() if s.resume_token == token), None)
+        if previous is None or previous.hand_id != hand_id:
             return None
+        self.retired_sessions.pop(token, None)
+        if not entry and previous.websocket:
+            self._spawn(previous.websocket.close(1001, "session resumed"))
+        return previous
+
+    async def start_udp(self, host, port):
+        transport, _ = await start_udp_receiver(self.handle_datagram, host, port)
+        self.udp_port = transport.get_extra_info("sockname")[1]
+        log.info("UDP frames on port %d", self.udp_port)
+        return transport
+
+    def handle_datagram(self, key, seq, timestamp_us, finger_values, received_us, addr):
+        session = self.udp_sessions.get(key)
+        if session is None:
+            self.metrics.inc("udp_unknown_key")
+            return
+        if session.udp_last_seq is not None and not wire.seq_newer(seq, session.udp_last_seq):
+            # Late or duplicated datagram; a newer snapshot already went out
+            session.stale_count += 1
+            self.metrics.inc("frames_stale")
+            return
+        session.udp_last_seq = seq
+        accepted = self._accept_frame(session, finger_values, timestamp_us, received_us)
+        if session.ack_mode == ACK_PER_FRAME:
+            if accepted:
+                self._spawn(self._send_ack(session, seq))
+        elif session.ack_mode == ACK_CUMULATIVE:
+            self._record_for_ack(session, seq)
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
     async def handle_client(self, websocket):
-        print("Client connected.")
-        self.start_time = time.time()
+        # Legacy clients that never send a hello drive the default hand
+        hand_id = DEFAULT_HAND_ID if not self.auth_tokens and DEFAULT_HAND_ID in self.routes else None
+        session = self.open_session(websocket.remote_address, hand_id)
+        session.websocket = websocket
+        log.info("Client connected: session %d from %s", session.session_id, session.remote)
         try:
             async for message in websocket:
-                self.message_count += 1
-                # Parse message
-                try:
-                    data = json.loads(message)
-                    print(f"Received: {data}")  # Debug log
-                except Exception as e:
-                    print(f"JSON parse error: {e}")
-                    data = {"raw": message}
-
-                # Process finger values if present
-                finger_values = data.get("finger_values")
-                if isinstance(finger_values, list) and len(finger_values) == 5:
-                    servo_values = self._quantize_servo_values(finger_values)
-                    if self._last_sent_values == tuple(servo_values):
-                        continue
-                    self._send_to_serial(servo_values)
-                    self._last_sent_values = tuple(servo_values)
-
-                # Send acknowledgment
-                ack = {
-                    "ok": True,
-                    "seq": self.message_count,
-                    "ts_ms": int(time.time() * 1000)
-                }
-                await websocket.send(json.dumps(ack))
+                await self._handle_message(session, websocket, message)
 
                 # Give event loop a chance to process other tasks
                 await asyncio.sleep(0)
 
+        except websockets.exceptions.ConnectionClosedOK:
+            pass
         except websockets.exceptions.ConnectionClosedError as e:
-            print(f"Connection closed with error: {e}")
+            log.warning("Connection closed with error: %s", e)
         finally:
-            dur = time.time() - (self.start_time or time.time())
-            print(f"Total: {self.message_count} msgs | Duration: {dur:.2f}s")
-            print("Client disconnected.")
+            self.close_session(session)
+            log.info("%s", session.summary())
+            if session.clock.ready:
+                log.info("Clock offset: %+.2f ms | RTT: %.2f ms",
+                         session.clock.offset_us / 1000, session.clock.rtt_us / 1000)
+            for out in session.outputs:
+                log.info("Serial %s: %d written | %d coalesced | %d errors | %d confirmed by robot",
+                         out.name, out.written_count, out.coalesced_count, out.error_count,
+                         out.feedback.matched_count if out.feedback else 0)
+            if session.playout is not None:
+                log.info("Playout: %s", " | ".join(f"{k} {v}" for k, v in session.playout.stats().items()))
+            log.info("Client disconnected: session %d", session.session_id)
 
-    def _quantize_servo_values(self, values):
-        allowed_positions = (500, 1000, 1500)
-        return [min(allowed_positions, key=lambda target: abs(value - target)) for value in values]
+    async def _handle_message(self, session, websocket, message):
+        metrics = self.metrics
+        received_ns = time.perf_counter_ns()
+        received_us = wire.now_us()
+        frame_seq = None
+        timestamp_us = None
+        # Parse message
+        if isinstance(message, bytes):
+            try:
+                frame = wire.decode_frame_into(message, session.frame)
+                frame_seq, timestamp_us, finger_values = frame.seq, frame.timestamp_us, frame.values
+            except ValueError as e:
+                frame_log.warning("Frame decode error: %s", e)
+                session.error_count += 1
+                metrics.inc("frames_dropped")
+                return
+        else:
+            try:
+                data = json.loads(message)
+                frame_log.debug("Received: %s", data)
+            except Exception as e:
+                frame_log.warning("JSON parse error: %s", e)
+                data = {"raw": message}
 
-    def _send_to_serial(self, servo_values):
-        if not self.robot_serial:
+            if isinstance(data, dict) and await self._handle_control(session, websocket, data, received_us):
+                return
+            finger_values = data.get("finger_values")
+            if isinstance(finger_values, list) and not valid_finger_values(finger_values):
+                # Not the values themselves: a huge int does not even format
+                frame_log.warning("Session %d: invalid finger values", session.session_id)
+                session.error_count += 1
+                metrics.inc("frames_dropped")
+                return
+            timestamp_us = data.get("ts_us")
+            timestamp_ms = data.get("timestamp_ms")
+            if not isinstance(timestamp_us, int) and isinstance(timestamp_ms, (int, float)):
+                network_ms = time.time() * 1000 - timestamp_ms
+                if network_ms >= 0:
+                    # Legacy client: only meaningful while both wall clocks agree
+                    metrics.observe("network", network_ms * 1000)
+                # Still the glove's own clock for the filter and the playout buffer
+                timestamp_us = int(timestamp_ms * 1000)
+        metrics.observe("parse", (time.perf_counter_ns() - received_ns) // 1000)
+
+        if not session.authenticated:
+            await websocket.close(1008, "hello required")
             return
+        accepted = self._accept_frame(session, finger_values, timestamp_us, received_us)
+        if session.ack_mode == ACK_PER_FRAME:
+            if accepted:
+                await self._send_ack(session, frame_seq)
+        elif session.ack_mode == ACK_CUMULATIVE:
+            self._record_for_ack(session, session.message_count if frame_seq is None else frame_seq)
+
+    def _record_for_ack(self, session, seq):
+        # Cumulative mode: one ack per `every` frames, or after interval_ms
+        # for whatever arrived in between
+        if session.ack_window.record(seq):
+            self._flush_ack(session)
+        elif session.ack_timer is None:
+            loop = asyncio.get_running_loop()
+            session.ack_timer = loop.call_later(session.ack_interval_ms / 1000, self._flush_ack, session)
+
+    def _flush_ack(self, session):
+        if session.ack_timer is not None:
+            session.ack_timer.cancel()
+            session.ack_timer = None
+        if session.ack_window.pending:
+            seq, count, dropped = session.ack_window.take()
+            self._spawn(self._send_cumulative_ack(session, seq, count, dropped))
+
+    async def _send_cumulative_ack(self, session, seq, count, dropped):
+        ack_start_ns = time.perf_counter_ns()
         try:
-            line = ",".join(map(str, servo_values)) + "\n"
-            self.robot_serial.write(line.encode("utf-8"))
-            self.robot_serial.flush()
-        except Exception as e:
-            print(f"Serial write error: {e}")
+            if session.wire_format == wire.FORMAT_BINARY:
+                await session.websocket.send(wire.encode_cumulative_ack(seq, wire.now_us(), count, dropped))
+            else:
+                ack = {"seq": seq, "count": count, "dropped": dropped, "ts_ms": int(time.time() * 1000)}
+                await session.websocket.send(json.dumps({"ack": ack}))
+        except websockets.exceptions.ConnectionClosed:
+            return
+        self.metrics.inc("acks_sent")
+        self.metrics.observe("ack_send", (time.perf_counter_ns() - ack_start_ns) // 1000)
 
-async def main():
-    ctrl = HandController()
+    def _accept_frame(self, session, finger_values, timestamp_us, received_us):
+        # Shared by the WebSocket and UDP paths; True when the frame wants an ack
+        metrics = self.metrics
+        if isinstance(timestamp_us, int) and session.clock.ready:
+            metrics.observe("network", session.clock.one_way_latency_us(timestamp_us, received_us))
+        session.message_count += 1
+        self.message_count += 1
+        metrics.inc("frames")
+
+        # Process finger values if present
+        if isinstance(finger_values, list) and len(finger_values) == 5:
+            if session.trajectory is not None:
+                # A streaming glove takes over from a goal move
+                self._stop_trajectory(session)
+                metrics.inc("trajectories_cancelled")
+            if self.recorder:
+                self.recorder.record(finger_values, received_us)
+            # Glove sample time when the client sends one, so network jitter
+            # does not show up as finger velocity in the filter
+            sample_us = timestamp_us if isinstance(timestamp_us, int) else received_us
+            if session.playout is not None:
+                # Applied on the next playout ticks instead
+                if not session.playout.push(sample_us, finger_values, received_us):
+                    metrics.inc("playout_late")
+                if self._playout_task is None:
+                    self._playout_task = self._spawn(self._run_playout())
+                    self._playout_task.add_done_callback(self._playout_done)
+                if debug_sink.enabled:
+                    debug_sink.record("frame", session=session.session_id, ts_us=timestamp_us,
+                                      values=list(finger_values), buffered=session.playout.depth)
+                return True
+            sent = self.process_frame(session, finger_values, sample_us)
+            if debug_sink.enabled:
+                debug_sink.record("frame", session=session.session_id, ts_us=timestamp_us,
+                                  values=list(finger_values), servo=session.last_sent_values, sent=sent)
+            if not sent:
+                metrics.inc("frames_dedup")
+                return False
+        return True
+
+    async def _send_ack(self, session, frame_seq):
+        websocket = session.websocket
+        ack_start_ns = time.perf_counter_ns()
+        # Robot feedback only for clients that asked for it in their hello
+        feedback = session.outputs[0].feedback if session.feedback_acks and session.outputs else None
+        try:
+            if session.wire_format == wire.FORMAT_BINARY:
+                seq = session.message_count if frame_seq is None else frame_seq
+                if feedback:
+                    await websocket.send(wire.encode_feedback_ack(
+                        seq, wire.now_us(), session.last_sent_values or NO_SERVO_VALUES,
+                        feedback.confirmed or NO_SERVO_VALUES, feedback.last_actuation_us or 0,
+                        session.feedback_ack_buffer))
+                else:
+                    await websocket.send(wire.encode_ack(seq, wire.now_us(), session.ack_buffer))
+            elif not feedback:
+                await websocket.send(wire.encode_json_ack(session.message_count, time.time() * 1000))
+            else:
+                ack = {
+                    "ok": True,
+                    "seq": session.message_count,
+                    "ts_ms": int(time.time() * 1000),
+                    "commanded": session.last_sent_values,
+                    "confirmed": feedback.confirmed,
+                    "actuation_us": feedback.last_actuation_us,
+                }
+                await websocket.send(json.dumps(ack))
+        except websockets.exceptions.ConnectionClosed:
+            # The receive loop (or UDP frame racing the close) sees this too
+            return
+        self.metrics.inc("acks_sent")
+        self.metrics.observe("ack_send", (time.perf_counter_ns() - ack_start_ns) // 1000)
+
+    async def _handle_control(self, session, websocket, data, received_us):
+        # Returns True when the message was a control message, not a frame
+        hello = data.get("hello")
+        if isinstance(hello, dict):
+            await self._handle_hello(session, websocket, hello)
+            return True
+        ping = data.get("ping")
+        if isinstance(ping, dict):
+            await websocket.send(wire.encode_pong(ping, received_us, wire.now_us()))
+            return True
+        clock = data.get("clock")
+        if isinstance(clock, dict):
+            try:
+                session.clock.set_estimate(clock["offset_us"], clock["rtt_us"])
+            except (KeyError, TypeError, ValueError, OverflowError):
+                log.warning("Session %d: bad clock report %s", session.session_id, clock)
+            return True
+        goal = data.get("goal")
+        if isinstance(goal, dict):
+            await self._handle_goal(session, websocket, goal)
+            return True
+        profile = data.get("profile")
+        if isinstance(profile, dict):
+            await self._handle_profile(session, websocket, profile)
+            return True
+        calibration = data.get("calibration")
+        if isinstance(calibration, dict):
+            if not session.authenticated:
+                await websocket.close(1008, "hello required")
+                return True
+            try:
+                calibration = Calibration.from_dict(calibration)
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                log.warning("Session %d: bad calibration: %s", session.session_id, e)
+                return True
+            # Rebuilding the tables takes ms on the loop; only for a new range
+            if calibration.to_dict() != session.mapper.calibration.to_dict():
+                session.mapper = make_mapper(calibration)
+                log.info("Session %d: calibration %s", session.session_id, calibration.to_dict())
+            return True
+        return False
+
+    async def _handle_profile(self, session, websocket, profile):
+        # {"profile": {"seconds": n}} starts a profiler run, {"profile": {"stop": true}}
+        # ends it early; the file is written on the server
+        if not session.authenticated:
+            await websocket.close(1008, "hello required")
+            return
+        if self.profiler is None:
+            reply = {"ok": False, "error": "diagnostics are off"}
+        elif profile.get("stop"):
+            # Writing the file can take a while; not on the loop
+            await asyncio.to_thread(self.profiler.stop, True)
+            reply = {"ok": True, "path": self.profiler.last_path}
+        else:
+            try:
+                path = self.profiler.start(float(profile.get("seconds") or 0))
+            except (TypeError, ValueError):
+                path = False
+            if path:
+                log.info("Session %d: profiler started", session.session_id)
+                reply = {"ok": True, "path": path}
+            else:
+                reply = {"ok": False, "error": "already running" if path is None else "bad seconds"}
+        await websocket.send(json.dumps({"profile": reply}))
+
+    async def _handle_goal(self, session, websocket, goal):
+        if not session.authenticated:
+            await websocket.close(1008, "hello required")
+            return
+        try:
+            space, values, duration_ms, max_velocity, easing = parse_goal(goal)
+            if space == SPACE_FINGER:
+                # Map the goal once and ease in servo space: easing glove
+                # values through the levels would jump level to level
+                values = session.mapper.lookup(values)
+            now_us = wire.now_us()
+            # Retarget from wherever the hand is now, mid-move included
+            current = session.trajectory
+            start = current.sample(now_us)[0] if current is not None else session.last_sent_values
+            trajectory = Trajectory(SPACE_SERVO, start or values, values, now_us, duration_ms, max_velocity, easing,
+                                    TRAJECTORY_MAX_DURATION_MS)
+        except (TypeError, ValueError, OverflowError) as e:
+            frame_log.warning("Session %d: bad goal: %s", session.session_id, e)
+            await websocket.send(json.dumps({"goal": {"ok": False, "error": str(e)}}))
+            return
+        self._stop_trajectory(session)
+        session.trajectory = trajectory
+        session.trajectory_task = self._spawn(self._run_trajectory(session, trajectory))
+        self.metrics.inc("goals")
+        await websocket.send(json.dumps({"goal": {"ok": True, "duration_ms": round(trajectory.duration_ms, 1)}}))
+
+    async def _run_trajectory(self, session, trajectory):
+        # As fast as the slowest robot link takes commands; quicker steps
+        # would only be coalesced by the writers
+        intervals = [out.frame_interval() for out in session.outputs if hasattr(out, "frame_interval")]
+        interval = max([1 / TRAJECTORY_MAX_RATE] + [i for i in intervals if i])
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            now_us = wire.now_us()
+            pose, done = trajectory.sample(now_us)
+            self.submit_servo_values(session, pose)
+            self.metrics.inc("trajectory_steps")
+            if done:
+                break
+            next_tick += interval
+            await asyncio.sleep(max(0.0, next_tick - loop.time()))
+        if session.trajectory is trajectory:
+            session.trajectory = None
+            session.trajectory_task = None
+
+    def _stop_trajectory(self, session):
+        if session.trajectory_task is not None:
+            session.trajectory_task.cancel()
+        session.trajectory = None
+        session.trajectory_task = None
+
+    async def _handle_hello(self, session, websocket, hello):
+        hand_id = hello.get("hand_id") or DEFAULT_HAND_ID
+        if not isinstance(hand_id, str):
+            log.warning("Session %d: bad hand id %r", session.session_id, hand_id)
+            await websocket.send(wire.encode_hello_error("bad hand id"))
+            await websocket.close(1008, "bad hand id")
+            return
+        if self.auth_tokens:
+            expected = self.auth_tokens.get(hand_id)
+            token = str(hello.get("token") or "")
+            if expected is None or not hmac.compare_digest(expected, token):
+                log.warning("Session %d: authentication failed for hand '%s'", session.session_id, hand_id)
+                await websocket.send(wire.encode_hello_error("unauthorized"))
+                await websocket.close(1008, "unauthorized")
+                return
+        if hand_id not in self.routes:
+            log.warning("Session %d: unknown hand '%s'", session.session_id, hand_id)
+            await websocket.send(wire.encode_hello_error("unknown hand"))
+            await websocket.close(1008, "unknown hand")
+            return
+
+        ack_mode, ack_every, ack_interval_ms = parse_ack_request(hello.get("ack"))
+        if hello.get("feedback") and ack_mode != ACK_PER_FRAME:
+            # Feedback only rides on per-frame acks; say so instead of
+            # leaving the client waiting for echoes that never come
+            log.warning("Session %d: robot feedback requested with %s acks", session.session_id, ack_mode)
+            await websocket.send(wire.encode_hello_error("feedback needs per-frame acks"))
+            await websocket.close(1008, "feedback needs per-frame acks")
+            return
+
+        session.bind(hand_id, self._outputs_for(hand_id))
+        previous = self._take_resumable(hello.get("resume"), hand_id)
+        if previous:
+            self.sessions.pop(session.session_id, None)
+            session.resume(previous)
+            # Closing the old connection later must not offer the session twice
+            previous.resume_token = None
+            self.sessions[session.session_id] = session
+            self.metrics.inc("sessions_resumed")
+        elif session.resume_token is None:
+            session.resume_token = secrets.token_hex(8)
+        session.wire_format = wire.choose_format(hello.get("formats"))
+        extra = {"session": session.session_id, "resume": session.resume_token}
+        if previous:
+            extra["resumed"] = True
+        transports = hello.get("transports")
+        if not isinstance(transports, list):
+            transports = ()
+        if TRANSPORT_UDP in transports and self.udp_port and session.wire_format == wire.FORMAT_BINARY:
+            if session.udp_key is None:
+                session.udp_key = new_session_key()
+                self.udp_sessions[session.udp_key] = session
+            extra["udp"] = {"port": self.udp_port, "key": session.udp_key}
+        # Robot echoes only reach the worker that owns the port
+        if hello.get("feedback") and session.outputs and session.outputs[0].feedback:
+            session.feedback_acks = True
+            extra["feedback"] = True
+        if "ack" in hello:
+            session.set_ack_mode(ack_mode, ack_every, ack_interval_ms)
+            extra["ack"] = {"mode": ack_mode, "every": ack_every, "interval_ms": ack_interval_ms}
+        await websocket.send(wire.encode_hello_reply(session.wire_format, **extra))
+        log.info("Session %d: hand '%s' -> %s | wire format %s%s%s", session.session_id, hand_id,
+                 self.routes[hand_id], session.wire_format, " | udp" if "udp" in extra else "",
+                 f" | resumed ({session.reconnect_count} reconnects)" if previous else "")
+
+    async def _run_playout(self):
+        # One steady clock for every buffered session; a late wakeup plays
+        # once at the current time instead of catching up in a burst
+        interval = PLAYOUT_INTERVAL_MS / 1000
+        interval_us = PLAYOUT_INTERVAL_MS * 1000
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while True:
+            next_tick += interval
+            delay = next_tick - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif delay < -interval:
+                next_tick = loop.time()
+            now_us = wire.now_us()
+            for session in list(self.sessions.values()):
+                if session.playout is None:
+                    continue
+                # One bad session must not stop the clock for the others
+                try:
+                    frame = session.playout.pop(now_us, interval_us)
+                    if frame is not None:
+                        sample_us, finger_values = frame
+                        if not self.process_frame(session, finger_values, sample_us):
+                            self.metrics.inc("frames_dedup")
+                except Exception:
+                    log.exception("Session %d: playout failed", session.session_id)
+                    session.playout.reset()
+                    self.metrics.inc("playout_errors")
+
+    def _playout_done(self, task):
+        # The next buffered frame starts a new clock
+        if self._playout_task is task:
+            self._playout_task = None
+
+    def process_frame(self, session, finger_values, timestamp_us=None):
+        start_ns = time.perf_counter_ns()
+        session.last_finger_values = finger_values
+        servo_values = session.mapper.map(finger_values, timestamp_us)
+        self.metrics.observe("quantize", (time.perf_counter_ns() - start_ns) // 1000)
+        return self.submit_servo_values(session, servo_values)
+
+    def submit_servo_values(self, session, servo_values):
+        if session.last_sent_values == servo_values:
+            session.dedup_count += 1
+            return False
+        self._send_to_serial(session, servo_values)
+        session.last_sent_values = servo_values
+        session.sent_count += 1
+        return True
+
+    def start(self):
+        for out in self.serial_outputs.values():
+            out.start()
+        self.serial_manager.start()
+
+    def stop(self):
+        if self._playout_task is not None:
+            self._playout_task.cancel()
+            self._playout_task = None
+        for reader in self.feedback_readers.values():
+            reader.stop()
+        for out in self.serial_outputs.values():
+            out.stop()
+        self.serial_manager.stop()
+        if self.recorder:
+            self.recorder.close()
+            log.info("Recorded %d frames to %s (%d unrecordable)", self.recorder.record_count, self.recorder.path,
+                     self.recorder.error_count)
+        if self.watchdog:
+            self.watchdog.stop()
+            log.info("Event loop: %s", " | ".join(f"{k} {v}" for k, v in self.watchdog.stats().items()))
+        if self.profiler:
+            self.profiler.stop(wait=True)
+
+    def _send_to_serial(self, session, servo_values):
+        # Hand off to the writer threads; a blocking write at 9600 baud
+        # must not stall the event loop or the acks
+        for out in session.outputs:
+            out.submit(servo_values)
+
+async def main(shard=None):
+    if SERVER_MODE not in SERVER_MODES:
+        raise ValueError(f"Unknown server mode: {SERVER_MODE}")
+    if SERVER_MODE == 'simple':
+        return await server2.main()
+    if SERVER_MODE == 'sharded' and shard is None:
+        raise ValueError("Sharded mode starts its workers from run(), not main()")
+    setup_logging(LOG_LEVEL, LOG_FRAME_LEVEL)
+    loop = asyncio.get_running_loop()
+    debug_sink.path = shard.path_for(DEBUG_SINK_PATH) if shard else DEBUG_SINK_PATH
+    debug_sink.install_signal(loop)
+    ctrl = HandController(shard=shard)
+    ctrl.start()
+    if ctrl.watchdog:
+        ctrl.watchdog.start(loop)
+        ctrl.profiler.install_signal(loop)
     server = await websockets.serve(
         ctrl.handle_client,
-        host="0.0.0.0",
+        host=WEBSOCKET_HOST,
         port=WEBSOCKET_PORT,
-        ping_interval=30,
-        ping_timeout=30
+        ping_interval=PING_INTERVAL,
+        ping_timeout=PING_INTERVAL,
+        max_queue=WEBSOCKET_MAX_QUEUE,
+        write_limit=WEBSOCKET_WRITE_LIMIT,
+        # Every worker binds the same port and the kernel spreads connections
+        reuse_port=shard is not None
     )
-    print(f"Server started - Port: {WEBSOCKET_PORT}")
-    await server.wait_closed()
+    udp_transport = None
+    forward_transport = None
+    metrics_port = METRICS_PORT
+    if shard:
+        log.info("Worker %d/%d started - Port: %d | pid %d | robot ports: %s", shard.index + 1, shard.workers,
+                 WEBSOCKET_PORT, os.getpid(), ", ".join(ctrl.serial_outputs) or "none")
+        # Resume tokens are per worker: a reconnect the kernel hands to
+        # another worker starts a fresh session
+        forward_transport = await shard.listen(ctrl.serial_outputs)
+        loop.add_signal_handler(signal.SIGTERM, server.close)
+        if metrics_port is not None:
+            metrics_port += shard.index
+    else:
+        log.info("Server started - Port: %d", WEBSOCKET_PORT)
+        if UDP_PORT is not None:
+            udp_transport = await ctrl.start_udp(WEBSOCKET_HOST, UDP_PORT)
+    metrics_server = None
+    if metrics_port is not None:
+        metrics_server = MetricsServer(ctrl.metrics, METRICS_HOST, metrics_port)
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            # Port taken (a second instance?): frames matter more than metrics
+            log.warning("Metrics endpoint on %s:%d unavailable (%s), serving without it",
+                        METRICS_HOST, metrics_port, e)
+            metrics_server = None
+    if GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+    try:
+        await server.wait_closed()
+    finally:
+        if metrics_server:
+            await metrics_server.stop()
+        if udp_transport:
+            udp_transport.close()
+        if forward_transport:
+            forward_transport.close()
+        ctrl.stop()
+        debug_sink.disable()
+        shutdown_logging()
+
+def _run_loop(coro):
+    if USE_UVLOOP:
+        try:
+            import uvloop
+        except ImportError:
+            log.warning("USE_UVLOOP is set but uvloop is not installed, using asyncio's loop")
+        else:
+            if hasattr(uvloop, "run"):
+                return uvloop.run(coro)
+            uvloop.install()
+    return asyncio.run(coro)
+
+def _run_worker(shard):
+    # Body of one sharded worker process. Ctrl+C reaches the whole process
+    # group; the supervisor does the reporting
+    try:
+        _run_loop(main(shard))
+    except KeyboardInterrupt:
+        pass
+
+def run():
+    # Blocking entry point for all modes
+    if SERVER_MODE != 'sharded':
+        return _run_loop(main())
+    setup_logging(LOG_LEVEL, LOG_FRAME_LEVEL)
+    ports = sorted({port for ports in default_routes().values() for port in ports})
+    try:
+        shards.run(SERVER_WORKERS or os.cpu_count() or 1, ports, _run_worker)
+    finally:
+        shutdown_logging()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    run()
\ No newline at end of file
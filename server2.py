@@ -1,45 +1,76 @@
 import asyncio
 import json
+import logging
 import time
-import serial
 import websockets
 
+import wire
+from clock_sync import ClockSync
+from logs import debug_sink, frame_logger, setup_logging, shutdown_logging
+from serial_manager import SerialManager
+
 ROBOT_SERIAL_PORT = '/dev/ttyUSB0'
 ROBOT_BAUD_RATE = 9600
+SERIAL_POLL_INTERVAL = 1.0
+WEBSOCKET_HOST = '0.0.0.0'
 WEBSOCKET_PORT = 50051
+WEBSOCKET_MAX_QUEUE = 16
+WEBSOCKET_WRITE_LIMIT = 32768
+PING_INTERVAL = 30
+LOG_LEVEL = 'INFO'
+LOG_FRAME_LEVEL = 'INFO'
+DEBUG_SINK_PATH = 'robohand-debug.jsonl'
+
+log = logging.getLogger(__name__)
+frame_log = frame_logger(__name__)
 
 class HandController:
     def __init__(self):
         self.message_count = 0
         self.total_e2e_latency = 0.0
         self.start_time = None
-        self.robot_serial = self._initialize_serial()
-
-    def _initialize_serial(self):
-        try:
-            ser = serial.Serial(ROBOT_SERIAL_PORT, ROBOT_BAUD_RATE, timeout=0)
-            print(f"Serial opened: {ROBOT_SERIAL_PORT} @ {ROBOT_BAUD_RATE}")
-            return ser
-        except Exception as e:
-            print(f"Serial error: {e}")
-            return None
+        self.clock = ClockSync()
+        # Opened now if present, reopened whenever it comes back
+        self.serial_manager = SerialManager(ROBOT_BAUD_RATE, poll_interval=SERIAL_POLL_INTERVAL)
+        self.robot_serial = self.serial_manager.add(ROBOT_SERIAL_PORT)
+        self.serial_manager.start()
 
     async def handle_client(self, websocket):
-        print("Client connected.")
+        log.info("Client connected.")
         self.start_time = time.time()
+        self.clock = ClockSync()
         try:
             async for message in websocket:
+                received_us = wire.now_us()
                 # Parse message
                 try:
                     data = json.loads(message)
-                    print(f"Received: {data}")  # Debug log
+                    frame_log.debug("Received: %s", data)
                 except Exception as e:
-                    print(f"JSON parse error: {e}")
+                    frame_log.warning("JSON parse error: %s", e)
                     data = {"raw": message}
 
+                # Clock sync: answer pings, take the client's offset estimate
+                ping = data.get("ping")
+                if isinstance(ping, dict):
+                    await websocket.send(wire.encode_pong(ping, received_us, wire.now_us()))
+                    continue
+                clock = data.get("clock")
+                if isinstance(clock, dict):
+                    try:
+                        self.clock.set_estimate(clock["offset_us"], clock["rtt_us"])
+                    except (KeyError, TypeError, ValueError):
+                        log.warning("Bad clock report: %s", clock)
+                    continue
+
                 # Process timestamp and count message
+                timestamp_us = data.get("ts_us")
                 timestamp_ms = data.get("timestamp_ms")
-                if isinstance(timestamp_ms, (int, float)):
+                if isinstance(timestamp_us, int) and self.clock.ready:
+                    # Offset-corrected, so it holds across hosts with skewed clocks
+                    self.message_count += 1
+                    self.total_e2e_latency += self.clock.one_way_latency_us(timestamp_us, received_us) / 1000
+                elif isinstance(timestamp_ms, (int, float)):
                     now_ms = int(time.time() * 1000)
                     self.message_count += 1
                     self.total_e2e_latency += max(0, now_ms - timestamp_ms)
@@ -47,13 +78,15 @@ class HandController:
                 # Process finger values if present
                 finger_values = data.get("finger_values")
                 if isinstance(finger_values, list) and len(finger_values) == 5:
-                    if self.robot_serial:
+                    if self.robot_serial.is_open:
                         try:
                             line = ",".join(map(str, finger_values)) + "\n"
                             self.robot_serial.write(line.encode("utf-8"))
                             self.robot_serial.flush()
                         except Exception as e:
-                            print(f"Serial write error: {e}")
+                            frame_log.error("Serial write error: %s", e)
+                    if debug_sink.enabled:
+                        debug_sink.record("frame", ts_us=timestamp_us, values=finger_values)
 
                 # Send acknowledgment
                 ack = {
@@ -67,24 +100,36 @@ class HandController:
                 await asyncio.sleep(0)
 
         except websockets.exceptions.ConnectionClosedError as e:
-            print(f"Connection closed with error: {e}")
+            log.warning("Connection closed with error: %s", e)
         finally:
             dur = time.time() - (self.start_time or time.time())
             avg = (self.total_e2e_latency / self.message_count) if self.message_count else 0.0
-            print(f"Total: {self.message_count} msgs | Duration: {dur:.2f}s | Avg E2E: {avg:.2f}ms")
-            print("Client disconnected.")
+            log.info("Total: %d msgs | Duration: %.2fs | Avg E2E: %.2fms", self.message_count, dur, avg)
+            if self.clock.ready:
+                log.info("Clock offset: %+.2f ms | RTT: %.2f ms", self.clock.offset_us / 1000, self.clock.rtt_us / 1000)
+            log.info("Client disconnected.")
 
 async def main():
+    setup_logging(LOG_LEVEL, LOG_FRAME_LEVEL)
+    debug_sink.path = DEBUG_SINK_PATH
+    debug_sink.install_signal(asyncio.get_running_loop())
     ctrl = HandController()
     server = await websockets.serve(
         ctrl.handle_client,
-        host="0.0.0.0",
+        host=WEBSOCKET_HOST,
         port=WEBSOCKET_PORT,
-        ping_interval=30,
-        ping_timeout=30
+        ping_interval=PING_INTERVAL,
+        ping_timeout=PING_INTERVAL,
+        max_queue=WEBSOCKET_MAX_QUEUE,
+        write_limit=WEBSOCKET_WRITE_LIMIT
     )
-    print(f"Server started - Port: {WEBSOCKET_PORT}")
-    await server.wait_closed()
+    log.info("Server started - Port: %d", WEBSOCKET_PORT)
+    try:
+        await server.wait_closed()
+    finally:
+        ctrl.serial_manager.stop()
+        debug_sink.disable()
+        shutdown_logging()
 
 if __name__ == "__main__":
     asyncio.run(main())
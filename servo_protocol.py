@@ -0,0 +1,180 @@
+import struct
+import time
+
+PROTOCOL_ASCII = "ascii"
+PROTOCOL_BINARY = "binary"
+
+SYNC = b"\xa5\x5a"
+FRAME_COMMAND = 0x01
+FRAME_STATUS = 0x81
+# Status sent after the echo interval held it back; positions only, not timing
+FRAME_STATUS_DEFERRED = 0x82
+# sync, type, seq, 5 x servo value (LE), crc8 over type..values
+SERVO_FRAME = struct.Struct("<2sBB5HB")
+SERVO_FRAME_SIZE = SERVO_FRAME.size
+
+READY_PREFIX = "Robot hand ready"
+ECHO_PREFIX = "Servos updated:"
+# "1500,1500,1500,1500,1500\n", what lehand.ino parses
+ASCII_COMMAND = b"%d,%d,%d,%d,%d\n"
+
+
+def _crc8_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return bytes(table)
+
+
+CRC8_TABLE = _crc8_table()
+
+
+def crc8(data):
+    # CRC-8/SMBUS (poly 0x07), same loop as crc8() in lehand.ino
+    crc = 0
+    for byte in data:
+        crc = CRC8_TABLE[crc ^ byte]
+    return crc
+
+
+def encode_servo_frame(frame_type, seq, values, buffer=None):
+    buffer = buffer if buffer is not None else bytearray(SERVO_FRAME_SIZE)
+    SERVO_FRAME.pack_into(buffer, 0, SYNC, frame_type, seq & 0xFF, *values, 0)
+    buffer[-1] = crc8(memoryview(buffer)[2:-1])
+    return buffer
+
+
+def encode_ascii_command(values):
+    # One bytes object, no intermediate strings
+    return ASCII_COMMAND % tuple(values)
+
+
+def parse_echo_line(line):
+    # "Servos updated: 1500,1500,1500,1500,1500" -> [1500, ...]; None otherwise
+    if not line.startswith(ECHO_PREFIX):
+        return None
+    try:
+        values = [int(v) for v in line[len(ECHO_PREFIX):].split(",")]
+    except ValueError:
+        return None
+    return values if len(values) == 5 else None
+
+
+def handshake_request(baud_rate, echo_interval_ms):
+    return f"PROTO BIN {baud_rate} {echo_interval_ms}\n".encode("ascii")
+
+
+def handshake_reply(baud_rate):
+    return f"OK PROTO BIN {baud_rate}"
+
+
+class AsciiServoProtocol:
+    name = PROTOCOL_ASCII
+    # Longest command line, "2500,2500,2500,2500,2500\n"
+    frame_size = 25
+
+    def __init__(self):
+        self.seq = 0
+
+    def encode(self, servo_values):
+        self.seq = (self.seq + 1) & 0xFF
+        return encode_ascii_command(servo_values)
+
+
+class BinaryServoProtocol:
+    # 15-byte framed command instead of a ~25-byte text line; the buffer is
+    # reused, which is safe because only the writer thread encodes and writes
+    name = PROTOCOL_BINARY
+    frame_size = SERVO_FRAME_SIZE
+
+    def __init__(self):
+        self.seq = 0
+        self._buffer = bytearray(SERVO_FRAME_SIZE)
+
+    def encode(self, servo_values):
+        self.seq = (self.seq + 1) & 0xFF
+        return encode_servo_frame(FRAME_COMMAND, self.seq, servo_values, self._buffer)
+
+
+class ServoStreamParser:
+    # Splits a robot serial byte stream into text lines and binary frames.
+    # Frames start with SYNC; everything else is text up to '\n'.
+    def __init__(self, max_line=256):
+        self.buffer = bytearray()
+        self.max_line = max_line
+        self.crc_errors = 0
+
+    def feed(self, data):
+        # Returns a list of ("line", text) and ("frame", type, seq, values)
+        events = []
+        buf = self.buffer
+        buf.extend(data)
+        while buf:
+            sync = buf.find(SYNC)
+            newline = buf.find(b"\n")
+            if newline >= 0 and (sync < 0 or newline < sync):
+                line = buf[:newline].decode("ascii", "replace").strip()
+                del buf[:newline + 1]
+                if line:
+                    events.append(("line", line))
+                continue
+            if sync < 0:
+                if len(buf) > self.max_line:
+                    del buf[:]
+                break
+            if sync > 0:
+                # Text fragment without newline in front of a frame
+                del buf[:sync]
+            if len(buf) < SERVO_FRAME_SIZE:
+                break
+            frame = bytes(buf[:SERVO_FRAME_SIZE])
+            _, frame_type, seq, *values, crc = SERVO_FRAME.unpack(frame)
+            if crc != crc8(frame[2:-1]):
+                self.crc_errors += 1
+                del buf[:1]
+                continue
+            del buf[:SERVO_FRAME_SIZE]
+            events.append(("frame", frame_type, seq, values))
+        return events
+
+
+def negotiate(ser, baud_rate, echo_interval_ms, boot_timeout=2.5, reply_timeout=0.5):
+    # Ask lehand.ino to switch to binary frames at baud_rate. Opening the port
+    # resets most Arduinos, so wait for the boot banner first. Returns
+    # PROTOCOL_BINARY on success; older firmware ignores the request.
+    parser = ServoStreamParser()
+    saved_timeout = ser.timeout
+    ser.timeout = 0.05
+    try:
+        return _negotiate(ser, parser, baud_rate, echo_interval_ms, boot_timeout, reply_timeout)
+    finally:
+        ser.timeout = saved_timeout
+
+
+def _negotiate(ser, parser, baud_rate, echo_interval_ms, boot_timeout, reply_timeout):
+    deadline = time.monotonic() + boot_timeout
+    while time.monotonic() < deadline:
+        data = ser.read(ser.in_waiting or 1)
+        if any(e[0] == "line" and e[1].startswith(READY_PREFIX) for e in parser.feed(data)):
+            break
+    boot_baud = ser.baudrate
+    # If the board did not reset it may still be in binary mode at the fast rate
+    for try_baud in dict.fromkeys((boot_baud, baud_rate)):
+        ser.baudrate = try_baud
+        ser.reset_input_buffer()
+        ser.write(handshake_request(baud_rate, echo_interval_ms))
+        ser.flush()
+        expected = handshake_reply(baud_rate)
+        deadline = time.monotonic() + reply_timeout
+        while time.monotonic() < deadline:
+            data = ser.read(ser.in_waiting or 1)
+            if any(e[0] == "line" and e[1] == expected for e in parser.feed(data)):
+                ser.baudrate = baud_rate
+                return PROTOCOL_BINARY
+    ser.baudrate = boot_baud
+    # Terminate whatever the firmware made of the request as a text line
+    ser.write(b"\n")
+    return PROTOCOL_ASCII
@@ -0,0 +1,94 @@
+import itertools
+import time
+
+import wire
+from acks import ACK_CUMULATIVE, ACK_PER_FRAME, DEFAULT_ACK_INTERVAL_MS, CumulativeAck
+from clock_sync import ClockSync
+
+DEFAULT_HAND_ID = "default"
+
+_session_ids = itertools.count(1)
+
+
+class HandSession:
+    # Per-connection state: which hand the client drives, where its frames
+    # go and its own counters, so concurrent gloves never share dedup state.
+    def __init__(self, remote=None, mapper=None):
+        self.session_id = next(_session_ids)
+        self.remote = remote
+        self.hand_id = DEFAULT_HAND_ID
+        self.authenticated = False
+        self.outputs = []
+        self.wire_format = wire.FORMAT_JSON
+        self.start_time = time.time()
+        self.message_count = 0
+        self.sent_count = 0
+        self.dedup_count = 0
+        self.stale_count = 0
+        self.error_count = 0
+        self.last_sent_values = None
+        # Glove pose last mapped, where a goal move in glove units starts
+        self.last_finger_values = None
+        self.mapper = mapper
+        self.websocket = None
+        # Reused for every binary frame and ack of this connection
+        self.frame = wire.Frame()
+        self.ack_buffer = bytearray(wire.ACK.size)
+        self.feedback_ack_buffer = bytearray(wire.FEEDBACK_ACK.size)
+        # Set once the client opts into UDP frames
+        self.udp_key = None
+        self.udp_last_seq = None
+        # Binary acks carry commanded vs robot-confirmed positions
+        self.feedback_acks = False
+        # How frames are acknowledged, negotiated in the hello (see acks.py)
+        self.ack_mode = ACK_PER_FRAME
+        self.ack_interval_ms = DEFAULT_ACK_INTERVAL_MS
+        self.ack_window = None
+        self.ack_timer = None
+        # Client-reported estimate of server clock - client clock
+        self.clock = ClockSync()
+        # Handed out in the hello reply; a reconnecting client presents it
+        # to continue this session
+        self.resume_token = None
+        self.reconnect_count = 0
+        # Jitter buffer frames wait in when PLAYOUT_BUFFER is on (playout.py)
+        self.playout = None
+        # Goal move being played out (trajectory.py) and its task
+        self.trajectory = None
+        self.trajectory_task = None
+
+    def bind(self, hand_id, outputs):
+        self.hand_id = hand_id
+        self.outputs = list(outputs)
+        self.authenticated = True
+
+    def set_ack_mode(self, mode, every, interval_ms):
+        self.ack_mode = mode
+        self.ack_interval_ms = interval_ms
+        self.ack_window = CumulativeAck(every) if mode == ACK_CUMULATIVE else None
+
+    def resume(self, previous):
+        # Continue a session whose connection dropped: same id, counters,
+        # calibration and filter state; the transport state stays new
+        self.session_id = previous.session_id
+        self.resume_token = previous.resume_token
+        self.start_time = previous.start_time
+        self.message_count = previous.message_count
+        self.sent_count = previous.sent_count
+        self.dedup_count = previous.dedup_count
+        self.stale_count = previous.stale_count
+        self.error_count = previous.error_count
+        self.last_sent_values = previous.last_sent_values
+        self.last_finger_values = previous.last_finger_values
+        self.mapper = previous.mapper
+        self.playout = previous.playout
+        self.udp_last_seq = previous.udp_last_seq
+        self.reconnect_count = previous.reconnect_count + 1
+
+    def summary(self):
+        dur = time.time() - self.start_time
+        rate = self.message_count / dur if dur > 0 else 0.0
+        return (f"[{self.session_id}:{self.hand_id}] Total: {self.message_count} msgs | "
+                f"{self.sent_count} sent | {self.dedup_count} dedup | {self.stale_count} stale | "
+                f"{self.error_count} errors | {self.reconnect_count} reconnects | "
+                f"Duration: {dur:.2f}s | {rate:.1f} msg/s")
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import shutil
+import signal
+import socket
+import struct
+import tempfile
+import time
+
+# Worker -> port owner: index of the robot port in Shard.ports, servo values
+FORWARD = struct.Struct("<H5H")
+# A worker that dies sooner than this after its start is not restarted again
+MIN_WORKER_LIFETIME = 5.0
+
+log = logging.getLogger(__name__)
+
+
+class RemoteOutput:
+    # Stands in for the SerialOutputScheduler of a robot port owned by
+    # another worker: each servo target goes there as one datagram. The
+    # owner keeps only the newest, so a dropped datagram is superseded by
+    # the next target instead of retried.
+    feedback = None
+    pending = 0
+    coalesced_count = 0
+
+    def __init__(self, index, name, sock, path):
+        self.index = index
+        self.name = name
+        self.submitted_count = 0
+        self.written_count = 0
+        self.error_count = 0
+        self._sock = sock
+        self._path = path
+
+    def submit(self, servo_values):
+        self.submitted_count += 1
+        try:
+            self._sock.sendto(FORWARD.pack(self.index, *servo_values), self._path)
+        except OSError:
+            # Owner busy or restarting
+            self.error_count += 1
+            return
+        self.written_count += 1
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class ForwardReceiver(asyncio.DatagramProtocol):
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.received_count = 0
+
+    def datagram_received(self, data, addr):
+        try:
+            index, *values = FORWARD.unpack(data)
+        except struct.error:
+            return
+        out = self.outputs.get(index)
+        if out is not None:
+            self.received_count += 1
+            out.submit(tuple(values))
+
+
+class Shard:
+    # One worker's view of the sharded server: which robot ports it owns
+    # (port i belongs to worker i % workers) and where the others listen
+    def __init__(self, index, workers, ports, socket_dir):
+        self.index = index
+        self.workers = workers
+        self.ports = list(ports)
+        self.socket_dir = socket_dir
+        self._sock = None
+
+    def owner(self, port):
+        return self.ports.index(port) % self.workers
+
+    def owns(self, port):
+        return self.owner(port) == self.index
+
+    def socket_path(self, worker):
+        return os.path.join(self.socket_dir, f"worker{worker}.sock")
+
+    def path_for(self, path):
+        # Per-worker file name for logs every worker would otherwise share
+        root, ext = os.path.splitext(path)
+        return f"{root}.{self.index}{ext}"
+
+    def remote_output(self, port):
+        if self._sock is None:
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+        owner = self.owner(port)
+        return RemoteOutput(self.ports.index(port), f"forward {port} -> worker {owner}", self._sock,
+                            self.socket_path(owner))
+
+    async def listen(self, outputs):
+        # outputs: port -> local SerialOutputScheduler of the ports we own
+        by_index = {self.ports.index(port): out for port, out in outputs.items()}
+        path = self.socket_path(self.index)
+        if os.path.exists(path):
+            os.unlink(path)
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(lambda: ForwardReceiver(by_index), local_addr=path,
+                                                           family=socket.AF_UNIX)
+        return transport
+
+
+def _worker_main(target, shard):
+    # A worker restarted later is forked with the supervisor's handlers
+    # installed; it starts from a clean slate and sets up its own
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+        signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    target(shard)
+
+
+def run(workers, ports, target):
+    # Supervisor: forks `workers` processes running target(shard), restarts
+    # the ones that die, and passes SIGUSR1 (debug sink toggle) and SIGUSR2
+    # (profiler) on to them
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise RuntimeError("Sharded mode needs SO_REUSEPORT (Linux, BSD or macOS)")
+    context = multiprocessing.get_context("fork")
+    socket_dir = tempfile.mkdtemp(prefix="robohand-shards-")
+    procs = {}
+    started = {}
+
+    def spawn(index):
+        shard = Shard(index, workers, ports, socket_dir)
+        proc = context.Process(target=_worker_main, args=(target, shard), name=f"robohand-worker-{index}", daemon=True)
+        proc.start()
+        procs[index] = proc
+        started[index] = time.monotonic()
+
+    def forward(signum, _frame):
+        for proc in procs.values():
+            if proc.is_alive():
+                os.kill(proc.pid, signum)
+
+    def terminate(_signum, _frame):
+        raise SystemExit(0)
+
+    for index in range(workers):
+        spawn(index)
+    log.info("Sharded server: %d workers, %d robot ports", workers, len(ports))
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, forward)
+        signal.signal(signal.SIGUSR2, forward)
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        while procs:
+            by_sentinel = {proc.sentinel: index for index, proc in procs.items()}
+            for sentinel in multiprocessing.connection.wait(list(by_sentinel)):
+                index = by_sentinel[sentinel]
+                proc = procs.pop(index)
+                proc.join()
+                if time.monotonic() - started[index] < MIN_WORKER_LIFETIME:
+                    log.error("Worker %d exited with %s right after starting, not restarting",
+                              index + 1, proc.exitcode)
+                else:
+                    log.warning("Worker %d exited with %s, restarting", index + 1, proc.exitcode)
+                    spawn(index)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for proc in procs.values():
+            if proc.is_alive():
+                proc.terminate()
+        for proc in procs.values():
+            proc.join(3.0)
+        shutil.rmtree(socket_dir, ignore_errors=True)
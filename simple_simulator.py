@@ -4,6 +4,11 @@ import time
 import threading
 import serial
 
+# Serial port the simulated glove writes to (the client's SIMULATOR_PORT end)
+SERIAL_PORT = 'COM4'
+BAUD_RATE = 9600
+SEND_INTERVAL = 0.02  # 50 Hz
+
 class SimpleHandSimulator:
     def __init__(self):
         self.serial_port = None
@@ -67,13 +72,13 @@ class SimpleHandSimulator:
                 except Exception as e:
                     print(f"Hata: {e}")
                     break
-            time.sleep(0.02)  # 50 Hz
+            time.sleep(SEND_INTERVAL)
     
     def run(self):
         print("Simülatör başlıyor...")
         
         try:
-            self.serial_port = serial.Serial('COM4', 9600, timeout=1)
+            self.serial_port = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=1)
             print("Port açıldı")
         except Exception as e:
             print(f"Port hatası: {e}")
@@ -6,9 +6,27 @@ import time
 import websockets
 import sys
 
+import backoff
+import send_policy
+from backoff import Backoff
+from send_policy import SendPolicy
+
 # Use 'localhost' for local testing, 'raspberrypi' for remote connection
 SERVER_ADDRESS = 'raspberrypi'
 SERVER_PORT = 50051
+# Jittered exponential reconnect delays in seconds; None retries forever
+RECONNECT_INITIAL_DELAY = backoff.DEFAULT_INITIAL_DELAY
+RECONNECT_MAX_DELAY = backoff.DEFAULT_MAX_DELAY
+RECONNECT_MAX_ATTEMPTS = None
+# 'fixed' resends every SEND_INTERVAL seconds, 'adaptive' sends on change with idle keepalives,
+# 'goal' sends each command as a goal the server eases towards over GOAL_DURATION_MS
+SEND_MODE = send_policy.MODE_ADAPTIVE
+GOAL_DURATION_MS = 400
+GOAL_EASING = 'min_jerk'
+SEND_INTERVAL = 0.02
+SEND_DEADBAND = send_policy.DEFAULT_DEADBAND
+KEEPALIVE_INTERVAL = send_policy.DEFAULT_KEEPALIVE_INTERVAL
+MAX_SEND_RATE = send_policy.DEFAULT_MAX_RATE
 
 class HandSimulatorClient:
     def __init__(self):
@@ -17,9 +35,11 @@ class HandSimulatorClient:
         self.message_count = 0
         self.ack_count = 0
         self.command_queue = asyncio.Queue()
-        self.connection_retry_count = 0
-        self.max_retries = 5
-        self.retry_delay = 3  # seconds
+        self.backoff = Backoff(RECONNECT_INITIAL_DELAY, RECONNECT_MAX_DELAY, max_attempts=RECONNECT_MAX_ATTEMPTS)
+        self.send_policy = None
+        self.goal_sent = None
+        if SEND_MODE == send_policy.MODE_ADAPTIVE:
+            self.send_policy = SendPolicy(SEND_DEADBAND, KEEPALIVE_INTERVAL, MAX_SEND_RATE)
 
     def set_finger(self, finger_idx, state):
         if state == "kapalı":
@@ -90,24 +110,44 @@ class HandSimulatorClient:
         uri = f"ws://{SERVER_ADDRESS}:{SERVER_PORT}"
         start_time = time.time()
 
-        while self.is_running and self.connection_retry_count < self.max_retries:
+        while self.is_running:
             try:
                 print(f"Connecting to server: {SERVER_ADDRESS}:{SERVER_PORT}...")
                 async with websockets.connect(uri, ping_interval=20, ping_timeout=20) as websocket:
                     print(f"Connected to server: {SERVER_ADDRESS}:{SERVER_PORT}")
-                    self.connection_retry_count = 0  # Reset retry count on successful connection
+                    # Apply keys typed while disconnected so the first frame is current
+                    while not self.command_queue.empty():
+                        if self.process_command(self.command_queue.get_nowait()):
+                            self.is_running = False
+                    if self.send_policy:
+                        self.send_policy.reset()
+                    # Goal mode: the server starts from where this hand is
+                    self.goal_sent = None
 
                     # Start the response listener
                     listener_task = asyncio.create_task(self.listen_responses(websocket))
 
                     while self.is_running:
                         try:
-                            payload = {
-                                "finger_values": self.finger_values,
-                                "timestamp_ms": int(time.time() * 1000),
-                            }
+                            if SEND_MODE == send_policy.MODE_GOAL:
+                                if not await self.wait_for_goal():
+                                    break
+                                # The first goal after connecting is reached at once
+                                duration_ms = GOAL_DURATION_MS if self.goal_sent is not None else 0
+                                payload = {"goal": {"finger_values": self.finger_values,
+                                                    "duration_ms": duration_ms, "easing": GOAL_EASING}}
+                                self.goal_sent = list(self.finger_values)
+                            else:
+                                if self.send_policy and not await self.wait_for_send():
+                                    break
+                                payload = {
+                                    "finger_values": self.finger_values,
+                                    "timestamp_ms": int(time.time() * 1000),
+                                }
                             json_data = json.dumps(payload)
                             await websocket.send(json_data)
+                            if self.send_policy:
+                                self.send_policy.sent(self.finger_values, time.monotonic())
                             self.message_count += 1
 
                             # Only print status every 500 messages
@@ -116,6 +156,9 @@ class HandSimulatorClient:
                                 rate = self.message_count / elapsed if elapsed > 0 else 0.0
                                 print(f"Status: {self.message_count} msgs | {rate:.1f} msg/s")
 
+                            if self.send_policy or SEND_MODE == send_policy.MODE_GOAL:
+                                continue
+
                             # Check for user commands
                             try:
                                 cmd = await asyncio.wait_for(self.command_queue.get(), timeout=0.01)
@@ -125,7 +168,7 @@ class HandSimulatorClient:
                             except asyncio.TimeoutError:
                                 pass  # No command available
 
-                            await asyncio.sleep(0.02)  # 50 Hz
+                            await asyncio.sleep(SEND_INTERVAL)
 
                         except Exception as e:
                             print(f"Error in data sender: {e}")
@@ -139,29 +182,51 @@ class HandSimulatorClient:
 
             except websockets.exceptions.ConnectionClosed as e:
                 print(f"Connection closed: {e}")
-                if self.is_running:
-                    self.connection_retry_count += 1
-                    if self.connection_retry_count < self.max_retries:
-                        print(f"Reconnection attempt {self.connection_retry_count}/{self.max_retries} in {self.retry_delay} seconds...")
-                        await asyncio.sleep(self.retry_delay)
-                    else:
-                        print("Max reconnection attempts reached. Exiting.")
-                        break
             except Exception as e:
                 print(f"Connection error: {e}")
-                self.connection_retry_count += 1
-                if self.connection_retry_count < self.max_retries:
-                    print(f"Reconnection attempt {self.connection_retry_count}/{self.max_retries} in {self.retry_delay} seconds...")
-                    await asyncio.sleep(self.retry_delay)
-                else:
-                    print("Max reconnection attempts reached. Exiting.")
-                    break
+
+            if not self.is_running:
+                break
+            if self.backoff.exhausted:
+                print(f"Giving up after {self.backoff.attempts} reconnection attempts")
+                break
+            delay = self.backoff.next_delay()
+            print(f"Reconnecting in {delay * 1000:.0f} ms (attempt {self.backoff.attempts})")
+            await asyncio.sleep(delay)
 
         self.is_running = False
 
+    async def wait_for_send(self):
+        # Handle commands until the send policy says a frame is due;
+        # returns False when the user asked to quit
+        while self.is_running:
+            delay = self.send_policy.delay(self.finger_values, time.monotonic())
+            if delay <= 0:
+                return True
+            try:
+                cmd = await asyncio.wait_for(self.command_queue.get(), timeout=delay)
+            except asyncio.TimeoutError:
+                continue
+            if self.process_command(cmd):
+                return False
+        return False
+
+    async def wait_for_goal(self):
+        # Handle commands until one moves a finger; False when the user quit
+        while self.is_running:
+            if self.finger_values != self.goal_sent:
+                return True
+            if self.process_command(await self.command_queue.get()):
+                return False
+        return False
+
     async def listen_responses(self, websocket):
         try:
             async for msg in websocket:
+                # The backoff starts over once the server has answered, not
+                # on connect: one that accepts and drops us keeps backing off
+                if self.backoff.attempts:
+                    self.backoff.reset()
                 try:
                     data = json.loads(msg)
                     self.ack_count += 1
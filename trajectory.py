@@ -0,0 +1,95 @@
+import math
+
+from calibration import INPUT_MAX, INPUT_MIN, SERVO_MAX, SERVO_MIN
+
+# Goal poses are either glove units (mapped once, calibration and levels
+# included, then eased in servo space) or servo commands sent as they are
+SPACE_FINGER = "finger_values"
+SPACE_SERVO = "servo_values"
+SPACES = (SPACE_FINGER, SPACE_SERVO)
+# Goal values are clamped to these; servo goals skip the mapper's clamping
+RANGES = {SPACE_FINGER: (INPUT_MIN, INPUT_MAX), SPACE_SERVO: (SERVO_MIN, SERVO_MAX)}
+
+FINGER_COUNT = 5
+# Entries per easing table; sampling is one index computation and a lookup
+EASING_STEPS = 256
+
+
+def _table(curve):
+    return tuple(curve(i / EASING_STEPS) for i in range(EASING_STEPS + 1))
+
+
+# Progress 0..1 over normalized time 0..1
+EASINGS = {
+    "linear": _table(lambda t: t),
+    "smoothstep": _table(lambda t: t * t * (3 - 2 * t)),
+    "cosine": _table(lambda t: (1 - math.cos(math.pi * t)) / 2),
+    # Minimum-jerk profile of human reaching motion
+    "min_jerk": _table(lambda t: t * t * t * (10 - 15 * t + 6 * t * t)),
+}
+DEFAULT_EASING = "min_jerk"
+# Peak speed of each curve relative to a linear move of the same duration
+PEAK_SPEED = {name: max(b - a for a, b in zip(table, table[1:])) * EASING_STEPS for name, table in EASINGS.items()}
+
+
+def _finite(value, name):
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} must be a finite number")
+    return value
+
+
+def parse_goal(goal):
+    # {"finger_values" | "servo_values": [5 numbers], "duration_ms": n,
+    #  "max_velocity": units per second, "easing": name}
+    # -> (space, values, duration_ms, max_velocity, easing); ValueError if malformed
+    spaces = [space for space in SPACES if space in goal]
+    if len(spaces) != 1:
+        raise ValueError(f"goal needs exactly one of {', '.join(SPACES)}")
+    space = spaces[0]
+    values = goal[space]
+    if not isinstance(values, list) or len(values) != FINGER_COUNT:
+        raise ValueError(f"{space} must be a list of {FINGER_COUNT} numbers")
+    lo, hi = RANGES[space]
+    values = tuple(min(hi, max(lo, int(_finite(v, space)))) for v in values)
+    duration_ms = _finite(goal.get("duration_ms") or 0, "duration_ms")
+    max_velocity = goal.get("max_velocity")
+    max_velocity = _finite(max_velocity, "max_velocity") if max_velocity is not None else None
+    if duration_ms < 0 or (max_velocity is not None and max_velocity <= 0):
+        raise ValueError("duration_ms must be >= 0 and max_velocity > 0")
+    easing = goal.get("easing") or DEFAULT_EASING
+    if easing not in EASINGS:
+        raise ValueError(f"unknown easing {easing!r}, expected one of {', '.join(EASINGS)}")
+    return space, values, duration_ms, max_velocity, easing
+
+
+class Trajectory:
+    # Eased move of all five fingers from start to goal. The duration is the
+    # requested one, stretched so no finger exceeds max_velocity at the
+    # curve's peak speed.
+    def __init__(self, space, start, goal, start_us, duration_ms=0.0, max_velocity=None, easing=DEFAULT_EASING,
+                 max_duration_ms=None):
+        self.space = space
+        self.start = tuple(start)
+        self.goal = tuple(goal)
+        self.easing = easing
+        self.table = EASINGS[easing]
+        distance = max(abs(b - a) for a, b in zip(self.start, self.goal))
+        if max_velocity:
+            duration_ms = max(duration_ms, 1000 * PEAK_SPEED[easing] * distance / max_velocity)
+        if max_duration_ms is not None:
+            duration_ms = min(duration_ms, max_duration_ms)
+        self.duration_ms = duration_ms if distance else 0.0
+        if not math.isfinite(self.duration_ms):
+            # A tiny max_velocity without a duration cap
+            raise ValueError("move duration is not finite")
+        self.start_us = start_us
+        self.duration_us = int(self.duration_ms * 1000)
+
+    def sample(self, now_us):
+        # -> (pose, done)
+        elapsed = now_us - self.start_us
+        if elapsed >= self.duration_us:
+            return self.goal, True
+        progress = self.table[max(0, elapsed) * EASING_STEPS // self.duration_us]
+        return tuple(int(a + (b - a) * progress + 0.5) for a, b in zip(self.start, self.goal)), False
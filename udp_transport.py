@@ -0,0 +1,75 @@
+import asyncio
+import logging
+import secrets
+
+import wire
+
+log = logging.getLogger(__name__)
+
+TRANSPORT_WEBSOCKET = "websocket"
+TRANSPORT_UDP = "udp"
+
+
+def new_session_key():
+    # Handed out over the authenticated WebSocket; datagrams without a
+    # known key are ignored
+    return secrets.randbits(64)
+
+
+class UdpFrameReceiver(asyncio.DatagramProtocol):
+    # Server side: every datagram is a full finger snapshot, so there is
+    # nothing to reassemble or retransmit; on_datagram decides what is stale.
+    def __init__(self, on_datagram):
+        self.on_datagram = on_datagram
+        self.transport = None
+        self.invalid_count = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        received_us = wire.now_us()
+        try:
+            key, seq, timestamp_us, values = wire.decode_datagram(data)
+        except ValueError:
+            self.invalid_count += 1
+            return
+        self.on_datagram(key, seq, timestamp_us, values, received_us, addr)
+
+    def error_received(self, exc):
+        log.warning("UDP error: %s", exc)
+
+
+class UdpFrameSender:
+    # Client side: fire-and-forget datagrams, never blocks the sender loop
+    def __init__(self, transport, key):
+        self.transport = transport
+        self.key = key
+        self.sent_count = 0
+        self.error_count = 0
+        # sendto either sends at once or queues a copy, so one buffer does
+        self._buffer = bytearray(wire.DATAGRAM.size)
+
+    @classmethod
+    async def connect(cls, host, port, key):
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(asyncio.DatagramProtocol, remote_addr=(host, port))
+        return cls(transport, key)
+
+    def send(self, seq, timestamp_us, values):
+        try:
+            self.transport.sendto(wire.encode_datagram(self.key, seq, timestamp_us, values, self._buffer))
+            self.sent_count += 1
+        except OSError:
+            # e.g. ICMP unreachable from a previous datagram; the next frame retries
+            self.error_count += 1
+
+    def close(self):
+        self.transport.close()
+
+
+async def start_udp_receiver(on_datagram, host, port):
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: UdpFrameReceiver(on_datagram), local_addr=(host, port))
+    return transport, protocol
@@ -0,0 +1,218 @@
+import json
+import struct
+import time
+
+WIRE_VERSION = 1
+
+FORMAT_BINARY = "bin1"
+FORMAT_JSON = "json"
+SUPPORTED_FORMATS = (FORMAT_BINARY, FORMAT_JSON)
+
+MSG_FRAME = 1
+MSG_ACK = 2
+MSG_DATAGRAM = 3
+MSG_FEEDBACK_ACK = 4
+MSG_CUMULATIVE_ACK = 5
+
+# version, type, seq, monotonic timestamp (us), 5 x servo value
+FRAME = struct.Struct("<BBIQ5H")
+# version, type, seq, server timestamp (us)
+ACK = struct.Struct("<BBIQ")
+# version, type, seq, server timestamp (us), 5 x commanded servo value,
+# 5 x robot-confirmed servo value (0 = no echo yet), command-to-actuation (us)
+FEEDBACK_ACK = struct.Struct("<BBIQ5H5HI")
+# version, type, highest seq, server timestamp (us), frames covered,
+# dropped bitmap (bit i = frame seq - 1 - i missing)
+CUMULATIVE_ACK = struct.Struct("<BBIQIQ")
+# version, type, session key, seq, monotonic timestamp (us), 5 x servo value
+DATAGRAM = struct.Struct("<BBQIQ5H")
+
+# JSON frame and plain ack, as json.dumps writes them
+JSON_FRAME = '{"finger_values": [%d, %d, %d, %d, %d], "timestamp_ms": %d, "ts_us": %d}'
+JSON_ACK = '{"ok": true, "seq": %d, "ts_ms": %d}'
+
+SEQ_MASK = 0xFFFFFFFF
+SEQ_HALF = 1 << 31
+
+
+def now_us():
+    return time.monotonic_ns() // 1000
+
+
+def message_type(data):
+    if len(data) < 2 or data[0] != WIRE_VERSION:
+        raise ValueError(f"Unsupported wire message: {bytes(data[:2])!r}")
+    return data[1]
+
+
+class Frame:
+    # Decoded frame that one connection reuses for every message, so the hot
+    # path does not build a new list per frame. `values` is overwritten by
+    # the next decode; copy it to keep it.
+    __slots__ = ("seq", "timestamp_us", "values")
+
+    def __init__(self):
+        self.seq = 0
+        self.timestamp_us = 0
+        self.values = [0] * 5
+
+
+def encode_frame(seq, timestamp_us, values, buffer=None):
+    # With a buffer (bytearray of FRAME.size) the frame is packed into it and
+    # it is returned; websockets copies it into the outgoing frame before
+    # send() first yields, so a sender may reuse it for its next frame
+    if buffer is None:
+        return FRAME.pack(WIRE_VERSION, MSG_FRAME, seq & SEQ_MASK, timestamp_us, *values)
+    FRAME.pack_into(buffer, 0, WIRE_VERSION, MSG_FRAME, seq & SEQ_MASK, timestamp_us, *values)
+    return buffer
+
+
+def decode_frame(data):
+    if len(data) != FRAME.size:
+        raise ValueError(f"Bad frame size: {len(data)}")
+    version, msg_type, seq, timestamp_us, *values = FRAME.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_FRAME:
+        raise ValueError(f"Not a v{WIRE_VERSION} frame: version={version} type={msg_type}")
+    return seq, timestamp_us, values
+
+
+def decode_frame_into(data, frame):
+    if len(data) != FRAME.size:
+        raise ValueError(f"Bad frame size: {len(data)}")
+    version, msg_type, seq, timestamp_us, v0, v1, v2, v3, v4 = FRAME.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_FRAME:
+        raise ValueError(f"Not a v{WIRE_VERSION} frame: version={version} type={msg_type}")
+    frame.seq = seq
+    frame.timestamp_us = timestamp_us
+    values = frame.values
+    values[0] = v0
+    values[1] = v1
+    values[2] = v2
+    values[3] = v3
+    values[4] = v4
+    return frame
+
+
+def encode_ack(seq, timestamp_us, buffer=None):
+    if buffer is None:
+        return ACK.pack(WIRE_VERSION, MSG_ACK, seq & SEQ_MASK, timestamp_us)
+    ACK.pack_into(buffer, 0, WIRE_VERSION, MSG_ACK, seq & SEQ_MASK, timestamp_us)
+    return buffer
+
+
+def decode_ack(data):
+    if len(data) != ACK.size:
+        raise ValueError(f"Bad ack size: {len(data)}")
+    version, msg_type, seq, timestamp_us = ACK.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_ACK:
+        raise ValueError(f"Not a v{WIRE_VERSION} ack: version={version} type={msg_type}")
+    return seq, timestamp_us
+
+
+def encode_feedback_ack(seq, timestamp_us, commanded, confirmed, actuation_us, buffer=None):
+    if buffer is None:
+        return FEEDBACK_ACK.pack(WIRE_VERSION, MSG_FEEDBACK_ACK, seq & SEQ_MASK, timestamp_us,
+                                 *commanded, *confirmed, actuation_us)
+    FEEDBACK_ACK.pack_into(buffer, 0, WIRE_VERSION, MSG_FEEDBACK_ACK, seq & SEQ_MASK, timestamp_us,
+                           *commanded, *confirmed, actuation_us)
+    return buffer
+
+
+def decode_feedback_ack(data):
+    if len(data) != FEEDBACK_ACK.size:
+        raise ValueError(f"Bad feedback ack size: {len(data)}")
+    version, msg_type, seq, timestamp_us, *values, actuation_us = FEEDBACK_ACK.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_FEEDBACK_ACK:
+        raise ValueError(f"Not a v{WIRE_VERSION} feedback ack: version={version} type={msg_type}")
+    return seq, timestamp_us, values[:5], values[5:], actuation_us
+
+
+def encode_cumulative_ack(seq, timestamp_us, count, dropped):
+    return CUMULATIVE_ACK.pack(WIRE_VERSION, MSG_CUMULATIVE_ACK, seq & SEQ_MASK, timestamp_us, count, dropped)
+
+
+def decode_cumulative_ack(data):
+    if len(data) != CUMULATIVE_ACK.size:
+        raise ValueError(f"Bad cumulative ack size: {len(data)}")
+    version, msg_type, seq, timestamp_us, count, dropped = CUMULATIVE_ACK.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_CUMULATIVE_ACK:
+        raise ValueError(f"Not a v{WIRE_VERSION} cumulative ack: version={version} type={msg_type}")
+    return seq, timestamp_us, count, dropped
+
+
+def encode_datagram(key, seq, timestamp_us, values, buffer=None):
+    if buffer is None:
+        return DATAGRAM.pack(WIRE_VERSION, MSG_DATAGRAM, key, seq & SEQ_MASK, timestamp_us, *values)
+    DATAGRAM.pack_into(buffer, 0, WIRE_VERSION, MSG_DATAGRAM, key, seq & SEQ_MASK, timestamp_us, *values)
+    return buffer
+
+
+def decode_datagram(data):
+    if len(data) != DATAGRAM.size:
+        raise ValueError(f"Bad datagram size: {len(data)}")
+    version, msg_type, key, seq, timestamp_us, *values = DATAGRAM.unpack(data)
+    if version != WIRE_VERSION or msg_type != MSG_DATAGRAM:
+        raise ValueError(f"Not a v{WIRE_VERSION} datagram: version={version} type={msg_type}")
+    return key, seq, timestamp_us, values
+
+
+def seq_newer(seq, last):
+    # Serial number arithmetic, so ordering survives the 32-bit wrap
+    return 0 < ((seq - last) & SEQ_MASK) < SEQ_HALF
+
+
+def encode_json_frame(values, timestamp_ms, timestamp_us):
+    # Same text as json.dumps of the dict, without building the dict
+    return JSON_FRAME % (values[0], values[1], values[2], values[3], values[4], timestamp_ms, timestamp_us)
+
+
+def encode_json_ack(seq, timestamp_ms):
+    return JSON_ACK % (seq, timestamp_ms)
+
+
+def encode_hello(formats, hand_id=None, token=None, transports=None, feedback=False, ack=None, resume=None):
+    hello = {"formats": list(formats)}
+    if resume:
+        # Token from the previous session's hello reply, to pick it back up
+        hello["resume"] = resume
+    if ack:
+        # {"mode": ..., "every": N, "interval_ms": T}, see acks.py
+        hello["ack"] = ack
+    if transports:
+        hello["transports"] = list(transports)
+    if feedback:
+        # Ask for binary acks that carry the robot-confirmed positions
+        hello["feedback"] = True
+    if hand_id is not None:
+        hello["hand_id"] = hand_id
+    if token is not None:
+        hello["token"] = token
+    return json.dumps({"hello": hello})
+
+
+def encode_hello_reply(wire_format, **extra):
+    return json.dumps({"hello": dict(extra, format=wire_format)})
+
+
+def encode_hello_error(error):
+    return json.dumps({"hello": {"error": error}})
+
+
+def encode_ping(ping_id, t0):
+    return json.dumps({"ping": {"id": ping_id, "t0": t0}})
+
+
+def encode_pong(ping, t1, t2):
+    return json.dumps({"pong": {"id": ping.get("id"), "t0": ping.get("t0"), "t1": t1, "t2": t2}})
+
+
+def encode_clock_report(offset_us, rtt_us):
+    return json.dumps({"clock": {"offset_us": offset_us, "rtt_us": rtt_us}})
+
+
+def choose_format(offered):
+    # First format in the client's preference order that we understand
+    for wire_format in offered or ():
+        if wire_format in SUPPORTED_FORMATS:
+            return wire_format
+    return FORMAT_JSON